@@ -0,0 +1,345 @@
+"""
+Benchmark các cấu trúc dữ liệu của hospitals trên dữ liệu sinh ngẫu nhiên
+Chạy: python benchmark.py spatial --sizes 1000 10000 100000
+      python benchmark.py serialize --sizes 100 1000 10000
+      python benchmark.py search --sizes 10000 100000
+      python benchmark.py fuzzy --sizes 10000 100000
+      python benchmark.py autocomplete --sizes 10000 100000
+      python benchmark.py import --sizes 1000 10000
+      python benchmark.py tiles --sizes 10000 100000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import django
+from django.db import connection
+from django.db.models import Q
+
+# Setup Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+django.setup()
+
+from hospitals.distance import EARTH_RADIUS_KM, rank_by_distance
+from hospitals.fragments import hospital_rows
+from hospitals.autocomplete import AutocompleteIndex
+from hospitals.fulltext import ranked
+from hospitals.fuzzy import TrigramIndex
+from hospitals.importer import IMPORT_FIELDS, HospitalImporter, HospitalSync
+from hospitals.models import Hospital
+from hospitals.serializers import HospitalListSerializer, HospitalRowSerializer
+from hospitals.spatial import SpatialIndex
+from hospitals.tiles import build_tile
+from rest_framework.renderers import JSONRenderer
+
+# Khung bao TP.HCM
+LAT_RANGE = (10.35, 11.16)
+LNG_RANGE = (106.35, 107.02)
+
+# Từ vựng cho tên/địa chỉ sinh ngẫu nhiên
+KINDS = ['Bệnh viện', 'Phòng khám', 'Trung tâm Y tế', 'Bệnh viện Đa khoa', 'Phòng khám Nhi']
+NAMES = ['Hòa Hảo', 'Chợ Rẫy', 'Nhân Dân', 'Thống Nhất', 'Gia Định', 'An Bình', 'Tâm Đức', 'Sài Gòn',
+         'Vạn Hạnh', 'Hùng Vương', 'Phú Nhuận', 'Tân Phú', 'Bình Tân', 'Thủ Đức', 'Hoàn Mỹ', 'Quốc Ánh']
+STREETS = ['Nguyễn Trãi', 'Lê Lợi', 'Hai Bà Trưng', 'Trần Hưng Đạo', 'Cách Mạng Tháng Tám', 'Võ Văn Tần',
+           'Nguyễn Chí Thanh', 'Lý Thường Kiệt', 'Điện Biên Phủ', 'Phan Đăng Lưu', 'Nguyễn Văn Cừ', 'Sư Vạn Hạnh']
+
+
+def random_points(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        (i, rng.uniform(*LAT_RANGE), rng.uniform(*LNG_RANGE))
+        for i in range(1, n + 1)
+    ]
+
+
+def timed(fn, queries):
+    """Thời gian trung bình (ms) của ``fn(lat, lng)`` trên các điểm truy vấn"""
+    start = time.perf_counter()
+    for _, lat, lng in queries:
+        fn(lat, lng)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def linear_nearest(rows, lat, lng, k, max_distance):
+    """Cách cũ: tính Haversine cho mọi điểm rồi sắp xếp"""
+    found = []
+    for pk, plat, plng in rows:
+        dlat = math.radians(plat - lat)
+        dlon = math.radians(plng - lng)
+        a = math.sin(dlat / 2) ** 2 + \
+            math.cos(math.radians(lat)) * math.cos(math.radians(plat)) * math.sin(dlon / 2) ** 2
+        d = EARTH_RADIUS_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        if d <= max_distance:
+            found.append((d, pk))
+    found.sort()
+    return found[:k]
+
+
+def bench_spatial(args):
+    print(f"{'N':>9} {'build ms':>10} {'knn ms':>9} {'radius ms':>10} {'facet ms':>9} "
+          f"{'numpy ms':>9} {'linear ms':>10}")
+    for n in args.sizes:
+        rows = random_points(n)
+        queries = random_points(args.queries, seed=1)
+        # Bộ lọc thưa: chỉ ~1% số điểm có cấp cứu
+        rng = random.Random(2)
+        facets = [{('emergency', True)} if rng.random() < 0.01 else set() for _ in rows]
+
+        start = time.perf_counter()
+        index = SpatialIndex(*zip(*rows), facets=facets)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        knn_ms = timed(lambda lat, lng: index.nearest(lat, lng, 5, max_distance=10), queries)
+        radius_ms = timed(lambda lat, lng: index.within(lat, lng, 2), queries)
+        facet = index.subset((('emergency', True),))
+        facet_ms = timed(lambda lat, lng: facet.nearest(lat, lng, 5), queries)
+        arrays = (index.ids, index.lats, index.lngs)
+        numpy_ms = timed(lambda lat, lng: rank_by_distance(lat, lng, *arrays, k=5, max_distance=10), queries)
+        linear_ms = timed(lambda lat, lng: linear_nearest(rows, lat, lng, 5, 10), queries[:5])
+
+        print(f"{n:>9} {build_ms:>10.1f} {knn_ms:>9.3f} {radius_ms:>10.3f} {facet_ms:>9.3f} "
+              f"{numpy_ms:>9.3f} {linear_ms:>10.2f}")
+
+
+def random_hospitals(n, seed=0):
+    """Bệnh viện (chưa lưu) với đủ các trường mà serializer đọc"""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    hospitals = []
+    for pk, lat, lng in random_points(n, seed):
+        hospitals.append(Hospital(
+            id=pk,
+            name=f'{rng.choice(KINDS)} {rng.choice(NAMES)} {pk}',
+            hospital_type=rng.choice(Hospital.HOSPITAL_TYPES)[0],
+            address=f'{rng.randint(1, 999)} {rng.choice(STREETS)}',
+            phone=f'028 {rng.randint(1000, 9999)} {rng.randint(1000, 9999)}',
+            district=rng.choice(Hospital.DISTRICTS)[0],
+            main_specialty=rng.choice(Hospital.SPECIALTIES)[0],
+            specialties=[rng.choice(Hospital.SPECIALTIES)[0]],
+            latitude=lat,
+            longitude=lng,
+            working_hours={'monday': '7:00-16:30'},
+            capacity=rng.randint(50, 2000),
+            created_at=now,
+            updated_at=now + timedelta(seconds=pk),
+        ))
+    return hospitals
+
+
+def bench_serialize(args):
+    print(f"{'N':>9} {'drf ms':>9} {'rows ms':>9} {'fragments cold ms':>18} {'fragments warm ms':>18} "
+          f"{'identical':>10}")
+    renderer = JSONRenderer()
+    for n in args.sizes:
+        hospitals = random_hospitals(n)
+        rows = [
+            {name: getattr(hospital, name) for name in HospitalRowSerializer.value_fields}
+            for hospital in hospitals
+        ]
+
+        start = time.perf_counter()
+        expected = HospitalListSerializer(hospitals, many=True).data
+        drf_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fast = HospitalRowSerializer().serialize_many(rows)
+        rows_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        hospital_rows(rows)
+        cold_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            hospital_rows(rows)
+        warm_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        identical = renderer.render(fast) == renderer.render(expected)
+        print(f"{n:>9} {drf_ms:>9.2f} {rows_ms:>9.2f} {cold_ms:>18.2f} {warm_ms:>18.2f} {identical!s:>10}")
+
+
+def bench_search(args):
+    """Tìm từ khóa trên CSDL thử nghiệm (tạo mới, xóa khi xong): icontains và chỉ mục toàn văn"""
+    keywords = ['nhi', 'hai bà trưng', 'chợ rẫy', 'trung tâm y tế thủ đức', 'khoa 12345']
+    columns = ['name', 'name_en', 'address']
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        print(f"{'N':>9} {'keyword':>24} {'matches':>8} {'icontains ms':>13} {'fulltext ms':>12}")
+        created = 0
+        for n in sorted(args.sizes):
+            Hospital.objects.bulk_create(random_hospitals(n)[created:], batch_size=2000)
+            created = n
+            queryset = Hospital.objects.filter(is_active=True)
+            for keyword in keywords:
+                contains = queryset.filter(
+                    Q(name__icontains=keyword) | Q(name_en__icontains=keyword) | Q(address__icontains=keyword)
+                ).order_by('name')
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    list(contains.values_list('id', flat=True))
+                contains_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    found = ranked(queryset, keyword, columns)
+                fulltext_ms = (time.perf_counter() - start) / args.repeat * 1000
+                print(f"{n:>9} {keyword:>24} {len(found):>8} {contains_ms:>13.2f} {fulltext_ms:>12.2f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def bench_fuzzy(args):
+    """Chỉ mục trigram trong bộ nhớ: thời gian dựng và độ trễ tìm gần đúng theo N"""
+    keywords = ['benh vien cho rayy', 'phong kham nhii', 'hai ba trung', 'tam duc 123', 'xyzw']
+    print(f"{'N':>9} {'build ms':>10} " + ' '.join(f'{keyword:>20}' for keyword in keywords))
+    for n in args.sizes:
+        hospitals = random_hospitals(n)
+        start = time.perf_counter()
+        index = TrigramIndex(
+            [hospital.id for hospital in hospitals],
+            [f'{hospital.name} {hospital.name_en} {hospital.address}' for hospital in hospitals],
+        )
+        build_ms = (time.perf_counter() - start) * 1000
+
+        timings = []
+        for keyword in keywords:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                index.search(keyword, limit=200)
+            timings.append((time.perf_counter() - start) / args.repeat * 1000)
+        print(f"{n:>9} {build_ms:>10.1f} " + ' '.join(f'{ms:>20.3f}' for ms in timings))
+
+
+def bench_autocomplete(args):
+    """Chỉ mục gợi ý: thời gian dựng, cập nhật một bệnh viện và độ trễ gợi ý theo N"""
+    prefixes = ['b', 'benh vien h', 'phong kham nhi', 'hai ba', 'vo van', 'xyz']
+    print(f"{'N':>9} {'build ms':>10} {'update ms':>10} " + ' '.join(f'{prefix:>15}' for prefix in prefixes))
+    for n in args.sizes:
+        hospitals = random_hospitals(n)
+        start = time.perf_counter()
+        index = AutocompleteIndex((h.id, h.name, h.name_en, h.address) for h in hospitals)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for hospital in hospitals[:args.repeat]:
+            index.add(hospital.id, f'{hospital.name} (cơ sở 2)', hospital.name_en, hospital.address)
+        update_ms = (time.perf_counter() - start) / args.repeat * 1000
+
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                index.suggest(prefix, 10)
+            timings.append((time.perf_counter() - start) / args.repeat * 1000)
+        print(f"{n:>9} {build_ms:>10.1f} {update_ms:>10.3f} " + ' '.join(f'{ms:>15.3f}' for ms in timings))
+
+
+def bench_import(args):
+    """Nạp dữ liệu trên CSDL thử nghiệm: create từng dòng, HospitalImporter (bulk, một giao dịch)
+    và HospitalSync khi 1% bản ghi đổi giá trị"""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        print(f"{'N':>9} {'create rows/s':>14} {'importer rows/s':>16} {'sync rows/s':>12} {'updated':>8} {'batch':>7}")
+        for n in args.sizes:
+            records = [
+                {name: getattr(hospital, name) for name in IMPORT_FIELDS}
+                for hospital in random_hospitals(n)
+            ]
+
+            Hospital.objects.all().delete()
+            start = time.perf_counter()
+            for record in records:
+                Hospital.objects.create(**record)
+            create_rate = n / (time.perf_counter() - start)
+
+            result = HospitalImporter(batch_size=args.batch_size).run(records)
+
+            for record in records[::100]:
+                record['capacity'] += 1
+            synced = HospitalSync(batch_size=args.batch_size).run(records)
+            print(f"{n:>9} {create_rate:>14,.0f} {result.rows_per_second:>16,.0f} "
+                  f"{synced.rows_per_second:>12,.0f} {synced.updated:>8} "
+                  f"{HospitalImporter(args.batch_size).batch_size:>7}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def bench_tiles(args):
+    """Vector tile trên CSDL thử nghiệm: thời gian dựng (không cache) và kích thước tile ở tâm TP.HCM theo zoom"""
+    center_lat, center_lng = sum(LAT_RANGE) / 2, sum(LNG_RANGE) / 2
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        print(f"{'N':>9} {'zoom':>5} {'bytes':>9} {'build ms':>9}")
+        created = 0
+        for n in sorted(args.sizes):
+            Hospital.objects.bulk_create(random_hospitals(n)[created:], batch_size=2000)
+            created = n
+            queryset = Hospital.objects.filter(is_active=True)
+            for z in args.zooms:
+                scale = 2 ** z
+                x = int((center_lng + 180) / 360 * scale)
+                y = int((1 - math.asinh(math.tan(math.radians(center_lat))) / math.pi) / 2 * scale)
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    content = build_tile(queryset, z, x, y)
+                build_ms = (time.perf_counter() - start) / args.repeat * 1000
+                print(f"{n:>9} {z:>5} {len(content):>9} {build_ms:>9.2f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    spatial = subparsers.add_parser('spatial', help='KD-tree và NumPy: độ trễ k-nearest/bán kính theo N')
+    spatial.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    spatial.add_argument('--queries', type=int, default=200)
+    spatial.set_defaults(func=bench_spatial)
+
+    serialize = subparsers.add_parser('serialize', help='Serialize danh sách: DRF, HospitalRowSerializer và fragment đã cache')
+    serialize.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000])
+    serialize.add_argument('--repeat', type=int, default=5)
+    serialize.set_defaults(func=bench_serialize)
+
+    search = subparsers.add_parser('search', help='Tìm từ khóa: icontains và chỉ mục toàn văn, trên CSDL thử nghiệm')
+    search.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    search.add_argument('--repeat', type=int, default=5)
+    search.set_defaults(func=bench_search)
+
+    fuzzy = subparsers.add_parser('fuzzy', help='Chỉ mục trigram: thời gian dựng và độ trễ tìm gần đúng theo N')
+    fuzzy.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    fuzzy.add_argument('--repeat', type=int, default=20)
+    fuzzy.set_defaults(func=bench_fuzzy)
+
+    autocomplete = subparsers.add_parser('autocomplete', help='Chỉ mục gợi ý: thời gian dựng, cập nhật và độ trễ gợi ý theo N')
+    autocomplete.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    autocomplete.add_argument('--repeat', type=int, default=100)
+    autocomplete.set_defaults(func=bench_autocomplete)
+
+    imports = subparsers.add_parser('import', help='Nạp dữ liệu: create từng dòng và bulk trong một giao dịch, trên CSDL thử nghiệm')
+    imports.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    imports.add_argument('--batch-size', type=int, default=None)
+    imports.set_defaults(func=bench_import)
+
+    tiles = subparsers.add_parser('tiles', help='Vector tile: thời gian dựng và kích thước theo zoom, trên CSDL thử nghiệm')
+    tiles.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    tiles.add_argument('--zooms', type=int, nargs='+', default=[8, 11, 13, 14, 16])
+    tiles.add_argument('--repeat', type=int, default=5)
+    tiles.set_defaults(func=bench_tiles)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,7 @@ Script tạo dữ liệu mẫu bệnh viện TP.HCM
 Chạy: python manage.py shell < create_hospitals_hcmc.py
 """
 
-from hospitals.models import Hospital
+from hospitals.importer import HospitalSync
 
 # Danh sách bệnh viện TP.HCM (dữ liệu mẫu đầy đủ)
 hospitals_data = [
@@ -1549,16 +1549,9 @@ hospitals_data = [
 
 ]
 
-# Xóa dữ liệu cũ
-Hospital.objects.all().delete()
+# Đồng bộ theo tên + tọa độ: chỉ ghi phần thay đổi, giữ nguyên id
+result = HospitalSync().run(hospitals_data)
+for position, h, errors in result.rejected:
+    print(f'Lỗi bản ghi "{h.get("name", "?")}": {errors}')
 
-# Thêm dữ liệu mới
-created_count = 0
-for h in hospitals_data:
-    try:
-        Hospital.objects.create(**h)
-        created_count += 1
-    except Exception as e:
-        print(f'Lỗi tạo "{h["name"]}": {e}')
-
-print(f'Done. Created {created_count}/{len(hospitals_data)}')
+print(f'Done. {result.summary()}')
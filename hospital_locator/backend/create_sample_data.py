@@ -3,13 +3,9 @@ Script tạo dữ liệu bệnh viện mẫu cho TP.HCM
 Chạy: python manage.py shell < create_sample_data.py
 """
 
+from hospitals.importer import HospitalSync
 from hospitals.models import Hospital
 
-# Xóa dữ liệu cũ
-print("🗑️  Đang xóa dữ liệu cũ...")
-Hospital.objects.all().delete()
-print("✓ Đã xóa xong")
-
 # Danh sách bệnh viện TP.HCM
 hospitals_data = [
     {
@@ -134,14 +130,12 @@ hospitals_data = [
     },
 ]
 
-# Thêm dữ liệu mới
-print("📝  Đang thêm dữ liệu bệnh viện mới...")
-for h in hospitals_data:
-    try:
-        Hospital.objects.create(**h)
-        print(f"  ✓ {h['name']}")
-    except Exception as e:
-        print(f"  ✗ {h['name']}: {e}")
+# Đồng bộ theo tên + tọa độ: chỉ ghi phần thay đổi, giữ nguyên id
+print("📝  Đang đồng bộ dữ liệu bệnh viện...")
+result = HospitalSync().run(hospitals_data)
+for position, h, errors in result.rejected:
+    print(f"  ✗ {h.get('name', '?')}: {errors}")
+print(f"  ✓ {result.summary()}")
 
 # Thống kê
 total = Hospital.objects.count()
@@ -1,5 +1,9 @@
+import csv
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin import AdminSite
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
@@ -58,6 +62,60 @@ class HospitalAdminSite(AdminSite):
 admin_site = HospitalAdminSite(name='hospital_admin')
 
 
+# ===========================
+# Xuất CSV
+# ===========================
+EXPORT_HEADER = [
+    'Tên', 'Tên tiếng Anh', 'Loại', 'Địa chỉ', 'Quận',
+    'Điện thoại', 'Email', 'Website', 'Chuyên khoa chính',
+    'Cấp cứu', 'Sức chứa', 'Kinh độ', 'Vĩ độ', 'Hoạt động'
+]
+
+EXPORT_FIELDS = [
+    'name', 'name_en', 'hospital_type', 'address', 'district',
+    'phone', 'email', 'website', 'main_specialty',
+    'emergency_services', 'capacity', 'longitude', 'latitude', 'is_active'
+]
+
+
+class Echo:
+    """File giả cho csv.writer: write() trả lại dòng vừa ghi để stream"""
+
+    def write(self, value):
+        return value
+
+
+def yes_no(value):
+    return 'Có' if value else 'Không'
+
+
+def csv_lines(queryset, chunk_size=None):
+    """Các dòng CSV của ``queryset``: đọc values() theo lô, tên hiển thị tra từ bảng dựng sẵn"""
+    chunk_size = chunk_size or getattr(settings, 'HOSPITAL_EXPORT_CHUNK_SIZE', 2000)
+    types, districts, specialties = Hospital.HOSPITAL_TYPE_LABELS, Hospital.DISTRICT_LABELS, Hospital.SPECIALTY_LABELS
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    rows = queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    for (name, name_en, hospital_type, address, district, phone, email, website, main_specialty,
+         emergency_services, capacity, longitude, latitude, is_active) in rows:
+        yield writer.writerow([
+            name,
+            name_en or '',
+            types.get(hospital_type, hospital_type),
+            address,
+            districts.get(district, district) if district else '',
+            phone or '',
+            email or '',
+            website or '',
+            specialties.get(main_specialty, main_specialty) if main_specialty else '',
+            yes_no(emergency_services),
+            capacity or '',
+            longitude or '',
+            latitude or '',
+            yes_no(is_active),
+        ])
+
+
 # ===========================
 # Custom Hospital Admin
 # ===========================
@@ -212,39 +270,10 @@ class HospitalAdmin(admin.ModelAdmin):
     deactivate_hospitals.short_description = _('Vô hiệu hóa các bệnh viện đã chọn')
     
     def export_to_csv(self, request, queryset):
-        """Xuất danh sách bệnh viện ra CSV"""
-        import csv
-        from django.http import HttpResponse
-        
-        response = HttpResponse(content_type='text/csv')
+        """Xuất danh sách bệnh viện ra CSV (streaming, đọc DB theo từng lô)"""
+        response = StreamingHttpResponse(csv_lines(queryset), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename="hospitals.csv"'
-        
-        writer = csv.writer(response)
-        writer.writerow([
-            'Tên', 'Tên tiếng Anh', 'Loại', 'Địa chỉ', 'Quận',
-            'Điện thoại', 'Email', 'Website', 'Chuyên khoa chính',
-            'Cấp cứu', 'Sức chứa', 'Kinh độ', 'Vĩ độ', 'Hoạt động'
-        ])
-        
-        for hospital in queryset:
-            writer.writerow([
-                hospital.name,
-                hospital.name_en or '',
-                hospital.get_hospital_type_display(),
-                hospital.address,
-                hospital.get_district_display() if hospital.district else '',
-                hospital.phone or '',
-                hospital.email or '',
-                hospital.website or '',
-                hospital.get_main_specialty_display() if hospital.main_specialty else '',
-                'Có' if hospital.emergency_services else 'Không',
-                hospital.capacity or '',
-                hospital.longitude or '',
-                hospital.latitude or '',
-                'Có' if hospital.is_active else 'Không'
-            ])
-        
-        self.message_user(request, _('📄 Đã xuất {} bệnh viện ra CSV.').format(queryset.count()))
+        self.message_user(request, _('📄 Đang xuất các bệnh viện đã chọn ra CSV.'))
         return response
     export_to_csv.short_description = _('Xuất ra CSV')
     
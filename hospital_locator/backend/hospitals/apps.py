@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index_after_migrate(sender, using='default', **kwargs):
+    """SQLite dựng lại bảng khi đổi cột, làm mất trigger của chỉ mục toàn văn"""
+    from .fulltext import ensure_search_index
+
+    ensure_search_index(connections[using])
 
 
 class HospitalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'hospitals'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(ensure_search_index_after_migrate, sender=self)
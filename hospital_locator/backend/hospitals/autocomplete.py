@@ -0,0 +1,207 @@
+"""
+Gợi ý khi gõ (autocomplete) cho tên bệnh viện, tên tiếng Anh và tên đường.
+
+Mỗi gợi ý ("term") là một cặp (loại, chuỗi hiển thị) kèm id các bệnh viện có
+chuỗi đó. Chuỗi được bỏ dấu (``fuzzy.fold``) rồi lưu trong hai mảng đã sắp xếp:
+
+- ``prefixes``: toàn bộ chuỗi, để "benh vien ch" khớp "Bệnh viện Chợ Rẫy";
+- ``inner``: phần đuôi bắt đầu từ mỗi từ sau từ đầu tiên, để "cho r" cũng khớp.
+
+Tra một tiền tố là một lần ``bisect`` rồi đọc tuần tự các phần tử liền sau, nên
+không phụ thuộc kích thước danh mục. Gợi ý khớp từ đầu chuỗi đứng trước gợi ý
+khớp giữa chuỗi; trong mỗi nhóm xếp theo thứ tự chữ cái.
+
+Khi một bệnh viện được lưu/xóa trong tiến trình này, chỉ các term của nó được
+thêm/bớt (``refresh_hospital``/``remove_hospital``); chỉ mục chỉ dựng lại toàn
+bộ khi phiên bản dữ liệu đổi vì thay đổi khác (tiến trình khác, cập nhật hàng loạt).
+Cập nhật và truy vấn giữ khóa của chỉ mục nên request không bao giờ đọc các mảng
+đang sửa dở.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+
+from .cache import catalog_version
+from .fuzzy import fold
+
+NAME, NAME_EN, STREET = 'name', 'name_en', 'street'
+
+# Phần số nhà ở đầu địa chỉ: "201B", "171/3", "414-420", "A5/22", "Số 1"
+HOUSE_NUMBER_RE = re.compile(r'^(?:số\s+)?\S*\d\S*\s+', re.IGNORECASE)
+
+
+def street_name(address):
+    """Tên đường từ địa chỉ: đoạn đầu tiên (theo dấu phẩy) mở đầu bằng số nhà"""
+    for part in (address or '').split(','):
+        part = part.strip()
+        match = HOUSE_NUMBER_RE.match(part)
+        if match and part[match.end():].strip():
+            return part[match.end():].strip()
+    return None
+
+
+def hospital_terms(name, name_en, address):
+    """Các term mà một bệnh viện đóng góp"""
+    terms = [(NAME, name.strip())] if name and name.strip() else []
+    if name_en and name_en.strip():
+        terms.append((NAME_EN, name_en.strip()))
+    street = street_name(address)
+    if street:
+        terms.append((STREET, street))
+    return terms
+
+
+class AutocompleteIndex:
+    def __init__(self, rows=()):
+        """``rows``: các bộ (id, name, name_en, address)"""
+        self.terms = {}      # term -> tập id bệnh viện
+        self.hospitals = {}  # id -> danh sách term
+        self.prefixes = []   # (chuỗi đã bỏ dấu, loại, chuỗi hiển thị)
+        self.inner = []      # (đuôi đã bỏ dấu, loại, chuỗi hiển thị)
+        # Cập nhật (signal) và truy vấn (request) chạy trên các luồng khác nhau
+        self.lock = threading.RLock()
+        for pk, name, name_en, address in rows:
+            terms = self.hospitals[pk] = hospital_terms(name, name_en, address)
+            for term in terms:
+                self.terms.setdefault(term, set()).add(pk)
+        for term in self.terms:
+            prefix, inner = self._keys(term)
+            self.prefixes.append(prefix)
+            self.inner.extend(inner)
+        self.prefixes.sort()
+        self.inner.sort()
+
+    def __len__(self):
+        return len(self.terms)
+
+    @staticmethod
+    def _keys(term):
+        kind, text = term
+        words = fold(text).split()
+        inner = [(' '.join(words[i:]), kind, text) for i in range(1, len(words))]
+        return (' '.join(words), kind, text), inner
+
+    # ===========================
+    # Cập nhật từng bệnh viện
+    # ===========================
+
+    def add(self, pk, name, name_en, address):
+        with self.lock:
+            self.remove(pk)
+            terms = hospital_terms(name, name_en, address)
+            self.hospitals[pk] = terms
+            for term in terms:
+                ids = self.terms.get(term)
+                if ids is None:
+                    ids = self.terms[term] = set()
+                    prefix, inner = self._keys(term)
+                    insort(self.prefixes, prefix)
+                    for key in inner:
+                        insort(self.inner, key)
+                ids.add(pk)
+
+    def remove(self, pk):
+        with self.lock:
+            for term in self.hospitals.pop(pk, ()):
+                ids = self.terms.get(term)
+                if ids is None:
+                    continue
+                ids.discard(pk)
+                if not ids:
+                    del self.terms[term]
+                    prefix, inner = self._keys(term)
+                    self._delete(self.prefixes, prefix)
+                    for key in inner:
+                        self._delete(self.inner, key)
+
+    @staticmethod
+    def _delete(keys, key):
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+
+    # ===========================
+    # Truy vấn
+    # ===========================
+
+    def suggest(self, text, limit=10):
+        """Tối đa ``limit`` gợi ý {'text', 'type', 'ids'} cho tiền tố ``text``"""
+        query = fold(text)
+        if not query:
+            return []
+        results, seen = [], set()
+        with self.lock:
+            for keys in (self.prefixes, self.inner):
+                position = bisect_left(keys, (query,))
+                while position < len(keys) and len(results) < limit:
+                    folded, kind, display = keys[position]
+                    if not folded.startswith(query):
+                        break
+                    position += 1
+                    term = (kind, display)
+                    if term in seen:
+                        continue
+                    seen.add(term)
+                    results.append({'text': display, 'type': kind, 'ids': sorted(self.terms[term])})
+        return results
+
+
+# ===========================
+# Chỉ mục dùng chung trong tiến trình
+# ===========================
+_lock = threading.Lock()
+_state = {'index': None, 'version': None}
+
+INDEX_FIELDS = ('name', 'name_en', 'address')
+
+
+def build_autocomplete_index():
+    """Dựng chỉ mục từ các bệnh viện đang hoạt động"""
+    from .models import Hospital
+
+    rows = Hospital.objects.filter(is_active=True).values_list('id', *INDEX_FIELDS)
+    return AutocompleteIndex(rows.iterator())
+
+
+def get_autocomplete_index(version=None):
+    """Chỉ mục hiện tại của tiến trình, dựng lại toàn bộ khi phiên bản dữ liệu đổi"""
+    if version is None:
+        version = catalog_version()
+    with _lock:
+        index = _state['index']
+        if index is None or _state['version'] != version:
+            index = build_autocomplete_index()
+            _state['index'] = index
+            _state['version'] = version
+        return index
+
+
+def _apply(change):
+    """Áp dụng thay đổi của một bệnh viện lên chỉ mục đã dựng (sau khi giao dịch commit).
+
+    Chỉ mục được gắn với phiên bản mới nên không phải dựng lại; nếu chỉ mục đang
+    cũ hơn thay đổi này thì để lần truy vấn sau dựng lại như bình thường.
+    """
+    with _lock:
+        index = _state['index']
+        if index is None:
+            return
+        version = catalog_version()
+        if version[0] != _state['version'][0] + 1:
+            # Có thay đổi khác chưa áp dụng (tiến trình khác, hoặc nhiều ghi trong một giao dịch)
+            _state['index'] = None
+            return
+        change(index)
+        _state['version'] = version
+
+
+def refresh_hospital(hospital):
+    if not hospital.is_active:
+        remove_hospital(hospital.pk)
+        return
+    values = (hospital.pk, hospital.name, hospital.name_en, hospital.address)
+    _apply(lambda index: index.add(*values))
+
+
+def remove_hospital(pk):
+    _apply(lambda index: index.remove(pk))
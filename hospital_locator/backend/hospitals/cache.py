@@ -0,0 +1,107 @@
+"""
+Phiên bản dữ liệu ("catalog version") và cache phản hồi theo phiên bản.
+
+Mỗi lần bệnh viện được lưu, xóa hoặc cập nhật hàng loạt, phiên bản được tăng
+trong cùng giao dịch (một dòng HospitalStat). Khóa cache chứa phiên bản nên sau
+khi dữ liệu đổi, mọi worker đều tra khóa mới và không bao giờ trả dữ liệu cũ;
+các khóa cũ tự hết hạn sau ``HOSPITAL_CACHE_TIMEOUT`` giây.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+CATALOG_VERSION = ('catalog', 'version')
+
+_metrics_lock = threading.Lock()
+_metrics = Counter()
+
+
+def _version_rows():
+    from .models import HospitalStat
+
+    dimension, value = CATALOG_VERSION
+    return HospitalStat.objects.filter(dimension=dimension, value=value)
+
+
+def catalog_version():
+    """(số phiên bản, thời điểm đổi gần nhất) của dữ liệu bệnh viện"""
+    row = _version_rows().values_list('count', 'updated_at').first()
+    return row if row is not None else (0, None)
+
+
+def request_catalog_version(request):
+    """Phiên bản dữ liệu đọc một lần cho mỗi request"""
+    version = getattr(request, '_catalog_version', None)
+    if version is None:
+        version = catalog_version()
+        request._catalog_version = version
+    return version
+
+
+def bump_catalog_version():
+    """Tăng phiên bản dữ liệu; gọi trong giao dịch của thao tác ghi"""
+    rows = _version_rows()
+    changes = {'count': F('count') + 1, 'updated_at': timezone.now()}
+    if not rows.update(**changes):
+        dimension, value = CATALOG_VERSION
+        rows.model.objects.get_or_create(dimension=dimension, value=value)
+        rows.update(**changes)
+
+
+def version_key(version):
+    """Chuỗi định danh phiên bản dùng trong khóa cache"""
+    number, updated_at = version
+    stamp = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return f'{number}.{stamp}'
+
+
+def get_cache():
+    return caches[getattr(settings, 'HOSPITAL_CACHE_ALIAS', 'default')]
+
+
+def record(name, hit, count=1):
+    """Đếm lượt trúng/trượt cache theo tên"""
+    if count:
+        with _metrics_lock:
+            _metrics[(name, 'hits' if hit else 'misses')] += count
+
+
+def cached_payload(name, build, version=None, variant=None):
+    """Dữ liệu phản hồi của ``name`` cho phiên bản hiện tại, tính bằng ``build()`` khi trượt.
+
+    ``variant`` phân biệt các phản hồi cùng loại (tham số khác nhau) mà vẫn đếm
+    trúng/trượt chung dưới ``name``.
+    """
+    if version is None:
+        version = catalog_version()
+    cache = get_cache()
+    key = f'hospitals:{name}:{version_key(version)}'
+    if variant is not None:
+        key = f'{key}:{variant}'
+    payload = cache.get(key)
+    record(name, payload is not None)
+    if payload is None:
+        payload = build()
+        cache.set(key, payload, getattr(settings, 'HOSPITAL_CACHE_TIMEOUT', 3600))
+    return payload
+
+
+def cache_metrics():
+    """Số lượt trúng/trượt của tiến trình hiện tại theo từng loại dữ liệu"""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    names = sorted({name for name, _ in snapshot})
+    result = {}
+    for name in names:
+        hits = snapshot.get((name, 'hits'), 0)
+        misses = snapshot.get((name, 'misses'), 0)
+        result[name] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+    return result
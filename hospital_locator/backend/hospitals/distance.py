@@ -0,0 +1,116 @@
+"""
+Tính khoảng cách Haversine dạng vector (NumPy) dùng chung cho các truy vấn GIS.
+
+Tọa độ được lấy thành mảng float64 qua ``values_list`` và toàn bộ khoảng cách
+được tính trong một lượt, không có vòng lặp Python theo từng bệnh viện.
+"""
+import math
+from itertools import chain
+
+import numpy as np
+
+from . import geohash
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def coordinate_arrays(queryset):
+    """Trả về (ids, lats, lngs) của queryset, giữ nguyên thứ tự sắp xếp.
+
+    Các bệnh viện chưa có tọa độ bị loại bỏ.
+    """
+    rows = queryset.filter(
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).values_list('id', 'latitude', 'longitude')
+    flat = np.fromiter(chain.from_iterable(rows), dtype=np.float64)
+    table = flat.reshape(-1, 3)
+    return table[:, 0].astype(np.int64), table[:, 1], table[:, 2]
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """Khoảng cách (km) từ điểm (lat, lng) tới từng điểm trong ``lats``/``lngs``"""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(lats)
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(lats1, lngs1, lats2, lngs2):
+    """Ma trận khoảng cách (km) shape (len(lats1), len(lats2)) bằng broadcasting"""
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lng1 = np.asarray(lngs1, dtype=np.float64)[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    dlon = np.radians(np.asarray(lngs2, dtype=np.float64)[None, :] - lng1)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def nearest_positions(distances, k=None, max_distance=None):
+    """Vị trí các phần tử gần nhất, tăng dần theo khoảng cách.
+
+    Dùng ``argpartition`` để chọn k phần tử nhỏ nhất trước khi sắp xếp, nên chi
+    phí sắp xếp chỉ phụ thuộc vào k. Khi bằng khoảng cách, vị trí nhỏ hơn đứng
+    trước (giữ thứ tự của queryset).
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    if max_distance is not None:
+        candidates = np.flatnonzero(distances <= max_distance)
+    else:
+        candidates = np.arange(len(distances))
+
+    if k is not None and k < len(candidates):
+        if k <= 0:
+            return candidates[:0]
+        subset = distances[candidates]
+        kth = subset[np.argpartition(subset, k - 1)[k - 1]]
+        # Giữ mọi phần tử bằng phần tử thứ k để thứ tự khi hòa là ổn định
+        candidates = candidates[subset <= kth]
+
+    order = np.argsort(distances[candidates], kind='stable')
+    return candidates[order][:k]
+
+
+def rank_by_distance(lat, lng, ids, lats, lngs, k=None, max_distance=None):
+    """Xếp hạng các bệnh viện theo khoảng cách, trả về danh sách (id, km)"""
+    distances = haversine_km(lat, lng, lats, lngs)
+    positions = nearest_positions(distances, k=k, max_distance=max_distance)
+    return list(zip(ids[positions].tolist(), distances[positions].tolist()))
+
+
+def bounding_box(lat, lng, radius):
+    """Hộp bao (min_lat, max_lat, min_lng, max_lng) chứa trọn vòng tròn bán kính ``radius`` km.
+
+    Khi vòng tròn chứa cực hoặc vượt kinh tuyến 180°, không giới hạn kinh độ
+    (min_lng/max_lng là None).
+    """
+    angular = radius / EARTH_RADIUS_KM
+    dlat = math.degrees(angular)
+    min_lat, max_lat = lat - dlat, lat + dlat
+    if min_lat <= -90 or max_lat >= 90 or angular >= math.pi / 2:
+        return max(min_lat, -90.0), min(max_lat, 90.0), None, None
+
+    dlng = math.degrees(math.asin(min(1.0, math.sin(angular) / math.cos(math.radians(lat)))))
+    min_lng, max_lng = lng - dlng, lng + dlng
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def within_radius(queryset, lat, lng, radius, k=None):
+    """Bệnh viện trong bán kính ``radius`` km, trả về danh sách (id, km).
+
+    Hộp bao được đẩy xuống SQL (``latitude__range``/``longitude__range``) để dùng
+    chỉ mục (latitude, longitude), cùng với 9 ô geohash quanh điểm truy vấn để
+    dùng chỉ mục geohash; Haversine chính xác chỉ chạy trên các dòng còn lại.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius)
+    cells = geohash.neighbourhood(lat, lng, radius)
+    if cells:
+        queryset = queryset.filter(geohash.prefix_q(cells))
+    queryset = queryset.filter(latitude__range=(min_lat, max_lat))
+    if min_lng is not None:
+        queryset = queryset.filter(longitude__range=(min_lng, max_lng))
+    return rank_by_distance(lat, lng, *coordinate_arrays(queryset), k=k, max_distance=radius)
@@ -0,0 +1,17 @@
+from rest_framework import filters
+
+from . import fulltext, fuzzy
+
+
+class HospitalSearchFilter(filters.SearchFilter):
+    """``?search=`` qua chỉ mục toàn văn thay vì icontains trên từng cột, gần đúng nếu không khớp"""
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        search_terms = self.get_search_terms(request)
+        if not search_fields or not search_terms:
+            return queryset
+        if not fulltext.is_supported() or not set(search_fields) <= set(fulltext.SEARCH_COLUMNS):
+            # Backend không có chỉ mục, hoặc trường có tiền tố lookup (^, =, @, $)/không được đánh chỉ mục
+            return super().filter_queryset(request, queryset, view)
+        return fuzzy.matching(queryset, ' '.join(search_terms), search_fields)
@@ -0,0 +1,83 @@
+"""
+Cache dữ liệu đã serialize của từng bệnh viện ("fragment").
+
+Serialize 28 field cùng ``full_address`` và các ``*_display`` cho mỗi dòng ở mỗi
+request là tốn kém. Kết quả của một bệnh viện chỉ phụ thuộc vào bản ghi, nên được lưu trong cache theo khóa (id, updated_at) và các
+response danh sách chỉ ghép các fragment lại, thêm phần riêng của request (như
+``distance``) khi cần. Fragment đã đọc được giữ thêm trong bộ nhớ tiến trình (LRU
+tối đa ``MAX_LOCAL_FRAGMENTS`` bệnh viện) để không phải giải nén từ cache dùng
+chung ở mỗi request.
+
+Mọi đường ghi đổi cột hiển thị đều đổi ``updated_at`` (auto_now khi save,
+HospitalQuerySet.update cho cập nhật hàng loạt) nên fragment cũ không bao giờ được
+dùng lại; cập nhật chỉ cột suy ra (``geohash``) giữ nguyên fragment. Fragment của
+phiên bản trước bị xóa khi lưu/xóa hoặc tự hết hạn.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache import get_cache, record
+
+# Fragment đã dùng trong tiến trình (LRU): id -> (khóa fragment, dữ liệu). Mỗi
+# bệnh viện giữ một mục nên fragment của phiên bản cũ bị thay ngay khi đọc bản mới
+MAX_LOCAL_FRAGMENTS = 20000
+_lock = threading.Lock()
+_local = OrderedDict()
+
+
+def fragment_key(pk, updated_at):
+    stamp = int(updated_at.timestamp() * 1_000_000) if updated_at else 0
+    return f'hospitals:fragment:{pk}:{stamp}'
+
+
+def hospital_rows(rows):
+    """Dữ liệu HospitalListSerializer của các dòng ``values(*HospitalRowSerializer.value_fields)``.
+
+    Giữ nguyên thứ tự; mỗi phần tử là một dict mới, có thể sửa/thêm khóa mà
+    không ảnh hưởng cache.
+    """
+    from .serializers import HospitalRowSerializer
+
+    rows = list(rows)
+    keys = [fragment_key(row['id'], row['updated_at']) for row in rows]
+    hits = {}
+    with _lock:
+        for row, key in zip(rows, keys):
+            entry = _local.get(row['id'])
+            if entry is not None and entry[0] == key:
+                _local.move_to_end(row['id'])
+                hits[key] = entry[1]
+    missing = {key: row for key, row in zip(keys, rows) if key not in hits}
+    record('fragments', True, len(rows) - len(missing))
+
+    if missing:
+        cache = get_cache()
+        found = cache.get_many(list(missing))
+        record('fragments', True, len(found))
+        record('fragments', False, len(missing) - len(found))
+        unrendered = [(key, row) for key, row in missing.items() if key not in found]
+        if unrendered:
+            serialized = HospitalRowSerializer().serialize_many(row for _, row in unrendered)
+            fresh = {key: data for (key, _), data in zip(unrendered, serialized)}
+            cache.set_many(fresh, getattr(settings, 'HOSPITAL_CACHE_TIMEOUT', 3600))
+            found.update(fresh)
+        with _lock:
+            for key, data in found.items():
+                pk = missing[key]['id']
+                _local[pk] = (key, data)
+                _local.move_to_end(pk)
+            while len(_local) > MAX_LOCAL_FRAGMENTS:
+                _local.popitem(last=False)
+        hits.update(found)
+    return [dict(hits[key]) for key in keys]
+
+
+def forget_fragment(hospital):
+    """Xóa fragment ứng với ``updated_at`` hiện có trên instance"""
+    if hospital.pk is not None and hospital.updated_at is not None:
+        key = fragment_key(hospital.pk, hospital.updated_at)
+        with _lock:
+            _local.pop(hospital.pk, None)
+        get_cache().delete(key)
@@ -0,0 +1,208 @@
+"""
+Chỉ mục toàn văn cho tìm kiếm theo từ khóa.
+
+``icontains`` trên nhiều cột buộc CSDL quét toàn bảng và so khớp chuỗi ở mỗi
+dòng. Ở đây các cột tìm kiếm được đánh chỉ mục theo từ:
+
+- SQLite: bảng ảo FTS5 ``hospitals_hospital_fts`` (external content trỏ vào bảng
+  bệnh viện), giữ đồng bộ bằng trigger nên mọi đường ghi (save, update hàng loạt,
+  SQL thô) đều cập nhật chỉ mục. Tokenizer ``unicode61`` bỏ dấu nên "benh vien"
+  khớp "Bệnh viện".
+- PostgreSQL: cột sinh ``search_vector`` (tsvector, trọng số A-D theo cột) cùng
+  chỉ mục GIN.
+
+Mỗi từ trong truy vấn được so khớp theo tiền tố và mọi từ đều phải khớp (AND),
+kết quả xếp hạng theo BM25 (SQLite) hoặc ``ts_rank`` (PostgreSQL). Backend khác
+quay về ``icontains`` như trước.
+"""
+import re
+from functools import reduce
+from operator import or_
+
+from django.db import connection as default_connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLE = 'hospitals_hospital'
+FTS_TABLE = 'hospitals_hospital_fts'
+VECTOR_COLUMN = 'search_vector'
+VECTOR_INDEX = 'hospitals_hospital_search_idx'
+
+# Cột được đánh chỉ mục và trọng số xếp hạng (tên khớp nặng hơn địa chỉ)
+SEARCH_COLUMNS = ['name', 'name_en', 'address', 'phone']
+WEIGHTS = {'name': 10.0, 'name_en': 5.0, 'address': 2.0, 'phone': 1.0}
+PG_WEIGHTS = {'name': 'A', 'name_en': 'B', 'address': 'C', 'phone': 'D'}
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, name_en, address, phone)
+            VALUES (new.id, new.name, new.name_en, new.address, new.phone);
+        END
+    """,
+    f'{FTS_TABLE}_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, name_en, address, phone)
+            VALUES ('delete', old.id, old.name, old.name_en, old.address, old.phone);
+        END
+    """,
+    # Chỉ đánh lại chỉ mục khi cột tìm kiếm đổi (không phải mỗi lần đổi updated_at)
+    f'{FTS_TABLE}_au': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name, name_en, address, phone
+        ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, name_en, address, phone)
+            VALUES ('delete', old.id, old.name, old.name_en, old.address, old.phone);
+            INSERT INTO {FTS_TABLE}(rowid, name, name_en, address, phone)
+            VALUES (new.id, new.name, new.name_en, new.address, new.phone);
+        END
+    """,
+}
+
+WORD_RE = re.compile(r'\w+')
+
+
+def is_supported(connection=None):
+    return (connection or default_connection).vendor in ('sqlite', 'postgresql')
+
+
+def terms(text):
+    """Các từ của truy vấn (bỏ dấu câu và ký tự đặc biệt của cú pháp FTS)"""
+    return WORD_RE.findall(text or '')
+
+
+def match_expression(words, columns=None, vendor='sqlite'):
+    """Biểu thức MATCH (FTS5) hoặc tsquery: mọi từ, so khớp tiền tố"""
+    columns = columns or SEARCH_COLUMNS
+    everywhere = set(columns) >= set(SEARCH_COLUMNS)
+    if vendor == 'postgresql':
+        weights = '' if everywhere else ''.join(PG_WEIGHTS[column] for column in columns)
+        return ' & '.join(f'{word}:*{weights}' for word in words)
+    expression = ' '.join(f'"{word}"*' for word in words)
+    return expression if everywhere else f"{{{' '.join(columns)}}} : ({expression})"
+
+
+def _match_sql(words, columns, vendor, score=False):
+    """SQL chọn id (kèm điểm nếu ``score``, nhỏ hơn là tốt hơn) của các bản ghi khớp"""
+    params = [match_expression(words, columns, vendor)]
+    if vendor == 'postgresql':
+        rank = f", -ts_rank({VECTOR_COLUMN}, to_tsquery('simple', %s))" if score else ''
+        sql = f"SELECT id{rank} FROM {TABLE} WHERE {VECTOR_COLUMN} @@ to_tsquery('simple', %s)"
+        return sql, params * 2 if score else params
+    weights = ', '.join(str(WEIGHTS[column]) for column in SEARCH_COLUMNS)
+    rank = f', bm25({FTS_TABLE}, {weights})' if score else ''
+    return f'SELECT rowid{rank} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', params
+
+
+def _icontains(text, columns):
+    return reduce(or_, (Q(**{f'{column}__icontains': text}) for column in columns))
+
+
+def matching(queryset, text, columns=None):
+    """Lọc queryset theo từ khóa qua chỉ mục toàn văn (không đổi thứ tự)"""
+    columns = columns or SEARCH_COLUMNS
+    if not is_supported():
+        return queryset.filter(_icontains(text, columns))
+    words = terms(text)
+    if not words:
+        return queryset.none()
+    return queryset.filter(pk__in=RawSQL(*_match_sql(words, columns, default_connection.vendor)))
+
+
+def ranked(queryset, text, columns=None):
+    """Danh sách (id, điểm) các bản ghi của queryset khớp từ khóa, tốt nhất trước.
+
+    Điểm càng nhỏ càng liên quan; hòa điểm thì theo id. Backend không có chỉ mục
+    toàn văn trả điểm 0 cho mọi bản ghi khớp ``icontains``.
+    """
+    columns = columns or SEARCH_COLUMNS
+    if not is_supported():
+        ids = matching(queryset, text, columns).order_by().values_list('id', flat=True)
+        return sorted((pk, 0.0) for pk in ids)
+    words = terms(text)
+    if not words:
+        return []
+    vendor = default_connection.vendor
+    sql, params = _match_sql(words, columns, vendor, score=True)
+    # Phạm vi của queryset chỉ xét các id đã khớp (tra theo khóa chính, không quét bảng)
+    scope = queryset.filter(pk__in=RawSQL('SELECT id FROM matched', [])).order_by().values('id')
+    scope, scope_params = scope.query.sql_with_params()
+    # MATERIALIZED: chạy truy vấn chỉ mục một lần rồi mới lọc theo queryset; nếu để
+    # SQLite đẩy điều kiện IN vào bảng ảo, MATCH bị đánh giá lại cho từng id
+    with default_connection.cursor() as cursor:
+        cursor.execute(
+            f'WITH matched(id, score) AS MATERIALIZED ({sql}) '
+            f'SELECT id, score FROM matched WHERE id IN ({scope})',
+            [*params, *scope_params],
+        )
+        scores = sorted((score, pk) for pk, score in cursor.fetchall())
+    return [(pk, score) for score, pk in scores]
+
+
+def ensure_search_index(connection=None):
+    """Tạo chỉ mục toàn văn nếu chưa có; trả về True nếu vừa tạo (và đã nạp dữ liệu).
+
+    Gọi sau mỗi lần migrate: SQLite dựng lại bảng khi đổi cột nên trigger có thể
+    mất theo bảng cũ.
+    """
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            names = [FTS_TABLE, *SQLITE_TRIGGERS]
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE name IN ({', '.join(['%s'] * len(names))})", names
+            )
+            if len(cursor.fetchall()) == len(names):
+                return False
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"{', '.join(SEARCH_COLUMNS)}, content='{TABLE}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            )
+            for sql in SQLITE_TRIGGERS.values():
+                cursor.execute(sql)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            return True
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT 1 FROM information_schema.columns WHERE table_name = %s AND column_name = %s",
+                [TABLE, VECTOR_COLUMN],
+            )
+            if cursor.fetchone():
+                return False
+            vector = ' || '.join(
+                f"setweight(to_tsvector('simple', coalesce({column}, '')), '{PG_WEIGHTS[column]}')"
+                for column in SEARCH_COLUMNS
+            )
+            cursor.execute(
+                f'ALTER TABLE {TABLE} ADD COLUMN {VECTOR_COLUMN} tsvector '
+                f'GENERATED ALWAYS AS ({vector}) STORED'
+            )
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {VECTOR_INDEX} ON {TABLE} USING GIN ({VECTOR_COLUMN})')
+            return True
+    return False
+
+
+def drop_search_index(connection=None):
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'ALTER TABLE {TABLE} DROP COLUMN IF EXISTS {VECTOR_COLUMN}')
+
+
+def rebuild_search_index(connection=None):
+    """Nạp lại toàn bộ chỉ mục từ bảng bệnh viện; trả về số bản ghi đã đánh chỉ mục"""
+    connection = connection or default_connection
+    if not ensure_search_index(connection):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            elif connection.vendor == 'postgresql':
+                # Cột sinh luôn đúng; chỉ dựng lại chỉ mục GIN
+                cursor.execute(f'REINDEX INDEX {VECTOR_INDEX}')
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,214 @@
+"""
+Tìm gần đúng theo trigram trên tên/địa chỉ đã bỏ dấu.
+
+Chỉ mục toàn văn (``fulltext``) chỉ khớp khi từ gõ vào là tiền tố của một từ
+trong dữ liệu, nên "benh vien cho rayy" hay "nhi dongg" không ra kết quả. Ở đây
+các cột tìm kiếm (mặc định tên, tên tiếng Anh và địa chỉ) được bỏ dấu (``fold``)
+và tách từ. Mỗi từ của truy vấn được so với từ vựng của danh mục theo trigram
+(như ``word_similarity`` của pg_trgm) và phải gần một từ của bệnh viện; điểm của
+bệnh viện là tỉ lệ trigram của truy vấn khớp theo các từ gần nhất đó. Danh sách
+từ theo trigram và bệnh viện theo từ là các đoạn của mảng NumPy nên đếm trigram
+trùng cho cả từ vựng chỉ là một ``np.bincount`` mỗi từ của truy vấn.
+
+Chỉ mục nằm trong bộ nhớ tiến trình (một chỉ mục cho mỗi tập cột) và gắn với
+phiên bản dữ liệu như chỉ mục không gian. Tìm gần đúng chỉ chạy khi chỉ mục toàn
+văn không tìm thấy gì; ứng viên được lọc theo queryset (quận, loại, chuyên
+khoa...) trước khi cắt theo ``HOSPITAL_FUZZY_LIMIT``.
+"""
+import re
+import threading
+import unicodedata
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from . import fulltext
+from .cache import catalog_version
+
+NON_WORD_RE = re.compile(r'[\W_]+')
+
+# Cột được đánh chỉ mục trigram khi không chỉ rõ
+FUZZY_COLUMNS = ['name', 'name_en', 'address']
+
+
+def fold(text):
+    """Chữ thường, bỏ dấu tiếng Việt (kể cả đ), chỉ giữ chữ và số"""
+    text = (text or '').lower()
+    if not text.isascii():
+        text = unicodedata.normalize('NFD', text.replace('đ', 'd'))
+        text = ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+    return NON_WORD_RE.sub(' ', text).strip()
+
+
+def word_trigrams(word):
+    """Trigram của một từ, đệm như pg_trgm: hai khoảng trắng trước, một sau"""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Chỉ mục trigram theo từ: trigram -> từ trong từ vựng, từ -> vị trí bệnh viện (cả hai dạng CSR)"""
+
+    def __init__(self, ids, texts):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.grams = {}
+        self.words = {}
+        tokens = {}
+        counts, flat = [], []
+        for text in texts:
+            words = set()
+            for token in text.split():
+                # Tên đường, "Bệnh viện"... lặp lại rất nhiều: bỏ dấu mỗi từ một lần
+                token_words = tokens.get(token)
+                if token_words is None:
+                    token_words = tokens[token] = [self._word_id(word) for word in fold(token).split()]
+                words.update(token_words)
+            counts.append(len(words))
+            flat.extend(words)
+
+        self.word_positions, self.word_offsets = self._csr(flat, counts, len(self.words))
+        word_grams = [
+            [self.grams.setdefault(gram, len(self.grams)) for gram in word_trigrams(word)] for word in self.words
+        ]
+        self.word_gram_counts = np.array([len(grams) for grams in word_grams], dtype=np.int64)
+        self.gram_words, self.gram_offsets = self._csr(
+            [gram for grams in word_grams for gram in grams], [len(grams) for grams in word_grams], len(self.grams),
+        )
+
+    def _word_id(self, word):
+        return self.words.setdefault(word, len(self.words))
+
+    @staticmethod
+    def _csr(keys, counts, size):
+        """(giá trị, offsets) sao cho các giá trị của khóa k là values[offsets[k]:offsets[k + 1]]"""
+        keys = np.array(keys, dtype=np.int64)
+        values = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+        order = np.argsort(keys, kind='stable')
+        return values[order], np.concatenate(([0], np.cumsum(np.bincount(keys, minlength=size))))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _word_hits(self, word, word_threshold):
+        """Số trigram của ``word`` khớp với từ gần nhất trong mỗi bệnh viện (0 nếu không từ nào đủ giống)"""
+        grams = word_trigrams(word)
+        found = [
+            self.gram_words[self.gram_offsets[gram]:self.gram_offsets[gram + 1]]
+            for gram in (self.grams.get(gram) for gram in grams) if gram is not None
+        ]
+        best = np.zeros(len(self.ids), dtype=np.int64)
+        if not found:
+            return best
+        hits = np.bincount(np.concatenate(found), minlength=len(self.words))
+        # Độ giống hai chiều (Jaccard) để "nhi" không gần "nhuan" chỉ nhờ chung tiền tố
+        similarity = hits / (len(grams) + self.word_gram_counts - hits)
+        close = np.flatnonzero((hits > 0) & (similarity >= word_threshold))
+        # Gán theo số trigram tăng dần để từ gần nhất ghi sau cùng
+        for word_id in close[np.argsort(hits[close], kind='stable')].tolist():
+            best[self.word_positions[self.word_offsets[word_id]:self.word_offsets[word_id + 1]]] = hits[word_id]
+        return best
+
+    def search(self, text, threshold=0.6, limit=None, word_threshold=0.4):
+        """Danh sách (id, khoảng cách) gần nhất trước.
+
+        Mỗi từ của truy vấn phải gần một từ của bệnh viện (trigram chung / hợp
+        trigram của hai từ ít nhất ``word_threshold``), nên "benh vien zzz"
+        không khớp mọi bệnh viện chỉ nhờ "benh vien". Khoảng cách = 1 - tỉ lệ
+        trigram của cả truy vấn khớp theo các từ gần nhất đó, phải không quá
+        ``1 - threshold``.
+        """
+        words = list(dict.fromkeys(fold(text).split()))
+        if not words:
+            return []
+        present = np.ones(len(self.ids), dtype=bool)
+        matched = np.zeros(len(self.ids), dtype=np.int64)
+        for word in words:
+            best = self._word_hits(word, word_threshold)
+            present &= best > 0
+            if not present.any():
+                return []
+            matched += best
+        positions = np.flatnonzero(present)
+        scores = matched[positions] / sum(len(word_trigrams(word)) for word in words)
+        keep = scores >= threshold
+        positions, scores = positions[keep], scores[keep]
+        order = np.lexsort((self.ids[positions], -scores))
+        if limit is not None:
+            order = order[:limit]
+        return [(int(pk), float(1.0 - score)) for pk, score in zip(self.ids[positions[order]], scores[order])]
+
+
+# ===========================
+# Chỉ mục dùng chung trong tiến trình
+# ===========================
+_lock = threading.Lock()
+_state = {'indexes': {}, 'version': None}
+
+
+def build_trigram_index(columns=None):
+    """Dựng chỉ mục trên ``columns`` của các bệnh viện đang hoạt động"""
+    from .models import Hospital
+
+    rows = Hospital.objects.filter(is_active=True).order_by('id').values_list('id', *(columns or FUZZY_COLUMNS))
+    ids, texts = [], []
+    for pk, *values in rows.iterator():
+        ids.append(pk)
+        texts.append(' '.join(value for value in values if value))
+    return TrigramIndex(ids, texts)
+
+
+def get_trigram_index(columns=None):
+    """Chỉ mục hiện tại của tiến trình cho ``columns``, dựng lại khi phiên bản dữ liệu đổi"""
+    columns = tuple(columns or FUZZY_COLUMNS)
+    version = catalog_version()
+    with _lock:
+        if _state['version'] != version:
+            _state['indexes'] = {}
+            _state['version'] = version
+        index = _state['indexes'].get(columns)
+        if index is None:
+            index = _state['indexes'][columns] = build_trigram_index(columns)
+        return index
+
+
+def enabled():
+    return getattr(settings, 'HOSPITAL_FUZZY_SEARCH_ENABLED', True)
+
+
+def _allowed(queryset, ids):
+    """Các id trong ``ids`` thuộc ``queryset``"""
+    batch_size = connection.features.max_query_params or len(ids) or 1
+    allowed = set()
+    for start in range(0, len(ids), batch_size):
+        allowed.update(queryset.filter(pk__in=ids[start:start + batch_size]).values_list('id', flat=True))
+    return allowed
+
+
+def similar(text, queryset=None, columns=None):
+    """(id, khoảng cách) các bệnh viện đang hoạt động (trong ``queryset`` nếu có) gần giống ``text``"""
+    matches = get_trigram_index(columns).search(
+        text,
+        threshold=getattr(settings, 'HOSPITAL_FUZZY_THRESHOLD', 0.6),
+        word_threshold=getattr(settings, 'HOSPITAL_FUZZY_WORD_THRESHOLD', 0.4),
+    )
+    if queryset is not None and matches:
+        allowed = _allowed(queryset, [pk for pk, _ in matches])
+        matches = [(pk, distance) for pk, distance in matches if pk in allowed]
+    return matches[:getattr(settings, 'HOSPITAL_FUZZY_LIMIT', 200)]
+
+
+def ranked(queryset, text, columns=None):
+    """Như ``fulltext.ranked``; không có kết quả thì xếp theo độ giống trigram"""
+    matches = fulltext.ranked(queryset, text, columns)
+    if matches or not enabled():
+        return matches
+    return similar(text, queryset, columns)
+
+
+def matching(queryset, text, columns=None):
+    """Như ``fulltext.matching``; không có kết quả thì lọc theo độ giống trigram"""
+    found = fulltext.matching(queryset, text, columns)
+    if not enabled() or found.exists():
+        return found
+    return queryset.filter(pk__in=[pk for pk, _ in similar(text, queryset, columns)])
@@ -0,0 +1,148 @@
+"""
+Mã hóa/giải mã Geohash và chọn vùng 9 ô lân cận cho truy vấn theo tiền tố.
+
+Geohash biến (vĩ độ, kinh độ) thành chuỗi base32 mà các điểm gần nhau có chung
+tiền tố, nên một chỉ mục B-tree thông thường (SQLite, PostgreSQL không cần
+PostGIS) có thể trả lời truy vấn theo ô bằng các khoảng ``[ô, ô + '~')``.
+"""
+import math
+
+from django.db.models import Q
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_DECODE = {char: value for value, char in enumerate(BASE32)}
+
+# Độ chính xác lưu trong Hospital.geohash (~4.8m x 4.8m)
+DEFAULT_PRECISION = 9
+MAX_PRECISION = 12
+
+KM_PER_DEGREE = 111.195
+
+# Ký tự lớn hơn mọi ký tự base32, dùng làm cận trên của khoảng tiền tố
+_PREFIX_END = '~'
+
+
+def encode(lat, lng, precision=DEFAULT_PRECISION):
+    """Mã hóa (vĩ độ, kinh độ) thành geohash độ dài ``precision``"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # Bit chẵn chia kinh độ, bit lẻ chia vĩ độ
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                value = (value << 1) | 1
+                lng_range[0] = mid
+            else:
+                value <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                value = (value << 1) | 1
+                lat_range[0] = mid
+            else:
+                value <<= 1
+                lat_range[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def bounds(geohash):
+    """Khung (min_lat, max_lat, min_lng, max_lng) của một ô geohash"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        try:
+            value = _DECODE[char]
+        except KeyError:
+            raise ValueError(f'Ký tự geohash không hợp lệ: {char!r}')
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            target[1 - bit] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def decode(geohash):
+    """Tâm ô geohash và sai số: (lat, lng, lat_err, lng_err)"""
+    min_lat, max_lat, min_lng, max_lng = bounds(geohash)
+    return (
+        (min_lat + max_lat) / 2,
+        (min_lng + max_lng) / 2,
+        (max_lat - min_lat) / 2,
+        (max_lng - min_lng) / 2,
+    )
+
+
+def cell_size(precision):
+    """Kích thước ô (độ vĩ, độ kinh) ở độ chính xác ``precision``"""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def neighbors(geohash):
+    """8 ô kề quanh ``geohash`` (bỏ qua các ô vượt quá cực)"""
+    lat, lng, lat_err, lng_err = decode(geohash)
+    precision = len(geohash)
+    cells = []
+    for dlat in (-1, 0, 1):
+        for dlng in (-1, 0, 1):
+            if dlat == 0 and dlng == 0:
+                continue
+            cell_lat = lat + dlat * 2 * lat_err
+            if not -90 < cell_lat < 90:
+                continue
+            cell_lng = (lng + dlng * 2 * lng_err + 180) % 360 - 180
+            cells.append(encode(cell_lat, cell_lng, precision))
+    return cells
+
+
+def precision_for_radius(lat, radius):
+    """Độ chính xác lớn nhất mà mỗi ô vẫn cao và rộng hơn ``radius`` km.
+
+    Khi đó 9 ô quanh điểm truy vấn chắc chắn phủ hết vòng tròn bán kính
+    ``radius``. Trả về None nếu bán kính lớn hơn cả ô độ chính xác 1.
+    """
+    # Chiều rộng ô nhỏ nhất tại vĩ độ xa xích đạo nhất mà vòng tròn chạm tới
+    edge_lat = min(89.9, abs(lat) + radius / KM_PER_DEGREE)
+    cos_lat = math.cos(math.radians(edge_lat))
+    best = None
+    for precision in range(1, MAX_PRECISION + 1):
+        lat_deg, lng_deg = cell_size(precision)
+        height = lat_deg * KM_PER_DEGREE
+        width = lng_deg * KM_PER_DEGREE * cos_lat
+        if height < radius or width < radius:
+            break
+        best = precision
+    return best
+
+
+def neighbourhood(lat, lng, radius):
+    """Ô chứa điểm truy vấn và 8 ô kề, đủ phủ vòng tròn bán kính ``radius`` km"""
+    precision = precision_for_radius(lat, radius)
+    if precision is None:
+        return []
+    center = encode(lat, lng, precision)
+    return sorted({center, *neighbors(center)})
+
+
+def prefix_q(cells, field='geohash'):
+    """Q lọc theo tiền tố dạng khoảng để dùng được chỉ mục B-tree trên mọi backend"""
+    query = Q()
+    for cell in cells:
+        query |= Q(**{f'{field}__gte': cell, f'{field}__lt': cell + _PREFIX_END})
+    return query
@@ -0,0 +1,54 @@
+"""
+Xuất bệnh viện dạng GeoJSON FeatureCollection (RFC 7946) theo kiểu streaming.
+
+Mỗi bệnh viện có tọa độ là một Feature kiểu Point (``[kinh độ, vĩ độ]``, WGS84),
+``id`` là id bệnh viện và ``properties`` là các field được chọn của
+HospitalRowSerializer, nên giá trị giống hệt endpoint danh sách. Các dòng
+``values()`` được đọc bằng iterator theo lô và mỗi lô được ghi ra ngay, nên cả
+tài liệu không bao giờ nằm trọn trong bộ nhớ. Tọa độ được làm tròn theo
+``precision`` (6 chữ số ≈ 0,1 m) để giảm kích thước phản hồi.
+"""
+import json
+from itertools import islice
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .serializers import HospitalRowSerializer
+
+# Properties mặc định: đủ để vẽ và lọc marker trên bản đồ
+DEFAULT_PROPERTIES = ['name', 'hospital_type', 'district', 'main_specialty', 'emergency_services']
+
+COORDINATE_COLUMNS = ['latitude', 'longitude']
+
+
+def _dumps(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def feature_collection(queryset, properties=None, precision=6, chunk_size=2000):
+    """Các đoạn văn bản của FeatureCollection gồm các bệnh viện có tọa độ trong ``queryset``"""
+    serializer = HospitalRowSerializer(DEFAULT_PROPERTIES if properties is None else properties)
+    columns = serializer.columns()
+    columns += [name for name in COORDINATE_COLUMNS if name not in columns]
+    rows = queryset.filter(
+        latitude__isnull=False, longitude__isnull=False
+    ).values(*columns).iterator(chunk_size=chunk_size)
+
+    yield '{"type":"FeatureCollection","features":['
+    separator = ''
+    while chunk := list(islice(rows, chunk_size)):
+        parts = [
+            _dumps({
+                'type': 'Feature',
+                'id': row['id'],
+                'geometry': {
+                    'type': 'Point',
+                    'coordinates': [round(row['longitude'], precision), round(row['latitude'], precision)],
+                },
+                'properties': values,
+            })
+            for row, values in zip(chunk, serializer.serialize_many(chunk))
+        ]
+        yield separator + ','.join(parts)
+        separator = ','
+    yield ']}'
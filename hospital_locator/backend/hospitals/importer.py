@@ -0,0 +1,355 @@
+"""
+Nạp dữ liệu bệnh viện hàng loạt.
+
+Mọi bản ghi được kiểm tra trước khi ghi (trường lạ, trường bắt buộc, kiểu dữ
+liệu, độ dài, URL/email, tọa độ); bản ghi lỗi bị loại ra kèm lý do thay vì làm
+hỏng cả lần nạp. Các bản ghi hợp lệ được ghi bằng ``bulk_create`` theo lô trong
+một giao dịch duy nhất: dữ liệu cũ chỉ bị xóa trong cùng giao dịch đó, nên người
+đọc luôn thấy trọn bộ dữ liệu cũ cho tới khi bộ mới được commit, không bao giờ
+thấy bảng rỗng hay nạp dở.
+
+Bản ghi được đọc và ghi theo từng lô cố định (``batch_size``), nên với nguồn là
+iterator (``hospitals.readers``) bộ nhớ dùng không phụ thuộc kích thước tệp; bản
+ghi lỗi có thể được chuyển thẳng ra ngoài (``on_reject``) thay vì giữ lại.
+
+``HospitalSync`` là chế độ đồng bộ: thay vì xóa hết rồi tạo lại, mỗi bản ghi
+được so với bệnh viện hiện có cùng khóa tự nhiên (tên đã bỏ dấu + tọa độ làm
+tròn, ``natural_key``); chỉ các bản ghi mới được tạo, bản ghi đổi giá trị được
+cập nhật và bệnh viện không còn trong nguồn bị ngừng hoạt động (``is_active``),
+tất cả bằng thao tác hàng loạt. Id, và do đó cache phía client, được giữ nguyên.
+Chỉ khóa và dấu vân tay (``record_digest``) của bệnh viện hiện có được giữ trong
+bộ nhớ; giá trị đầy đủ chỉ được đọc cho các bản ghi có thể đã đổi trong từng lô.
+
+Mã ngoài danh sách lựa chọn (``main_specialty='ent'``...) vẫn được chấp nhận như
+khi tạo qua ORM, vì dữ liệu gốc có dùng.
+"""
+import hashlib
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import EMPTY_VALUES
+from django.db import connection, transaction
+
+from . import cache, stats
+from .fuzzy import fold
+from .models import Hospital, HospitalSpecialty
+
+# Các trường không nhận từ dữ liệu nạp vào
+GENERATED_FIELDS = {'id', 'geohash', 'created_at', 'updated_at'}
+
+IMPORT_FIELDS = {
+    field.name: field
+    for field in Hospital._meta.concrete_fields
+    if field.name not in GENERATED_FIELDS
+}
+
+COORDINATE_RANGES = {'latitude': (-90.0, 90.0), 'longitude': (-180.0, 180.0)}
+
+
+class MalformedRecord:
+    """Bản ghi không đọc được từ nguồn (dòng JSON hỏng, ô JSON sai...), giữ nguyên văn"""
+
+    def __init__(self, raw, message):
+        self.raw = raw
+        self.message = message
+
+
+def clean_record(record):
+    """Giá trị đã chuẩn hóa của một bản ghi; ValidationError (theo trường) nếu không hợp lệ"""
+    if isinstance(record, MalformedRecord):
+        raise ValidationError({'__all__': [record.message]})
+    if not isinstance(record, dict):
+        raise ValidationError({'__all__': ['Bản ghi phải là một object']})
+
+    errors = {}
+    # Trường sinh tự động (id...) bị bỏ qua để nạp lại được dữ liệu đã xuất
+    unknown = sorted(set(record) - set(IMPORT_FIELDS) - GENERATED_FIELDS)
+    if unknown:
+        errors['__all__'] = [f"Trường không hợp lệ: {', '.join(unknown)}"]
+
+    values = {}
+    for name, field in IMPORT_FIELDS.items():
+        if name not in record:
+            if not field.has_default() and not field.blank:
+                errors[name] = ['Thiếu trường bắt buộc']
+            continue
+        value = record[name]
+        try:
+            value = field.to_python(value)
+            if value in EMPTY_VALUES and not isinstance(value, (list, dict)):
+                if not field.blank:
+                    raise ValidationError('Không được để trống')
+                if value is None and not field.null:
+                    value = field.get_default()
+            else:
+                # Không kiểm tra choices: giống Hospital.objects.create
+                field.run_validators(value)
+                if name in COORDINATE_RANGES:
+                    low, high = COORDINATE_RANGES[name]
+                    if not low <= value <= high:
+                        raise ValidationError(f'Phải nằm trong [{low}, {high}]')
+        except ValidationError as e:
+            errors[name] = e.messages
+            continue
+        values[name] = value
+
+    if errors:
+        raise ValidationError(errors)
+    return values
+
+
+def natural_key(name, latitude, longitude, precision=None):
+    """Khóa tự nhiên của một bệnh viện: (tên đã bỏ dấu, vĩ độ, kinh độ làm tròn)"""
+    if precision is None:
+        precision = getattr(settings, 'HOSPITAL_IMPORT_KEY_PRECISION', 4)
+
+    def rounded(value):
+        return None if value is None else round(value, precision)
+
+    return fold(name), rounded(latitude), rounded(longitude)
+
+
+def key_digest(key):
+    """Dạng gọn (16 byte) của một khóa tự nhiên để giữ trong bộ nhớ"""
+    return hashlib.blake2b(repr(key).encode('utf-8'), digest_size=16).digest()
+
+
+def record_digest(values):
+    """Dấu vân tay giá trị các trường nạp được.
+
+    Bằng nhau thì bản ghi không đổi; khác nhau (kể cả chỉ khác kiểu 1/1.0 hay thứ
+    tự khóa JSON) thì phải so lại với bản ghi hiện có.
+    """
+    data = repr([values.get(name) for name in IMPORT_FIELDS])
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).digest()
+
+
+def validate_records(records, start=0):
+    """Tách ``records`` thành (các Hospital chưa lưu, các bản ghi lỗi).
+
+    Mỗi bản ghi lỗi là (số thứ tự tính từ ``start``, bản ghi, {trường: [lỗi]}).
+    """
+    hospitals, rejected = [], []
+    for position, record in enumerate(records, start):
+        try:
+            hospitals.append(Hospital(**clean_record(record)))
+        except ValidationError as e:
+            rejected.append((position, record, e.message_dict))
+    return hospitals, rejected
+
+
+class ImportResult:
+    """Kết quả một lần nạp"""
+
+    def __init__(self):
+        self.processed = 0
+        self.created = 0
+        self.deleted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.deactivated = 0
+        self.ambiguous = 0  # bệnh viện hiện có trùng khóa tự nhiên với bệnh viện khác
+        self.rejected = []  # chỉ khi không có on_reject
+        self.rejected_count = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        if self.deleted:
+            changes = f'Đã xóa {self.deleted}, tạo {self.created} bệnh viện'
+        else:
+            changes = (
+                f'Tạo {self.created}, cập nhật {self.updated}, giữ nguyên {self.unchanged}, '
+                f'ngừng hoạt động {self.deactivated} bệnh viện'
+            )
+            if self.ambiguous:
+                changes += f' ({self.ambiguous} bệnh viện hiện có trùng khóa tự nhiên)'
+
+        return (
+            f'{changes}, loại {self.rejected_count} bản ghi lỗi '
+            f'trong {self.elapsed:.2f}s ({self.rows_per_second:,.0f} dòng/s)'
+        )
+
+
+class HospitalImporter:
+    """Thay toàn bộ dữ liệu bệnh viện bằng ``records`` trong một giao dịch.
+
+    ``on_reject(position, record, errors)`` nhận từng bản ghi lỗi; mặc định chúng
+    được gom vào ``ImportResult.rejected``.
+    """
+
+    def __init__(self, batch_size=None, on_reject=None):
+        self.batch_size = batch_size or getattr(settings, 'HOSPITAL_IMPORT_BATCH_SIZE', 1000)
+        self.on_reject = on_reject
+
+    def chunks(self, records):
+        records = iter(records)
+        while chunk := list(islice(records, self.batch_size)):
+            yield chunk
+
+    def run(self, records):
+        result = ImportResult()
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            result.deleted = self.delete_existing()
+            position = 0
+            for chunk in self.chunks(records):
+                # Kiểm tra cả lô trước khi ghi lô đó
+                hospitals, rejected = validate_records(chunk, start=position)
+                position += len(chunk)
+                result.processed += len(chunk)
+                self.reject(result, rejected)
+                if hospitals:
+                    result.created += len(Hospital.objects.bulk_create(hospitals))
+            # Delta của bulk_create cộng dồn lên bộ đếm của dữ liệu vừa xóa
+            stats.rebuild_stats()
+            cache.bump_catalog_version()
+
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def reject(self, result, rejected):
+        result.rejected_count += len(rejected)
+        if self.on_reject is None:
+            result.rejected.extend(rejected)
+            return
+        for position, record, errors in rejected:
+            self.on_reject(position, record, errors)
+
+    @staticmethod
+    def delete_existing():
+        """Xóa mọi bệnh viện bằng DELETE trên bảng.
+
+        ``QuerySet.delete()`` phải tải từng bản ghi để gửi signal (cập nhật thống kê,
+        phiên bản, gợi ý...) cho mỗi dòng; ở đây các phần đó được dựng lại một lần
+        sau khi nạp xong.
+        """
+        HospitalSpecialty.objects.all().delete()
+        table = connection.ops.quote_name(Hospital._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            return cursor.rowcount
+
+
+class HospitalSync(HospitalImporter):
+    """Đồng bộ dữ liệu bệnh viện với ``records`` theo khóa tự nhiên, trong một giao dịch.
+
+    Trường không có trong bản ghi giữ giá trị hiện tại; ``is_active`` mặc định
+    là True nên bệnh viện xuất hiện lại sẽ hoạt động trở lại. Với
+    ``deactivate_missing=False`` các bệnh viện không có trong nguồn được giữ nguyên.
+
+    Nhiều bệnh viện hiện có cùng một khóa được đếm vào ``ImportResult.ambiguous``;
+    bản ghi mang khóa đó bị loại (không biết phải cập nhật bệnh viện nào) và cả
+    nhóm được giữ nguyên.
+    """
+
+    def __init__(self, batch_size=None, on_reject=None, deactivate_missing=True):
+        super().__init__(batch_size, on_reject)
+        self.deactivate_missing = deactivate_missing
+
+    def existing(self):
+        """({khóa: [id, dấu vân tay, vị trí bản ghi đã khớp]}, {khóa: [các id]} của khóa trùng)"""
+        rows = Hospital.objects.order_by('id').values('id', *IMPORT_FIELDS)
+        existing, duplicates = {}, {}
+        for row in rows.iterator(chunk_size=self.batch_size):
+            pk = row.pop('id')
+            key = key_digest(natural_key(row['name'], row['latitude'], row['longitude']))
+            if key in existing:
+                duplicates.setdefault(key, [existing[key][0]]).append(pk)
+            else:
+                existing[key] = [pk, record_digest(row), None]
+        return existing, duplicates
+
+    def run(self, records):
+        result = ImportResult()
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            existing, duplicates = self.existing()
+            result.ambiguous = sum(len(pks) for pks in duplicates.values())
+            added = {}  # khóa của bệnh viện mới -> vị trí bản ghi
+            position = 0
+            for chunk in self.chunks(records):
+                created, candidates, rejected = [], {}, []
+                for offset, record in enumerate(chunk, position):
+                    try:
+                        values = clean_record(record)
+                        key = key_digest(natural_key(values['name'], values.get('latitude'), values.get('longitude')))
+                        entry = existing.get(key)
+                        first = added.get(key) if entry is None else entry[2]
+                        if first is not None:
+                            raise ValidationError({'__all__': [f'Trùng khóa với bản ghi #{first}']})
+                        if key in duplicates:
+                            entry[2] = offset
+                            ids = ', '.join(f'#{pk}' for pk in duplicates[key])
+                            raise ValidationError({'__all__': [f'Khóa khớp nhiều bệnh viện hiện có: {ids}']})
+                    except ValidationError as e:
+                        rejected.append((offset, record, e.message_dict))
+                        continue
+                    values.setdefault('is_active', True)
+
+                    if entry is None:
+                        added[key] = offset
+                        created.append(Hospital(**values))
+                        continue
+                    entry[2] = offset
+                    # Bản ghi đủ mọi trường: so dấu vân tay là đủ, khỏi đọc bản ghi hiện có
+                    if len(values) == len(IMPORT_FIELDS) and record_digest(values) == entry[1]:
+                        result.unchanged += 1
+                        continue
+                    candidates[entry[0]] = values
+
+                position += len(chunk)
+                result.processed += len(chunk)
+                self.reject(result, rejected)
+                if created:
+                    result.created += len(Hospital.objects.bulk_create(created))
+                updated, fields = self.changes(candidates)
+                result.unchanged += len(candidates) - len(updated)
+                if updated:
+                    Hospital.objects.bulk_update(updated, sorted(fields))
+                    result.updated += len(updated)
+
+            if self.deactivate_missing:
+                result.deactivated = self.deactivate(
+                    pk
+                    for key, (first, _, matched) in existing.items() if matched is None
+                    for pk in duplicates.get(key, [first])
+                )
+
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    @staticmethod
+    def changes(candidates):
+        """Các Hospital cần cập nhật và tập trường đổi, từ {id: giá trị mới} của một lô"""
+        pks = list(candidates)
+        size = connection.features.max_query_params or len(pks) or 1
+        updated, fields = [], set()
+        for offset in range(0, len(pks), size):
+            rows = Hospital.objects.filter(pk__in=pks[offset:offset + size]).values('id', *IMPORT_FIELDS)
+            for current in rows:
+                pk = current.pop('id')
+                values = candidates[pk]
+                changed = {name for name, value in values.items() if current[name] != value}
+                if changed:
+                    current.update(values)
+                    updated.append(Hospital(pk=pk, **current))
+                    fields |= changed
+        return updated, fields
+
+    @staticmethod
+    def deactivate(pks):
+        pks = list(pks)
+        size = connection.features.max_query_params or len(pks) or 1
+        total = 0
+        for offset in range(0, len(pks), size):
+            batch = pks[offset:offset + size]
+            total += Hospital.objects.filter(pk__in=batch, is_active=True).update(is_active=False)
+        return total
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from hospitals.models import Hospital
+
+
+class Command(BaseCommand):
+    help = 'Tính lại cột geohash từ tọa độ của bệnh viện'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Kiểm tra mọi bản ghi thay vì chỉ các bản ghi chưa có geohash'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        queryset = Hospital.objects.order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(geohash='')
+
+        updated = queryset.refresh_geohash(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Đã cập nhật geohash cho {updated} bệnh viện'))
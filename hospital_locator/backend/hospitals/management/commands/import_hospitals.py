@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from hospitals.importer import HospitalImporter, HospitalSync, MalformedRecord
+from hospitals.readers import FORMATS, detect_format, read_records
+
+
+class RejectWriter:
+    """Ghi bản ghi lỗi ra tệp NDJSON, chỉ tạo tệp khi có lỗi đầu tiên"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __call__(self, position, record, errors):
+        if self.file is None:
+            self.file = open(self.path, 'w', encoding='utf-8')
+        if isinstance(record, MalformedRecord):
+            record = record.raw
+        line = {'position': position, 'record': record, 'errors': errors}
+        self.file.write(json.dumps(line, ensure_ascii=False, default=str) + '\n')
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class Command(BaseCommand):
+    help = 'Nạp dữ liệu bệnh viện từ tệp CSV, GeoJSON hoặc NDJSON (đọc và ghi theo lô): thay toàn bộ, hoặc đồng bộ với --sync'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Tệp dữ liệu')
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Định dạng tệp; mặc định đoán theo phần mở rộng (.csv, .geojson, .ndjson/.jsonl)'
+        )
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--rejects',
+            help='Tệp NDJSON ghi các bản ghi lỗi (mặc định <path>.rejects.ndjson)'
+        )
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument(
+            '--sync', action='store_true',
+            help='Đồng bộ theo khóa tự nhiên (tên + tọa độ) thay vì xóa hết rồi tạo lại'
+        )
+        parser.add_argument(
+            '--keep-missing', action='store_true',
+            help='Với --sync: không ngừng hoạt động các bệnh viện không có trong tệp'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        format = options['format'] or detect_format(path)
+        if format is None:
+            raise CommandError(f'Không nhận ra định dạng của {path}, hãy chỉ rõ --format')
+
+        rejects = RejectWriter(options['rejects'] or f'{path}.rejects.ndjson')
+        if options['sync']:
+            importer = HospitalSync(
+                batch_size=options['batch_size'], on_reject=rejects,
+                deactivate_missing=not options['keep_missing'],
+            )
+        else:
+            importer = HospitalImporter(batch_size=options['batch_size'], on_reject=rejects)
+        try:
+            with open(path, encoding=options['encoding'], newline='') as stream:
+                result = importer.run(read_records(stream, format))
+        except OSError as e:
+            raise CommandError(f'Không đọc được {path}: {e}')
+        except ValueError as e:
+            # Tệp hỏng cấu trúc (GeoJSON): giao dịch đã được hoàn tác, dữ liệu cũ còn nguyên
+            raise CommandError(f'Tệp {path} không hợp lệ, không có gì thay đổi: {e}')
+        finally:
+            rejects.close()
+
+        self.stdout.write(self.style.SUCCESS(result.summary()))
+        if result.rejected_count:
+            self.stdout.write(self.style.WARNING(f'Bản ghi lỗi được ghi vào {rejects.path}'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from hospitals.fulltext import is_supported, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Nạp lại chỉ mục toàn văn (FTS5/tsvector) từ bảng bệnh viện'
+
+    def handle(self, *args, **options):
+        if not is_supported():
+            self.stdout.write(self.style.WARNING('Backend CSDL không hỗ trợ chỉ mục toàn văn, tìm kiếm dùng icontains'))
+            return
+        total = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f'Đã đánh chỉ mục toàn văn cho {total} bệnh viện'))
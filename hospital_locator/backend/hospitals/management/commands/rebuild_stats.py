@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from hospitals.stats import TOTAL, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Tính lại toàn bộ bảng thống kê bệnh viện từ dữ liệu gốc'
+
+    def handle(self, *args, **options):
+        counters = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Đã tính lại {len(counters)} bộ đếm cho {counters[TOTAL]} bệnh viện đang hoạt động'
+        ))
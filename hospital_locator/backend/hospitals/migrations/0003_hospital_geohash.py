@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:24
+
+from django.db import migrations, models
+
+from hospitals import geohash
+
+
+def fill_geohash(apps, schema_editor):
+    Hospital = apps.get_model('hospitals', 'Hospital')
+    changed = []
+    for hospital in Hospital.objects.exclude(latitude=None).exclude(longitude=None).iterator():
+        hospital.geohash = geohash.encode(hospital.latitude, hospital.longitude)
+        changed.append(hospital)
+    Hospital.objects.bulk_update(changed, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0002_delete_hospitalimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='hospital',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, verbose_name='Geohash'),
+        ),
+        migrations.AlterField(
+            model_name='hospital',
+            name='district',
+            field=models.CharField(choices=[('quan1', 'Quận 1'), ('quan2', 'Quận 2'), ('quan3', 'Quận 3'), ('quan4', 'Quận 4'), ('quan5', 'Quận 5'), ('quan6', 'Quận 6'), ('quan7', 'Quận 7'), ('quan8', 'Quận 8'), ('quan9', 'Quận 9'), ('quan10', 'Quận 10'), ('quan11', 'Quận 11'), ('quan12', 'Quận 12'), ('binhthanh', 'Quận Bình Thạnh'), ('govap', 'Quận Gò Vấp'), ('phunhuan', 'Quận Phú Nhuận'), ('tanbinh', 'Quận Tân Bình'), ('tanphu', 'Quận Tân Phú'), ('thuduc', 'Quận Thủ Đức'), ('binhtan', 'Quận Bình Tân'), ('hocmon', 'Huyện Hóc Môn'), ('cuchi', 'Huyện Củ Chi'), ('nhabe', 'Huyện Nhà Bè'), ('canggio', 'Huyện Cần Giờ')], max_length=20, verbose_name='Quận/Huyện'),
+        ),
+        migrations.AddIndex(
+            model_name='hospital',
+            index=models.Index(fields=['geohash'], name='hospitals_h_geohash_f7726f_idx'),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0003_hospital_geohash'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='hospital',
+            index=models.Index(fields=['name', 'id'], name='hospitals_h_name_eaf20b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hospital',
+            index=models.Index(fields=['created_at', 'id'], name='hospitals_h_created_7d072e_idx'),
+        ),
+    ]
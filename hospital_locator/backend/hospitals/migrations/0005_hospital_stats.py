@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:32
+
+from django.db import migrations, models
+
+from hospitals.stats import rebuild_stats
+
+
+def fill_stats(apps, schema_editor):
+    rebuild_stats(apps.get_model('hospitals', 'Hospital'), apps.get_model('hospitals', 'HospitalStat'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0004_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HospitalStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=30, verbose_name='Chiều thống kê')),
+                ('value', models.CharField(max_length=50, verbose_name='Giá trị')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Số lượng')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Ngày cập nhật')),
+            ],
+            options={
+                'verbose_name': 'Thống kê bệnh viện',
+                'verbose_name_plural': 'Thống kê bệnh viện',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='unique_hospital_stat')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from hospitals.specialties import rebuild_specialties
+
+
+def fill_specialties(apps, schema_editor):
+    rebuild_specialties(apps.get_model('hospitals', 'Hospital'), apps.get_model('hospitals', 'HospitalSpecialty'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('hospitals', '0006_hospital_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HospitalSpecialty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('specialty', models.CharField(choices=[('general', 'Đa khoa'), ('pediatrics', 'Nhi'), ('obstetrics', 'Sản'), ('cardiology', 'Tim mạch'), ('oncology', 'Ung bướu'), ('neurology', 'Thần kinh'), ('orthopedics', 'Chỉnh hình'), ('ophthalmology', 'Mắt'), ('dentistry', 'Răng hàm mặt'), ('dermatology', 'Da liễu')], max_length=20, verbose_name='Chuyên khoa')),
+                ('is_main', models.BooleanField(default=False, verbose_name='Chuyên khoa chính')),
+                ('hospital', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='specialty_links', to='hospitals.hospital', verbose_name='Bệnh viện')),
+            ],
+            options={
+                'verbose_name': 'Chuyên khoa của bệnh viện',
+                'verbose_name_plural': 'Chuyên khoa của bệnh viện',
+                'indexes': [models.Index(fields=['specialty', 'hospital'], name='hospitals_h_special_e054b5_idx')],
+                'constraints': [models.UniqueConstraint(fields=('hospital', 'specialty'), name='unique_hospital_specialty')],
+            },
+        ),
+        migrations.RunPython(fill_specialties, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,95 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import cache, geohash, specialties, stats
+
+# Cột suy ra từ cột khác, không hiển thị trong phản hồi: cập nhật riêng chúng không đổi updated_at
+DERIVED_FIELDS = {'geohash'}
+
+
+class HospitalQuerySet(models.QuerySet):
+    """QuerySet giữ geohash, bảng thống kê, bảng chuyên khoa và phiên bản dữ liệu đồng bộ trên các đường ghi hàng loạt"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        for obj in objs:
+            obj.geohash = obj.compute_geohash()
+        with transaction.atomic(using=self.db):
+            created = super().bulk_create(objs, *args, **kwargs)
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # Không biết dòng nào thực sự được ghi
+                stats.rebuild_stats()
+                specialties.rebuild_specialties()
+            else:
+                stats.apply_deltas(stats.total_contribution(created))
+                specialties.sync_specialties(created)
+            if created:
+                cache.bump_catalog_version()
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        if {'latitude', 'longitude'} & set(fields):
+            for obj in objs:
+                obj.geohash = obj.compute_geohash()
+            if 'geohash' not in fields:
+                fields.append('geohash')
+        # bulk_update chạy qua update() theo từng lô nên bảng thống kê được cập nhật ở đó
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+    def update(self, **kwargs):
+        moves = {'latitude', 'longitude'} & set(kwargs) and 'geohash' not in kwargs
+        counted = stats.STAT_FIELDS & set(kwargs)
+        relinked = specialties.SPECIALTY_FIELDS & set(kwargs)
+        # Như auto_now của save(): fragment đã serialize được khóa theo updated_at. Cập nhật
+        # chỉ cột suy ra (backfill geohash) giữ nguyên updated_at để fragment vẫn dùng được
+        if set(kwargs) - DERIVED_FIELDS:
+            kwargs.setdefault('updated_at', timezone.now())
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list('pk', flat=True)) if moves or counted or relinked else None
+            before = self._stats_before(pks) if counted else None
+            updated = super().update(**kwargs)
+            if moves:
+                self.model.objects.filter(pk__in=pks).refresh_geohash()
+            if counted:
+                self._stats_after(pks, before)
+            if relinked:
+                specialties.sync_specialties_for(pks)
+            if updated:
+                cache.bump_catalog_version()
+        return updated
+
+    def _stats_before(self, pks):
+        """Bộ đếm của các dòng sắp bị sửa; None nếu quá nhiều dòng để tính delta"""
+        if len(pks) > stats.MAX_DELTA_ROWS:
+            return None
+        return stats.aggregate_stats(self.model.objects.filter(pk__in=pks))
+
+    def _stats_after(self, pks, before):
+        if before is None:
+            stats.rebuild_stats()
+            return
+        after = stats.aggregate_stats(self.model.objects.filter(pk__in=pks))
+        stats.apply_deltas(stats.subtract(after, before))
+
+    def refresh_geohash(self, batch_size=1000):
+        """Tính lại geohash cho các bản ghi trong queryset, trả về số dòng đã đổi"""
+        changed = []
+        total = 0
+        for obj in self.only('id', 'latitude', 'longitude', 'geohash').iterator(chunk_size=batch_size):
+            value = obj.compute_geohash()
+            if obj.geohash != value:
+                obj.geohash = value
+                changed.append(obj)
+            if len(changed) >= batch_size:
+                self.bulk_update(changed, ['geohash'])
+                total += len(changed)
+                changed = []
+        if changed:
+            self.bulk_update(changed, ['geohash'])
+            total += len(changed)
+        return total
 
 
 class Hospital(models.Model):
@@ -52,6 +143,11 @@ class Hospital(models.Model):
         ('dermatology', 'Da liễu'),
     ]
 
+    # Bảng tra tên hiển thị, dựng một lần cho cả class
+    HOSPITAL_TYPE_LABELS = dict(HOSPITAL_TYPES)
+    DISTRICT_LABELS = dict(DISTRICTS)
+    SPECIALTY_LABELS = dict(SPECIALTIES)
+
     # Thông tin cơ bản
     name = models.CharField('Tên bệnh viện', max_length=200)
     name_en = models.CharField('Tên tiếng Anh', max_length=200, blank=True)
@@ -76,6 +172,7 @@ class Hospital(models.Model):
     # Thông tin vị trí (GIS - WGS84 coordinate system)
     latitude = models.FloatField('Vĩ độ', null=True, blank=True)
     longitude = models.FloatField('Kinh độ', null=True, blank=True)
+    geohash = models.CharField('Geohash', max_length=12, blank=True, editable=False)
 
     # Thông tin hoạt động
     working_hours = models.JSONField('Giờ làm việc', default=dict, blank=True)  # {'monday': '8:00-17:00', ...}
@@ -100,16 +197,33 @@ class Hospital(models.Model):
             models.Index(fields=['hospital_type']),
             models.Index(fields=['district']),
             models.Index(fields=['main_specialty']),
+            # Phân trang keyset theo (trường sắp xếp, id)
+            models.Index(fields=['name', 'id']),
+            models.Index(fields=['created_at', 'id']),
             # GIS: Spatial index cho hiệu suất truy vấn không gian
             models.Index(fields=['latitude', 'longitude']),
+            # Geohash: truy vấn theo ô bằng tiền tố, không cần extension GIS
+            models.Index(fields=['geohash']),
         ]
 
+    objects = HospitalQuerySet.as_manager()
+
     def __str__(self):
         return self.name
 
     def save(self, *args, **kwargs):
+        self.geohash = self.compute_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
         super().save(*args, **kwargs)
 
+    def compute_geohash(self):
+        """Geohash từ tọa độ hiện tại, rỗng nếu chưa có tọa độ"""
+        if self.latitude is None or self.longitude is None:
+            return ''
+        return geohash.encode(self.latitude, self.longitude)
+
     @property
     def full_address(self):
         """Địa chỉ đầy đủ"""
@@ -117,7 +231,7 @@ class Hospital(models.Model):
         if self.ward:
             parts.append(f"Phường {self.ward}")
         if self.district:
-            district_name = dict(self.DISTRICTS).get(self.district, self.district)
+            district_name = self.DISTRICT_LABELS.get(self.district, self.district)
             parts.append(district_name)
         parts.append("TP. Hồ Chí Minh")
         return ", ".join(parts)
@@ -125,17 +239,59 @@ class Hospital(models.Model):
     @property
     def hospital_type_display(self):
         """Hiển thị loại bệnh viện"""
-        return dict(self.HOSPITAL_TYPES).get(self.hospital_type, self.hospital_type)
+        return self.HOSPITAL_TYPE_LABELS.get(self.hospital_type, self.hospital_type)
 
     @property
     def district_display(self):
         """Hiển thị tên quận/huyện"""
-        return dict(self.DISTRICTS).get(self.district, self.district)
+        return self.DISTRICT_LABELS.get(self.district, self.district)
 
     @property
     def main_specialty_display(self):
         """Hiển thị chuyên khoa chính"""
-        return dict(self.SPECIALTIES).get(self.main_specialty, self.main_specialty)
+        return self.SPECIALTY_LABELS.get(self.main_specialty, self.main_specialty)
+
+
+class HospitalSpecialty(models.Model):
+    """Một chuyên khoa của một bệnh viện (chuyên khoa chính và danh sách ``specialties``)"""
+
+    hospital = models.ForeignKey(
+        Hospital, on_delete=models.CASCADE, related_name='specialty_links', verbose_name='Bệnh viện'
+    )
+    specialty = models.CharField('Chuyên khoa', max_length=20, choices=Hospital.SPECIALTIES)
+    is_main = models.BooleanField('Chuyên khoa chính', default=False)
+
+    class Meta:
+        verbose_name = 'Chuyên khoa của bệnh viện'
+        verbose_name_plural = 'Chuyên khoa của bệnh viện'
+        constraints = [
+            models.UniqueConstraint(fields=['hospital', 'specialty'], name='unique_hospital_specialty'),
+        ]
+        indexes = [
+            models.Index(fields=['specialty', 'hospital']),
+        ]
+
+    def __str__(self):
+        return f'{self.hospital_id}: {self.specialty}'
+
+
+class HospitalStat(models.Model):
+    """Bộ đếm thống kê (chiều, giá trị) của các bệnh viện đang hoạt động"""
+
+    dimension = models.CharField('Chiều thống kê', max_length=30)
+    value = models.CharField('Giá trị', max_length=50)
+    count = models.BigIntegerField('Số lượng', default=0)
+    updated_at = models.DateTimeField('Ngày cập nhật', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Thống kê bệnh viện'
+        verbose_name_plural = 'Thống kê bệnh viện'
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='unique_hospital_stat'),
+        ]
+
+    def __str__(self):
+        return f'{self.dimension}={self.value}: {self.count}'
 
 
 # HospitalImage model removed - focusing on GIS core features
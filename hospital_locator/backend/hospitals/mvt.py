@@ -0,0 +1,119 @@
+"""
+Bộ mã hóa Mapbox Vector Tile (MVT 2.1) tối giản, chỉ cho lớp điểm.
+
+Một tile là thông điệp protobuf ``Tile { repeated Layer layers = 3 }``; mỗi lớp
+gồm tên, extent, bảng khóa/giá trị dùng chung và các feature. Feature điểm lưu
+thuộc tính dưới dạng cặp chỉ số (khóa, giá trị) và hình học là lệnh MoveTo với
+tọa độ nguyên trong hệ tọa độ của tile (0..extent, gốc ở góc trên bên trái).
+Chỉ cần vài kiểu trường protobuf (varint, chuỗi, double, packed) nên được viết
+trực tiếp ở đây thay vì phụ thuộc thư viện protobuf.
+
+Đặc tả: https://github.com/mapbox/vector-tile-spec/tree/master/2.1
+"""
+import struct
+
+EXTENT = 4096
+
+# Kiểu dây (wire type) của protobuf
+VARINT, FIXED64, LENGTH = 0, 1, 2
+
+# GeomType.POINT và lệnh MoveTo
+POINT = 1
+MOVE_TO = 1
+
+
+def varint(value):
+    """Số nguyên không âm dạng varint"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def field(number, wire_type):
+    return varint((number << 3) | wire_type)
+
+
+def length_delimited(number, payload):
+    return field(number, LENGTH) + varint(len(payload)) + payload
+
+
+def packed(number, values):
+    return length_delimited(number, b''.join(varint(value) for value in values))
+
+
+def encode_value(value):
+    """Thông điệp Value của MVT; None nếu kiểu không được hỗ trợ"""
+    if isinstance(value, bool):
+        return field(7, VARINT) + varint(int(value))
+    if isinstance(value, int):
+        if value >= 0:
+            return field(5, VARINT) + varint(value)
+        return field(6, VARINT) + varint(zigzag(value))
+    if isinstance(value, float):
+        return field(3, FIXED64) + struct.pack('<d', value)
+    if isinstance(value, str):
+        return length_delimited(1, value.encode('utf-8'))
+    return None
+
+
+class Layer:
+    """Một lớp điểm của tile"""
+
+    def __init__(self, name, extent=EXTENT):
+        self.name = name
+        self.extent = extent
+        self.keys = {}
+        self.values = {}
+        self.features = []
+
+    def _index(self, table, item):
+        index = table.get(item)
+        if index is None:
+            index = table[item] = len(table)
+        return index
+
+    def add_point(self, x, y, properties=None, id=None):
+        """Thêm một điểm tại (x, y) theo tọa độ tile; thuộc tính None bị bỏ qua"""
+        tags = []
+        for key, value in (properties or {}).items():
+            encoded = encode_value(value)
+            if encoded is None:
+                continue
+            tags.append(self._index(self.keys, key))
+            # Khóa theo (kiểu, giá trị) để True và 1 không gộp làm một
+            tags.append(self._index(self.values, (type(value), value, encoded)))
+
+        feature = b''
+        if id is not None:
+            feature += field(1, VARINT) + varint(id)
+        if tags:
+            feature += packed(2, tags)
+        feature += field(3, VARINT) + varint(POINT)
+        feature += packed(4, [(MOVE_TO & 0x7) | (1 << 3), zigzag(int(x)), zigzag(int(y))])
+        self.features.append(feature)
+
+    def __len__(self):
+        return len(self.features)
+
+    def encode(self):
+        parts = [
+            field(15, VARINT) + varint(2),
+            length_delimited(1, self.name.encode('utf-8')),
+        ]
+        parts.extend(length_delimited(2, feature) for feature in self.features)
+        parts.extend(length_delimited(3, key.encode('utf-8')) for key in self.keys)
+        parts.extend(length_delimited(4, encoded) for _, _, encoded in self.values)
+        parts.append(field(5, VARINT) + varint(self.extent))
+        return b''.join(parts)
+
+
+def encode_tile(layers):
+    """Nội dung tile (bytes) gồm các lớp đã cho"""
+    return b''.join(length_delimited(3, layer.encode()) for layer in layers)
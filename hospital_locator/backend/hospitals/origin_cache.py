@@ -0,0 +1,100 @@
+"""
+Cache kết quả truy vấn lân cận theo ô lưới của điểm xuất phát.
+
+Tọa độ GPS của điện thoại dao động vài mét giữa các lần gọi nên khóa theo tọa độ
+chính xác gần như không bao giờ trúng. Ở đây điểm xuất phát được làm tròn về tâm
+ô lưới cạnh ``HOSPITAL_ORIGIN_GRID_M`` mét; mỗi mục cache lưu *tập ứng viên* đủ
+rộng cho mọi điểm trong ô, còn khoảng cách chính xác được tính lại trên tập nhỏ
+đó cho điểm thật, nên kết quả giống hệt truy vấn trực tiếp.
+
+Với ε là khoảng cách tối đa từ một điểm trong ô tới tâm ô c:
+
+- trong bán kính R: mọi kết quả cách c không quá R + ε;
+- k gần nhất: mọi kết quả cách c không quá d_k(c) + 2ε, với d_k(c) là khoảng
+  cách tới bệnh viện thứ k gần c nhất.
+
+Cache gắn với một bản chụp chỉ mục không gian: khi phiên bản dữ liệu đổi và chỉ
+mục được dựng lại, toàn bộ cache bị xóa.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .cache import record
+from .distance import rank_by_distance
+from .geohash import KM_PER_DEGREE
+
+_lock = threading.Lock()
+_state = {'index': None, 'entries': OrderedDict()}
+
+
+def grid_km():
+    """Cạnh ô lưới (km); 0 là tắt cache"""
+    return max(getattr(settings, 'HOSPITAL_ORIGIN_GRID_M', 50), 0) / 1000.0
+
+
+def snap(lat, lng, grid):
+    """Ô lưới chứa (lat, lng): (chỉ số hàng, chỉ số cột, vĩ độ tâm, kinh độ tâm)"""
+    lat_step = grid / KM_PER_DEGREE
+    row = math.floor(lat / lat_step)
+    center_lat = (row + 0.5) * lat_step
+    # Ô trong cùng một hàng có cùng bề rộng theo km
+    lng_step = lat_step / max(math.cos(math.radians(center_lat)), 0.01)
+    col = math.floor(lng / lng_step)
+    return row, col, center_lat, (col + 0.5) * lng_step
+
+
+def _candidates(index, lat, lng, k, radius, slack):
+    """Tập ứng viên quanh tâm ô cho mọi điểm cách tâm không quá ``slack`` km"""
+    bound = math.inf if radius is None else radius + slack
+    if k is not None:
+        nearest = index.nearest(lat, lng, k, max_distance=bound)
+        if len(nearest) == k:
+            bound = min(bound, nearest[-1][1] + 2 * slack)
+    return index.points_within(lat, lng, bound)
+
+
+def _entry(root, key, build):
+    with _lock:
+        if _state['index'] is not root:
+            _state['index'] = root
+            _state['entries'] = OrderedDict()
+        entries = _state['entries']
+        entry = entries.get(key)
+        if entry is not None:
+            entries.move_to_end(key)
+    record('geo_origin', entry is not None)
+    if entry is not None:
+        return entry
+
+    entry = build()
+    with _lock:
+        if _state['index'] is root:
+            entries = _state['entries']
+            entries[key] = entry
+            while len(entries) > getattr(settings, 'HOSPITAL_ORIGIN_CACHE_SIZE', 4096):
+                entries.popitem(last=False)
+    return entry
+
+
+def cached_matches(root, required, index, lat, lng, k=None, radius=None):
+    """Giống ``index.nearest``/``index.within`` nhưng dùng chung tập ứng viên theo ô lưới.
+
+    ``index`` là chỉ mục con ``root.subset(required)``; trả về danh sách (id, km).
+    """
+    grid = grid_km()
+    if not grid:
+        if k is None:
+            return index.within(lat, lng, radius)
+        return index.nearest(lat, lng, k, max_distance=radius)
+
+    row, col, center_lat, center_lng = snap(lat, lng, grid)
+    # Nửa đường chéo ô nhỏ hơn cạnh ô, dùng cạnh ô làm cận trên cho an toàn
+    slack = grid
+    key = (required, row, col, k, radius)
+    ids, lats, lngs = _entry(
+        root, key, lambda: _candidates(index, center_lat, center_lng, k, radius, slack)
+    )
+    return rank_by_distance(lat, lng, ids, lats, lngs, k=k, max_distance=radius)
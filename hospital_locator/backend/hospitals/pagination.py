@@ -0,0 +1,234 @@
+"""
+Phân trang theo cursor (keyset) cho danh sách và tìm kiếm bệnh viện.
+
+Cursor lưu khóa của bản ghi cuối trang: (giá trị trường sắp xếp, id) cho truy vấn
+SQL, hoặc (khoảng cách/điểm xếp hạng, id) cho kết quả GIS và toàn văn. Trang sau được lấy bằng điều kiện
+``WHERE (field, id) > (v, id)`` nên trang sâu tốn chi phí như trang đầu.
+
+Phân trang chỉ bật khi request có ``page_size`` hoặc ``cursor`` để client cũ vẫn
+nhận danh sách như trước.
+"""
+import base64
+import binascii
+import json
+from bisect import bisect_right
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DISTANCE_ORDERING = 'distance'
+RANK_ORDERING = 'rank'
+
+
+class HospitalCursorPagination(BasePagination):
+    """Phân trang keyset theo ``ordering`` hiện tại, khóa phụ là id"""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'  # 'exact' hoặc 'estimate'
+    invalid_cursor_message = 'Cursor không hợp lệ'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        default = getattr(settings, 'HOSPITAL_PAGE_SIZE', 50)
+        maximum = getattr(settings, 'HOSPITAL_MAX_PAGE_SIZE', 500)
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, default))
+        except (TypeError, ValueError):
+            size = default
+        return max(1, min(size, maximum))
+
+    # ===========================
+    # Truy vấn SQL
+    # ===========================
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        name, descending = self.get_ordering(queryset)
+        self.ordering = f"{'-' if descending else ''}{name}"
+        field = queryset.model._meta.get_field(name)
+
+        self.count = None
+        self.count_is_estimate = False
+        count_mode = request.query_params.get(self.count_query_param)
+        if count_mode == 'exact':
+            self.count = queryset.order_by().count()
+        elif count_mode == 'estimate':
+            self.count, self.count_is_estimate = estimate_count(queryset)
+
+        queryset = queryset.order_by(*self.order_expressions(name, descending, field.null))
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                value = None if cursor['v'] is None else field.to_python(cursor['v'])
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+            queryset = queryset.filter(
+                self.after_cursor(name, descending, field.null, value, cursor['id'])
+            )
+
+        page = list(queryset[:self.page_size + 1])
+        self.next_cursor = None
+        if len(page) > self.page_size:
+            page = page[:self.page_size]
+            last = page[-1]
+            if isinstance(last, dict):
+                # Queryset values()
+                value, pk = last[field.attname], last['id']
+            else:
+                value, pk = field.value_from_object(last), last.pk
+            if value is not None and not isinstance(value, (str, int, float)):
+                value = value.isoformat()
+            self.next_cursor = {'o': self.ordering, 'v': value, 'id': pk}
+        return page
+
+    def get_ordering(self, queryset):
+        """Trường sắp xếp chính (tên, giảm dần?) từ queryset hoặc Meta.ordering"""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering or ['pk']
+        term = ordering[0]
+        if not isinstance(term, str):
+            return 'id', False
+        descending = term.startswith('-')
+        name = term.lstrip('-')
+        return ('id' if name == 'pk' else name), descending
+
+    @staticmethod
+    def order_expressions(name, descending, nullable):
+        if name == 'id':
+            return ['-id' if descending else 'id']
+        if nullable:
+            # NULL luôn ở cuối để điều kiện cursor giống nhau trên mọi backend
+            expression = F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)
+        else:
+            expression = f'-{name}' if descending else name
+        return [expression, '-id' if descending else 'id']
+
+    @staticmethod
+    def after_cursor(name, descending, nullable, value, pk):
+        """Điều kiện lấy các bản ghi đứng sau khóa (value, pk)"""
+        beyond = 'lt' if descending else 'gt'
+        if name == 'id':
+            return Q(**{f'id__{beyond}': pk})
+        if value is None:
+            return Q(**{f'{name}__isnull': True, f'id__{beyond}': pk})
+        query = Q(**{f'{name}__{beyond}': value}) | Q(**{name: value, f'id__{beyond}': pk})
+        if nullable:
+            query |= Q(**{f'{name}__isnull': True})
+        return query
+
+    # ===========================
+    # Kết quả tính sẵn: (id, km) của GIS, (id, điểm) của tìm kiếm toàn văn
+    # ===========================
+
+    def paginate_matches(self, matches, request, ordering=DISTANCE_ORDERING):
+        """Phân trang danh sách (id, khóa) theo (khóa, id), khóa tăng dần"""
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = ordering
+        keys = sorted((key, pk) for pk, key in matches)
+
+        self.count = None
+        self.count_is_estimate = False
+        if request.query_params.get(self.count_query_param) in ('exact', 'estimate'):
+            self.count = len(keys)
+
+        start = 0
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            try:
+                start = bisect_right(keys, (float(cursor['v']), cursor['id']))
+            except (TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+
+        page = keys[start:start + self.page_size]
+        self.next_cursor = None
+        if start + self.page_size < len(keys):
+            key, pk = page[-1]
+            self.next_cursor = {'o': self.ordering, 'v': key, 'id': pk}
+        return [(pk, key) for key, pk in page]
+
+    # ===========================
+    # Cursor và response
+    # ===========================
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            cursor = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+            if cursor['o'] != self.ordering or not isinstance(cursor['id'], int):
+                raise ValueError
+            return cursor
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, cursor):
+        raw = json.dumps(cursor, separators=(',', ':')).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        # Chỉ đếm ở trang đầu
+        url = remove_query_param(self.request.build_absolute_uri(), self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_cursor))
+
+    def get_paginated_response(self, data):
+        payload = {'next': self.get_next_link()}
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_estimate'] = self.count_is_estimate
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'count': {'type': 'integer'},
+                'count_is_estimate': {'type': 'boolean'},
+                'results': schema,
+            },
+        }
+
+
+def estimate_count(queryset):
+    """Ước lượng số dòng, trả về (số dòng, có phải ước lượng?).
+
+    PostgreSQL: lấy số dòng dự kiến từ EXPLAIN, không chạy truy vấn.
+    Backend khác: đếm chính xác tối đa ``HOSPITAL_COUNT_ESTIMATE_CAP`` dòng.
+    """
+    queryset = queryset.order_by()
+    if connection.vendor == 'postgresql':
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    cap = getattr(settings, 'HOSPITAL_COUNT_ESTIMATE_CAP', 10000)
+    count = queryset[:cap + 1].count()
+    if count > cap:
+        return cap, True
+    return count, False
@@ -0,0 +1,217 @@
+"""
+Đọc bản ghi bệnh viện từ tệp CSV, GeoJSON hoặc NDJSON theo kiểu streaming.
+
+Mỗi hàm đọc là một generator trả về từng dict (tên trường -> giá trị) nên có thể
+đưa thẳng vào ``HospitalImporter``: cả tệp không bao giờ nằm trọn trong bộ nhớ.
+Bản ghi không đọc được được trả về dưới dạng ``MalformedRecord`` để bộ nạp ghi
+vào danh sách lỗi thay vì dừng cả lần nạp.
+
+- CSV: dòng đầu là tên trường; ô rỗng coi như không có; các trường JSON
+  (``specialties``, ``working_hours``) viết dạng JSON trong ô.
+- NDJSON: mỗi dòng một object.
+- GeoJSON: FeatureCollection của các Feature kiểu Point; ``properties`` là các
+  trường, tọa độ lấy từ ``geometry``. Mảng ``features`` được giải mã từng phần tử.
+"""
+import csv
+import json
+import os
+
+from django.db import models
+
+from .importer import IMPORT_FIELDS, MalformedRecord
+
+FORMATS = ('csv', 'geojson', 'ndjson')
+
+EXTENSIONS = {
+    '.csv': 'csv',
+    '.geojson': 'geojson',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+
+# Số ký tự đọc thêm mỗi lần khi giải mã GeoJSON
+CHUNK_SIZE = 64 * 1024
+
+JSON_FIELDS = {name for name, field in IMPORT_FIELDS.items() if isinstance(field, models.JSONField)}
+BOOLEAN_FIELDS = {name for name, field in IMPORT_FIELDS.items() if isinstance(field, models.BooleanField)}
+
+TRUE_VALUES = {'1', 't', 'true', 'y', 'yes', 'x', 'có'}
+FALSE_VALUES = {'0', 'f', 'false', 'n', 'no', 'không'}
+
+
+def detect_format(path):
+    """Định dạng theo phần mở rộng của tệp; None nếu không nhận ra"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+# ===========================
+# CSV
+# ===========================
+
+def csv_value(name, value):
+    if name in JSON_FIELDS:
+        return json.loads(value)
+    if name in BOOLEAN_FIELDS:
+        lowered = value.strip().lower()
+        if lowered in TRUE_VALUES:
+            return True
+        if lowered in FALSE_VALUES:
+            return False
+    return value
+
+
+def read_csv(stream):
+    reader = csv.DictReader(stream)
+    for row in reader:
+        if None in row:
+            yield MalformedRecord(row, f'Dòng {reader.line_num}: thừa {len(row[None])} cột')
+            continue
+        try:
+            yield {
+                name: csv_value(name, value)
+                for name, value in row.items()
+                if value is not None and value != ''
+            }
+        except json.JSONDecodeError as e:
+            yield MalformedRecord(row, f'Dòng {reader.line_num}: ô JSON không hợp lệ ({e.msg})')
+
+
+# ===========================
+# NDJSON
+# ===========================
+
+def read_ndjson(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield MalformedRecord(line.rstrip('\n'), f'Dòng {line_number}: JSON không hợp lệ ({e.msg})')
+
+
+# ===========================
+# GeoJSON
+# ===========================
+
+class JSONStream:
+    """Giải mã dần các giá trị JSON từ một luồng văn bản, giữ một bộ đệm nhỏ"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = ''
+        self.position = 0
+        self.finished = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        chunk = self.stream.read(CHUNK_SIZE)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.finished = not chunk
+        return bool(chunk)
+
+    def peek(self):
+        """Ký tự khác khoảng trắng tiếp theo (không tiêu thụ); '' khi hết luồng"""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if char == '' or char not in chars:
+            raise ValueError(f"Cần một trong '{chars}', gặp '{char or 'hết tệp'}'")
+        self.position += 1
+        return char
+
+    def value(self):
+        """Giá trị JSON tiếp theo"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # Số ở cuối bộ đệm có thể còn tiếp trong phần chưa đọc
+            if end == len(self.buffer) and not self.finished and self.fill():
+                continue
+            self.position = end
+            return value
+
+    def skip(self):
+        """Bỏ qua giá trị tiếp theo mà không giữ mảng/object lớn trong bộ nhớ"""
+        if self.peek() == '[':
+            for _ in self.items():
+                pass
+        elif self.peek() == '{':
+            for _ in self.members():
+                self.skip()
+        else:
+            self.value()
+
+    def items(self):
+        """Từng phần tử của mảng tiếp theo"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(',]') == ']':
+                return
+
+    def members(self):
+        """Từng khóa của object tiếp theo; giá trị phải được đọc (``value``/``items``/``skip``) trước khóa sau"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.position += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def feature_record(feature):
+    if not isinstance(feature, dict) or feature.get('type') != 'Feature':
+        return MalformedRecord(feature, 'Không phải một Feature')
+    geometry = feature.get('geometry')
+    if not isinstance(geometry, dict):
+        geometry = {}
+    coordinates = geometry.get('coordinates')
+    if geometry.get('type') != 'Point' or not isinstance(coordinates, list) or len(coordinates) < 2:
+        return MalformedRecord(feature, 'Geometry phải là Point [kinh độ, vĩ độ]')
+    properties = feature.get('properties') or {}
+    if not isinstance(properties, dict):
+        return MalformedRecord(feature, 'properties phải là một object')
+    return {**properties, 'longitude': coordinates[0], 'latitude': coordinates[1]}
+
+
+def read_geojson(stream):
+    """Các Feature trong mảng ``features`` của FeatureCollection ở gốc tệp"""
+    parser = JSONStream(stream)
+    for key in parser.members():
+        if key != 'features':
+            parser.skip()
+            continue
+        for feature in parser.items():
+            yield feature_record(feature)
+
+
+READERS = {
+    'csv': read_csv,
+    'geojson': read_geojson,
+    'ndjson': read_ndjson,
+}
+
+
+def read_records(stream, format):
+    return READERS[format](stream)
@@ -1,4 +1,7 @@
-from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 from .models import Hospital
 
 
@@ -48,9 +51,121 @@ class HospitalListSerializer(serializers.ModelSerializer):
         ]
 
 
-class HospitalSearchSerializer(serializers.Serializer):
-    """Serializer cho tìm kiếm bệnh viện"""
-    query = serializers.CharField(required=False, allow_blank=True)
+def _full_address(address, ward, district):
+    """Giống Hospital.full_address"""
+    parts = [address]
+    if ward:
+        parts.append(f"Phường {ward}")
+    if district:
+        parts.append(Hospital.DISTRICT_LABELS.get(district, district))
+    parts.append("TP. Hồ Chí Minh")
+    return ", ".join(parts)
+
+
+class HospitalRowSerializer:
+    """Serializer chỉ đọc cho các dòng ``values()``, kết quả giống hệt HospitalListSerializer.
+
+    Không dựng model instance và không chạy field của DRF: tên hiển thị lấy từ
+    bảng tra dựng sẵn trên model; ngày giờ được định dạng như DateTimeField
+    (múi giờ hiện tại, hậu tố Z cho UTC). ``fields`` giới hạn các field đầu ra
+    (sparse fieldset) và ``columns()`` cho biết các cột cần đọc cho chúng.
+    """
+    output_fields = HospitalListSerializer.Meta.fields
+
+    # Field đầu ra -> các cột cần đọc từ DB
+    sources = {
+        'hospital_type_display': ['hospital_type'],
+        'district_display': ['district'],
+        'main_specialty_display': ['main_specialty'],
+        'full_address': ['address', 'ward', 'district'],
+    }
+    value_fields = [
+        'id', 'name', 'name_en', 'hospital_type', 'address', 'district', 'ward',
+        'phone', 'email', 'website', 'facebook',
+        'main_specialty', 'specialties', 'description',
+        'latitude', 'longitude',
+        'working_hours', 'emergency_services', 'ambulance_services',
+        'capacity', 'doctors_count', 'nurses_count',
+        'is_active', 'created_at', 'updated_at'
+    ]
+
+    def __init__(self, fields=None):
+        self.fields = self.output_fields if fields is None else [
+            name for name in self.output_fields if name in set(fields)
+        ]
+
+    @classmethod
+    def parse_fields(cls, fields=None, omit=None):
+        """Danh sách field từ tham số ``fields``/``omit`` (phân tách bằng dấu phẩy); None nếu lấy đủ"""
+        if not fields and not omit:
+            return None
+        selected = [name.strip() for name in (fields or '').split(',') if name.strip()]
+        omitted = [name.strip() for name in (omit or '').split(',') if name.strip()]
+        unknown = [name for name in selected + omitted if name not in cls.output_fields]
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Field không hợp lệ: {', '.join(unknown)}"})
+        return [name for name in (selected or cls.output_fields) if name not in omitted]
+
+    def columns(self):
+        """Các cột cần đọc (luôn gồm id), theo thứ tự của model"""
+        needed = {'id'}
+        for name in self.fields:
+            needed.update(self.sources.get(name, [name]))
+        return [name for name in self.value_fields if name in needed]
+
+    @staticmethod
+    def datetime_formatter():
+        """Hàm định dạng ngày giờ giống DateTimeField của DRF, múi giờ chỉ tra một lần"""
+        field = serializers.DateTimeField()
+        if not settings.USE_TZ or str(api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+            return field.to_representation
+        current = timezone.get_current_timezone()
+
+        def format_datetime(value):
+            if timezone.is_naive(value):
+                return field.to_representation(value)
+            text = value.astimezone(current).isoformat()
+            return text[:-6] + 'Z' if text.endswith('+00:00') else text
+        return format_datetime
+
+    def converters(self, format_datetime):
+        """(field, hàm dòng -> giá trị) cho các field đầu ra"""
+        def column(name, convert=None):
+            if convert is None:
+                return lambda row: row[name]
+            return lambda row: None if row[name] is None else convert(row[name])
+
+        def label(name, labels):
+            return lambda row: labels.get(row[name], row[name])
+
+        special = {
+            'hospital_type_display': label('hospital_type', Hospital.HOSPITAL_TYPE_LABELS),
+            'district_display': label('district', Hospital.DISTRICT_LABELS),
+            'main_specialty_display': label('main_specialty', Hospital.SPECIALTY_LABELS),
+            'full_address': lambda row: _full_address(row['address'], row['ward'], row['district']),
+            'latitude': column('latitude', float),
+            'longitude': column('longitude', float),
+            'emergency_services': column('emergency_services', bool),
+            'ambulance_services': column('ambulance_services', bool),
+            'capacity': column('capacity', int),
+            'doctors_count': column('doctors_count', int),
+            'nurses_count': column('nurses_count', int),
+            'is_active': column('is_active', bool),
+            'created_at': column('created_at', format_datetime),
+            'updated_at': column('updated_at', format_datetime),
+        }
+        return [(name, special.get(name) or column(name)) for name in self.fields]
+
+    def serialize_many(self, rows):
+        plan = self.converters(self.datetime_formatter())
+        return [{name: convert(row) for name, convert in plan} for row in rows]
+
+    def to_representation(self, row):
+        return self.serialize_many([row])[0]
+
+
+class HospitalFilterSerializer(serializers.Serializer):
+    """Các bộ lọc dùng chung cho tìm kiếm và truy vấn lân cận"""
     district = serializers.ChoiceField(
         choices=[(k, v) for k, v in Hospital.DISTRICTS],
         required=False
@@ -64,11 +179,35 @@ class HospitalSearchSerializer(serializers.Serializer):
         required=False
     )
     emergency_only = serializers.BooleanField(default=False)
+
+
+class HospitalSearchSerializer(HospitalFilterSerializer):
+    """Serializer cho tìm kiếm bệnh viện"""
+    query = serializers.CharField(required=False, allow_blank=True)
     latitude = serializers.FloatField(required=False)
     longitude = serializers.FloatField(required=False)
     radius = serializers.FloatField(default=5.0)  # km
 
 
+class AutocompleteSerializer(serializers.Serializer):
+    """Serializer cho gợi ý khi gõ"""
+    q = serializers.CharField(max_length=100, allow_blank=True)
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=50)
+
+
+class GeoJSONSerializer(serializers.Serializer):
+    """Tham số của action geojson"""
+    properties = serializers.CharField(required=False, allow_blank=True)
+    precision = serializers.IntegerField(required=False, min_value=0, max_value=10)
+
+    def validate_properties(self, value):
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in HospitalRowSerializer.output_fields]
+        if unknown:
+            raise serializers.ValidationError(f"Field không hợp lệ: {', '.join(unknown)}")
+        return names
+
+
 class HospitalStatsSerializer(serializers.Serializer):
     """Serializer cho thống kê bệnh viện"""
     total_hospitals = serializers.IntegerField()
@@ -79,9 +218,48 @@ class HospitalStatsSerializer(serializers.Serializer):
     average_capacity = serializers.FloatField()
 
 
-class NearestHospitalSerializer(serializers.Serializer):
+class NearestHospitalSerializer(HospitalFilterSerializer):
     """Serializer cho tìm bệnh viện gần nhất"""
     latitude = serializers.FloatField()
     longitude = serializers.FloatField()
     limit = serializers.IntegerField(default=5, min_value=1, max_value=20)
     max_distance = serializers.FloatField(default=10.0)  # km
+
+
+class OriginSerializer(serializers.Serializer):
+    """Một điểm xuất phát trong truy vấn theo lô"""
+    id = serializers.CharField(required=False, allow_blank=True)  # Mã tham chiếu của client
+    latitude = serializers.FloatField(min_value=-90, max_value=90)
+    longitude = serializers.FloatField(min_value=-180, max_value=180)
+
+
+class NearestBatchSerializer(HospitalFilterSerializer):
+    """Serializer cho tìm bệnh viện gần nhất của nhiều điểm trong một request"""
+    origins = OriginSerializer(many=True, allow_empty=False)
+    limit = serializers.IntegerField(default=5, min_value=1, max_value=20)
+    max_distance = serializers.FloatField(default=10.0)  # km
+
+    def validate_origins(self, value):
+        max_origins = getattr(settings, 'HOSPITAL_BATCH_MAX_ORIGINS', 10000)
+        if len(value) > max_origins:
+            raise serializers.ValidationError(f'Tối đa {max_origins} điểm mỗi request')
+        return value
+
+
+class DistanceMatrixSerializer(serializers.Serializer):
+    """Serializer cho ma trận khoảng cách giữa các điểm xuất phát và bệnh viện"""
+    OUTPUT_FORMATS = [('ndjson', 'NDJSON'), ('csv', 'CSV')]
+
+    origins = OriginSerializer(many=True, allow_empty=False)
+    hospital_type = serializers.ChoiceField(choices=Hospital.HOSPITAL_TYPES, required=False)
+    district = serializers.ChoiceField(choices=Hospital.DISTRICTS, required=False)
+    emergency_services = serializers.BooleanField(required=False, allow_null=True, default=None)
+    output_format = serializers.ChoiceField(choices=OUTPUT_FORMATS, default='ndjson')
+    origin_block = serializers.IntegerField(required=False, min_value=1, max_value=10000)
+    hospital_block = serializers.IntegerField(required=False, min_value=1, max_value=100000)
+
+    def validate_origins(self, value):
+        max_origins = getattr(settings, 'HOSPITAL_BATCH_MAX_ORIGINS', 10000)
+        if len(value) > max_origins:
+            raise serializers.ValidationError(f'Tối đa {max_origins} điểm mỗi request')
+        return value
@@ -0,0 +1,70 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import autocomplete, specialties, stats
+from .cache import bump_catalog_version
+from .fragments import forget_fragment
+from .models import Hospital
+
+
+@receiver([post_save, post_delete], sender=Hospital)
+def bump_catalog_version_on_change(sender, **kwargs):
+    """Đổi phiên bản dữ liệu để cache và chỉ mục không gian được dựng lại"""
+    bump_catalog_version()
+
+
+@receiver(pre_save, sender=Hospital)
+def remember_stats_contribution(sender, instance, update_fields=None, **kwargs):
+    """Ghi nhớ đóng góp thống kê của bản ghi trong DB trước khi lưu"""
+    if update_fields is not None and not stats.STAT_FIELDS & set(update_fields):
+        instance._stats_before = None
+        return
+    previous = None
+    if instance.pk is not None:
+        previous = sender.objects.filter(pk=instance.pk).only(*stats.STAT_FIELDS).first()
+    instance._stats_before = stats.contribution(previous) if previous else Counter()
+
+
+@receiver(post_save, sender=Hospital)
+def update_stats_on_save(sender, instance, **kwargs):
+    """Cộng delta giữa đóng góp mới và cũ vào bảng thống kê"""
+    before = getattr(instance, '_stats_before', None)
+    if before is None:
+        return
+    instance._stats_before = None
+    stats.apply_deltas(stats.subtract(stats.contribution(instance), before))
+
+
+@receiver(post_delete, sender=Hospital)
+def update_stats_on_delete(sender, instance, **kwargs):
+    """Trừ đóng góp của bệnh viện đã xóa khỏi bảng thống kê"""
+    stats.apply_deltas(stats.subtract(Counter(), stats.contribution(instance)))
+
+
+@receiver(post_save, sender=Hospital)
+def sync_specialties_on_save(sender, instance, update_fields=None, **kwargs):
+    """Ghi lại các dòng HospitalSpecialty khi chuyên khoa có thể đã đổi"""
+    if update_fields is not None and not specialties.SPECIALTY_FIELDS & set(update_fields):
+        return
+    specialties.sync_specialties([instance])
+
+
+@receiver([pre_save, post_delete], sender=Hospital)
+def forget_fragment_on_change(sender, instance, **kwargs):
+    """Fragment của phiên bản cũ không còn được dùng nữa"""
+    forget_fragment(instance)
+
+
+@receiver(post_save, sender=Hospital)
+def refresh_autocomplete_on_save(sender, instance, **kwargs):
+    """Chỉ thêm/bớt gợi ý của bệnh viện này, sau khi phiên bản dữ liệu đã tăng và giao dịch commit"""
+    transaction.on_commit(lambda: autocomplete.refresh_hospital(instance))
+
+
+@receiver(post_delete, sender=Hospital)
+def refresh_autocomplete_on_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.remove_hospital(pk))
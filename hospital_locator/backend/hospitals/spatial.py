@@ -0,0 +1,263 @@
+"""
+Chỉ mục không gian (KD-tree) trong bộ nhớ cho các truy vấn lân cận.
+
+Mỗi bệnh viện được chiếu lên mặt cầu đơn vị (x, y, z). Khoảng cách dây cung
+giữa hai điểm tăng đơn điệu theo khoảng cách đường tròn lớn, nên KD-tree 3 chiều
+dùng dây cung để loại bỏ các nhánh xa, còn khoảng cách chính xác trong mỗi nút
+lá được tính bằng ``distance.haversine_km``. Chỉ mục chỉ lưu (id, vĩ độ, kinh độ);
+các bản ghi đầy đủ được lấy qua ORM sau khi đã chọn xong kết quả.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .cache import catalog_version
+from .distance import EARTH_RADIUS_KM, haversine_km, nearest_positions
+
+# Số điểm tối đa trong một nút lá
+LEAF_SIZE = 64
+
+# Số chỉ mục con theo bộ lọc được giữ lại cho mỗi bản chụp
+MAX_FACET_INDEXES = 64
+
+
+def to_unit_vectors(lats, lngs):
+    """Chuyển mảng (vĩ độ, kinh độ) sang tọa độ trên mặt cầu đơn vị, shape (n, 3)"""
+    phi = np.radians(lats)
+    lam = np.radians(lngs)
+    cos_phi = np.cos(phi)
+    return np.column_stack((cos_phi * np.cos(lam), cos_phi * np.sin(lam), np.sin(phi)))
+
+
+def row_facets(hospital_type, district, emergency_services, main_specialty, specialties):
+    """Các giá trị lọc (chiều, mã) mà một bệnh viện thỏa mãn"""
+    facets = {('hospital_type', hospital_type), ('district', district), ('specialty', main_specialty)}
+    if isinstance(specialties, list):
+        facets.update(('specialty', code) for code in specialties if isinstance(code, str))
+    if emergency_services:
+        facets.add(('emergency', True))
+    return facets
+
+
+def facet_key(hospital_type=None, district=None, specialty=None, emergency_only=False):
+    """Các giá trị lọc yêu cầu của một bộ lọc, dạng tuple đã sắp xếp (dùng làm khóa cache)"""
+    required = {
+        (dimension, code)
+        for dimension, code in (('hospital_type', hospital_type), ('district', district), ('specialty', specialty))
+        if code
+    }
+    if emergency_only:
+        required.add(('emergency', True))
+    return tuple(sorted(required, key=repr))
+
+
+def km_to_chord(km):
+    """Khoảng cách mặt cầu (km) -> độ dài dây cung trên mặt cầu đơn vị"""
+    theta = km / EARTH_RADIUS_KM
+    if theta >= math.pi:
+        return 2.0
+    return 2.0 * math.sin(theta / 2.0)
+
+
+class SpatialIndex:
+    """KD-tree bất biến trên tọa độ 3D của mặt cầu đơn vị.
+
+    Các điểm được sắp xếp lại sao cho mỗi nút lá là một đoạn liên tiếp
+    [lo, hi) của các mảng ``ids``/``lats``/``lngs``. ``facets`` (tùy chọn) là
+    tập giá trị lọc của từng điểm; chỉ mục giữ vị trí các điểm theo từng giá
+    trị để dựng chỉ mục con theo bộ lọc. Các giá trị lấy từ chính dữ liệu nên
+    mã ngoài danh sách choices (quận, chuyên khoa mới nhập) vẫn lọc được.
+    """
+
+    def __init__(self, ids, lats, lngs, facets=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        vectors = to_unit_vectors(lats, lngs)
+        order = np.arange(len(ids))
+        self._root = self._build(order, vectors, 0, len(order)) if len(order) else None
+        self.ids = ids[order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.facets = None if facets is None else self._facet_positions(facets, order)
+        self._subsets = OrderedDict()
+        self._subsets_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _facet_positions(facets, order):
+        """{giá trị lọc: vị trí các điểm (theo thứ tự đã sắp xếp lại)}"""
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        positions = {}
+        for row, row_facets in enumerate(facets):
+            for facet in row_facets:
+                positions.setdefault(facet, []).append(row)
+        return {facet: rank[np.array(rows, dtype=np.int64)] for facet, rows in positions.items()}
+
+    def subset(self, required):
+        """Chỉ mục con chỉ gồm các điểm có đủ mọi giá trị lọc trong ``required`` (xem ``facet_key``).
+
+        Mỗi tổ hợp bộ lọc được dựng một lần rồi giữ trong bộ nhớ (LRU), nên
+        truy vấn "cấp cứu + tim mạch gần nhất" chỉ duyệt các bệnh viện khớp
+        bộ lọc dù chúng thưa thớt trong thành phố.
+        """
+        if not required or self.facets is None:
+            return self
+        with self._subsets_lock:
+            index = self._subsets.get(required)
+            if index is not None:
+                self._subsets.move_to_end(required)
+                return index
+
+        selected = np.ones(len(self.ids), dtype=bool)
+        for facet in required:
+            matched = np.zeros(len(self.ids), dtype=bool)
+            # Giá trị không có trong dữ liệu: không điểm nào khớp
+            matched[self.facets.get(facet, [])] = True
+            selected &= matched
+        index = SpatialIndex(self.ids[selected], self.lats[selected], self.lngs[selected])
+        with self._subsets_lock:
+            self._subsets[required] = index
+            while len(self._subsets) > MAX_FACET_INDEXES:
+                self._subsets.popitem(last=False)
+        return index
+
+    def _build(self, order, vectors, lo, hi):
+        if hi - lo <= LEAF_SIZE:
+            return (None, lo, hi)
+
+        # Chia theo trục có độ trải rộng lớn nhất
+        segment = order[lo:hi]
+        points = vectors[segment]
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+
+        order[lo:hi] = segment[np.argsort(points[:, axis], kind='stable')]
+        mid = (lo + hi) // 2
+        split = float(vectors[order[mid], axis])
+        return (
+            axis,
+            split,
+            self._build(order, vectors, lo, mid),
+            self._build(order, vectors, mid, hi),
+        )
+
+    def nearest(self, lat, lng, k, max_distance=None):
+        """k bệnh viện gần nhất, trả về danh sách (id, km) tăng dần theo khoảng cách"""
+        if self._root is None or k <= 0:
+            return []
+        query = to_unit_vectors(lat, lng)[0]
+        bound = math.inf if max_distance is None else max_distance
+        best = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        best = self._search_nearest(self._root, query, lat, lng, k, bound, best)
+        positions, distances = best
+        return list(zip(self.ids[positions].tolist(), distances.tolist()))
+
+    def within(self, lat, lng, radius):
+        """Tất cả bệnh viện trong bán kính ``radius`` km, sắp xếp theo khoảng cách"""
+        positions, distances = self._within_positions(lat, lng, radius)
+        return list(zip(self.ids[positions].tolist(), distances.tolist()))
+
+    def points_within(self, lat, lng, radius):
+        """(ids, lats, lngs) của các điểm trong bán kính ``radius`` km"""
+        positions, _ = self._within_positions(lat, lng, radius)
+        return self.ids[positions], self.lats[positions], self.lngs[positions]
+
+    def _within_positions(self, lat, lng, radius):
+        """Vị trí và khoảng cách các điểm trong bán kính, tăng dần theo khoảng cách"""
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        if self._root is None:
+            return empty
+        query = to_unit_vectors(lat, lng)[0]
+        ranges = []
+        self._collect_within(self._root, query, km_to_chord(radius) ** 2, ranges)
+        if not ranges:
+            return empty
+        positions = np.concatenate([np.arange(lo, hi) for lo, hi in ranges])
+        distances = haversine_km(lat, lng, self.lats[positions], self.lngs[positions])
+        ranked = nearest_positions(distances, max_distance=radius)
+        return positions[ranked], distances[ranked]
+
+    def _search_nearest(self, node, query, lat, lng, k, bound, best):
+        if node[0] is None:
+            lo, hi = node[1], node[2]
+            distances = haversine_km(lat, lng, self.lats[lo:hi], self.lngs[lo:hi])
+            positions = np.concatenate((best[0], np.arange(lo, hi)))
+            distances = np.concatenate((best[1], distances))
+            ranked = nearest_positions(distances, k=k, max_distance=bound)
+            return positions[ranked], distances[ranked]
+
+        axis, split, left, right = node
+        diff = query[axis] - split
+        near, far = (left, right) if diff < 0 else (right, left)
+        best = self._search_nearest(near, query, lat, lng, k, bound, best)
+        worst = best[1][-1] if len(best[1]) == k else bound
+        if diff * diff <= km_to_chord(worst) ** 2:
+            best = self._search_nearest(far, query, lat, lng, k, bound, best)
+        return best
+
+    def _collect_within(self, node, query, bound, ranges):
+        if node[0] is None:
+            ranges.append((node[1], node[2]))
+            return
+
+        axis, split, left, right = node
+        diff = query[axis] - split
+        if diff < 0 or diff * diff <= bound:
+            self._collect_within(left, query, bound, ranges)
+        if diff >= 0 or diff * diff <= bound:
+            self._collect_within(right, query, bound, ranges)
+
+
+# ===========================
+# Chỉ mục dùng chung trong tiến trình
+# ===========================
+_lock = threading.Lock()
+_state = {'index': None, 'version': None}
+
+
+def build_spatial_index():
+    """Dựng chỉ mục từ các bệnh viện đang hoạt động có tọa độ"""
+    from .models import Hospital
+
+    rows = Hospital.objects.filter(
+        is_active=True,
+        latitude__isnull=False,
+        longitude__isnull=False
+    ).order_by('id').values_list(
+        'id', 'latitude', 'longitude',
+        'hospital_type', 'district', 'emergency_services', 'main_specialty', 'specialties'
+    )
+    ids, lats, lngs, facets = [], [], [], []
+    for pk, lat, lng, *values in rows.iterator():
+        ids.append(pk)
+        lats.append(lat)
+        lngs.append(lng)
+        facets.append(row_facets(*values))
+    return SpatialIndex(ids, lats, lngs, facets)
+
+
+def get_spatial_index():
+    """Chỉ mục hiện tại của tiến trình, dựng lại khi bị vô hiệu hoặc dữ liệu đổi.
+
+    Chỉ mục gắn với phiên bản dữ liệu (``cache.catalog_version``) nên thay đổi ở
+    tiến trình khác cũng được thấy ngay ở truy vấn kế tiếp.
+    """
+    version = catalog_version()
+    with _lock:
+        index = _state['index']
+        if index is None or _state['version'] != version:
+            index = build_spatial_index()
+            _state['index'] = index
+            _state['version'] = version
+        return index
+
+
+def invalidate_spatial_index():
+    """Buộc lần truy vấn tiếp theo dựng lại chỉ mục"""
+    with _lock:
+        _state['index'] = None
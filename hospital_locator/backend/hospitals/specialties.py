@@ -0,0 +1,86 @@
+"""
+Bảng quan hệ bệnh viện - chuyên khoa (HospitalSpecialty).
+
+Chuyên khoa của một bệnh viện nằm ở hai chỗ: ``main_specialty`` và danh sách
+JSON ``specialties``. Lọc/đếm theo chuyên khoa trên JSON phải quét chuỗi ở mọi
+dòng (và ``__contains`` không chạy trên SQLite), nên mỗi chuyên khoa của mỗi bệnh
+viện được lưu thành một dòng có chỉ mục. Lọc là một phép join, đếm là một GROUP BY.
+
+Bảng được ghi lại cho các bệnh viện đổi ``main_specialty``/``specialties`` khi
+lưu (signal) và trên các đường ghi hàng loạt của HospitalQuerySet;
+``rebuild_specialties`` dựng lại toàn bộ.
+"""
+from django.db import connection, transaction
+
+# Các trường ảnh hưởng tới bảng chuyên khoa
+SPECIALTY_FIELDS = {'main_specialty', 'specialties'}
+
+# Độ dài tối đa của mã chuyên khoa (bằng Hospital.main_specialty)
+MAX_CODE_LENGTH = 20
+
+
+def specialty_codes(main_specialty, specialties):
+    """{mã: có phải chuyên khoa chính?} của một bệnh viện; bỏ qua giá trị JSON không hợp lệ"""
+    codes = {}
+    for code in specialties if isinstance(specialties, list) else []:
+        if isinstance(code, str) and code and len(code) <= MAX_CODE_LENGTH:
+            codes[code] = False
+    if main_specialty:
+        codes[main_specialty] = True
+    return codes
+
+
+def _links(hospitals, link_model):
+    return [
+        link_model(hospital_id=hospital.pk, specialty=code, is_main=is_main)
+        for hospital in hospitals
+        for code, is_main in specialty_codes(hospital.main_specialty, hospital.specialties).items()
+    ]
+
+
+def _batches(items, size=None):
+    size = size or connection.features.max_query_params or len(items) or 1
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def sync_specialties(hospitals, link_model=None):
+    """Ghi lại các dòng chuyên khoa của ``hospitals`` (đã có pk)"""
+    if link_model is None:
+        from .models import HospitalSpecialty as link_model
+
+    hospitals = [hospital for hospital in hospitals if hospital.pk is not None]
+    with transaction.atomic():
+        for batch in _batches([hospital.pk for hospital in hospitals]):
+            link_model.objects.filter(hospital_id__in=batch).delete()
+        link_model.objects.bulk_create(_links(hospitals, link_model), batch_size=1000)
+
+
+def sync_specialties_for(pks, hospital_model=None, link_model=None):
+    """Như ``sync_specialties`` nhưng đọc lại các bệnh viện theo pk"""
+    if hospital_model is None:
+        from .models import Hospital as hospital_model
+
+    for batch in _batches(list(pks)):
+        hospitals = hospital_model.objects.filter(pk__in=batch).only('id', *SPECIALTY_FIELDS)
+        sync_specialties(hospitals, link_model)
+
+
+def rebuild_specialties(hospital_model=None, link_model=None, batch_size=2000):
+    """Dựng lại toàn bộ bảng chuyên khoa từ bảng bệnh viện; trả về số dòng"""
+    if hospital_model is None or link_model is None:
+        from .models import Hospital as hospital_model, HospitalSpecialty as link_model
+
+    total = 0
+    with transaction.atomic():
+        link_model.objects.all().delete()
+        hospitals = hospital_model.objects.only('id', *SPECIALTY_FIELDS).order_by('id')
+        batch = []
+        for hospital in hospitals.iterator(chunk_size=batch_size):
+            batch.append(hospital)
+            if len(batch) >= batch_size:
+                total += len(link_model.objects.bulk_create(_links(batch, link_model)))
+                batch = []
+        if batch:
+            total += len(link_model.objects.bulk_create(_links(batch, link_model)))
+    return total
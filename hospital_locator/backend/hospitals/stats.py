@@ -0,0 +1,126 @@
+"""
+Bảng thống kê phi chuẩn hóa cho action ``stats``.
+
+Mỗi dòng HospitalStat là một bộ đếm (chiều, giá trị) tính trên các bệnh viện
+đang hoạt động. Bộ đếm được cập nhật theo delta khi lưu/xóa một bệnh viện và
+trên các đường ghi hàng loạt của HospitalQuerySet; ``rebuild_stats`` tính lại
+toàn bộ bằng vài truy vấn GROUP BY khi cần sửa chữa.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+# Các trường ảnh hưởng tới thống kê
+STAT_FIELDS = {'is_active', 'hospital_type', 'district', 'main_specialty', 'emergency_services', 'capacity'}
+
+# Số dòng tối đa tính delta khi cập nhật hàng loạt; lớn hơn thì tính lại toàn bộ
+MAX_DELTA_ROWS = 1000
+
+STAT_DIMENSIONS = ['total', 'hospital_type', 'district', 'main_specialty', 'emergency', 'capacity']
+
+TOTAL = ('total', 'all')
+EMERGENCY = ('emergency', 'true')
+CAPACITY_SUM = ('capacity', 'sum')
+CAPACITY_COUNT = ('capacity', 'count')
+
+
+def contribution(hospital):
+    """Các bộ đếm mà một bệnh viện đóng góp vào"""
+    counters = Counter()
+    if not hospital.is_active:
+        return counters
+    counters[TOTAL] += 1
+    counters[('hospital_type', hospital.hospital_type)] += 1
+    counters[('district', hospital.district)] += 1
+    counters[('main_specialty', hospital.main_specialty)] += 1
+    if hospital.emergency_services:
+        counters[EMERGENCY] += 1
+    if hospital.capacity is not None:
+        counters[CAPACITY_SUM] += hospital.capacity
+        counters[CAPACITY_COUNT] += 1
+    return counters
+
+
+def total_contribution(hospitals):
+    """Tổng đóng góp của nhiều bệnh viện (dùng cho bulk_create)"""
+    counters = Counter()
+    for hospital in hospitals:
+        counters.update(contribution(hospital))
+    return counters
+
+
+def aggregate_stats(queryset):
+    """Các bộ đếm của một queryset, tính bằng GROUP BY trong SQL"""
+    queryset = queryset.filter(is_active=True).order_by()
+    counters = Counter()
+    for dimension in ('hospital_type', 'district', 'main_specialty'):
+        for row in queryset.values(dimension).annotate(n=Count('id')):
+            counters[(dimension, row[dimension])] += row['n']
+
+    totals = queryset.aggregate(
+        total=Count('id'),
+        capacity_sum=Sum('capacity'),
+        capacity_count=Count('capacity'),
+    )
+    counters[TOTAL] += totals['total']
+    counters[EMERGENCY] += queryset.filter(emergency_services=True).count()
+    counters[CAPACITY_SUM] += totals['capacity_sum'] or 0
+    counters[CAPACITY_COUNT] += totals['capacity_count']
+    return counters
+
+
+def apply_deltas(deltas, stat_model=None):
+    """Cộng delta vào các bộ đếm bằng UPDATE ... SET count = count + delta"""
+    if stat_model is None:
+        from .models import HospitalStat as stat_model
+
+    for (dimension, value), delta in deltas.items():
+        if not delta:
+            continue
+        rows = stat_model.objects.filter(dimension=dimension, value=value)
+        if not rows.update(count=F('count') + delta):
+            stat_model.objects.get_or_create(dimension=dimension, value=value)
+            rows.update(count=F('count') + delta)
+
+
+def subtract(after, before):
+    """Delta giữa hai tập bộ đếm (giữ cả giá trị âm)"""
+    deltas = Counter(after)
+    deltas.subtract(before)
+    return deltas
+
+
+def rebuild_stats(hospital_model=None, stat_model=None):
+    """Tính lại toàn bộ bảng thống kê từ bảng bệnh viện"""
+    if hospital_model is None or stat_model is None:
+        from .models import Hospital as hospital_model, HospitalStat as stat_model
+
+    with transaction.atomic():
+        counters = aggregate_stats(hospital_model.objects.all())
+        stat_model.objects.filter(dimension__in=STAT_DIMENSIONS).delete()
+        stat_model.objects.bulk_create([
+            stat_model(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in counters.items()
+        ])
+    return counters
+
+
+def read_stats():
+    """Thống kê cho action ``stats`` đọc từ bảng bộ đếm (một truy vấn)"""
+    from .models import Hospital, HospitalStat
+
+    counters = {
+        (dimension, value): count
+        for dimension, value, count in HospitalStat.objects.values_list('dimension', 'value', 'count')
+    }
+    capacity_count = counters.get(CAPACITY_COUNT, 0)
+    average = counters.get(CAPACITY_SUM, 0) / capacity_count if capacity_count else 0
+    return {
+        'total_hospitals': counters.get(TOTAL, 0),
+        'by_type': {code: counters.get(('hospital_type', code), 0) for code, _ in Hospital.HOSPITAL_TYPES},
+        'by_district': {code: counters.get(('district', code), 0) for code, _ in Hospital.DISTRICTS},
+        'by_specialty': {code: counters.get(('main_specialty', code), 0) for code, _ in Hospital.SPECIALTIES},
+        'emergency_count': counters.get(EMERGENCY, 0),
+        'average_capacity': round(average, 1),
+    }
@@ -1,3 +1,1547 @@
-from django.test import TestCase
+import io
+import json
+import math
+import os
+import random
+import struct
+import tempfile
+import threading
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from hospitals import (
+    autocomplete, cache, distance, fragments, fuzzy, geohash, origin_cache, readers, spatial, stats, tiles, views,
+)
+from hospitals.admin import HospitalAdmin, admin_site
+from hospitals.importer import (
+    IMPORT_FIELDS, HospitalImporter, HospitalSync, MalformedRecord, clean_record, natural_key,
+)
+from hospitals.models import Hospital
+from hospitals.pagination import HospitalCursorPagination
+from hospitals.serializers import HospitalListSerializer, HospitalRowSerializer
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+DISTRICT_CODES = [code for code, _ in Hospital.DISTRICTS]
+TYPE_CODES = [code for code, _ in Hospital.HOSPITAL_TYPES]
+SPECIALTY_CODES = [code for code, _ in Hospital.SPECIALTIES]
+
+
+def scattered_hospitals(count, seed=0):
+    """``count`` bệnh viện rải ngẫu nhiên (cố định theo ``seed``) quanh TP.HCM"""
+    rng = random.Random(seed)
+    return Hospital.objects.bulk_create([
+        Hospital(
+            name=f'Bệnh viện {index}', address=f'{index} Lê Lợi', district=rng.choice(DISTRICT_CODES),
+            hospital_type=rng.choice(TYPE_CODES), main_specialty=rng.choice(SPECIALTY_CODES),
+            specialties=rng.sample(SPECIALTY_CODES, 2), emergency_services=rng.random() < 0.4,
+            capacity=rng.choice([None, rng.randint(10, 2000)]),
+            latitude=round(rng.uniform(10.65, 10.90), 6), longitude=round(rng.uniform(106.55, 106.80), 6),
+        )
+        for index in range(count)
+    ])
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Khoảng cách (km) tính từng cặp bằng math, làm mốc so sánh"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def brute_force(hospitals, lat, lng, k=None, max_distance=None):
+    """(id, km) gần nhất trước, duyệt toàn bộ các bệnh viện có tọa độ"""
+    found = sorted(
+        (haversine(lat, lng, h.latitude, h.longitude), h.pk)
+        for h in hospitals if h.latitude is not None and h.longitude is not None
+    )
+    found = [(pk, km) for km, pk in found if max_distance is None or km <= max_distance]
+    return found[:k]
+
+
+class SpatialIndexTests(TestCase):
+    """KD-tree trong bộ nhớ cho cùng kết quả với duyệt toàn bộ và với truy vấn SQL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitals = scattered_hospitals(300)
+        Hospital.objects.create(name='Chưa có tọa độ', address='1 Lê Lợi', district='quan1')
+        Hospital.objects.create(
+            name='Đã đóng', address='2 Lê Lợi', district='quan1', latitude=10.77, longitude=106.70, is_active=False,
+        )
+
+    def origins(self, count=20):
+        rng = random.Random(1)
+        return [(rng.uniform(10.6, 10.95), rng.uniform(106.5, 106.85)) for _ in range(count)]
+
+    def assertMatchesEqual(self, actual, expected):
+        self.assertEqual([pk for pk, _ in actual], [pk for pk, _ in expected])
+        for (_, km), (_, expected_km) in zip(actual, expected):
+            self.assertAlmostEqual(km, expected_km, places=9)
+
+    def test_nearest_matches_brute_force(self):
+        index = spatial.SpatialIndex(
+            [h.pk for h in self.hospitals], [h.latitude for h in self.hospitals], [h.longitude for h in self.hospitals],
+        )
+        for lat, lng in self.origins():
+            for k, max_distance in [(1, None), (7, None), (20, 3.0), (300, None)]:
+                with self.subTest(lat=lat, lng=lng, k=k, max_distance=max_distance):
+                    self.assertMatchesEqual(
+                        index.nearest(lat, lng, k, max_distance=max_distance),
+                        brute_force(self.hospitals, lat, lng, k, max_distance),
+                    )
+
+    def test_within_matches_brute_force(self):
+        index = spatial.build_spatial_index()
+        self.assertEqual(len(index), 300)
+        for lat, lng in self.origins():
+            for radius in (0.5, 2.0, 8.0):
+                with self.subTest(lat=lat, lng=lng, radius=radius):
+                    self.assertMatchesEqual(
+                        index.within(lat, lng, radius), brute_force(self.hospitals, lat, lng, max_distance=radius),
+                    )
+
+    def nearest(self, lat, lng, **params):
+        response = self.client.post(
+            '/api/hospitals/nearest/', {'latitude': lat, 'longitude': lng, 'limit': 10, **params},
+            content_type='application/json',
+        )
+        return [(row['id'], row['distance']['m']) for row in response.json()]
+
+    def nearby(self, lat, lng, radius):
+        rows = self.client.get('/api/hospitals/nearby/', {'lat': lat, 'lng': lng, 'radius': radius}).json()
+        return [row['id'] for row in rows]
+
+    def test_endpoints_match_sql_path(self):
+        for lat, lng in self.origins(10):
+            with self.subTest(lat=lat, lng=lng):
+                indexed = (self.nearest(lat, lng), self.nearest(lat, lng, max_distance=2), self.nearby(lat, lng, 3))
+                with override_settings(HOSPITAL_SPATIAL_INDEX_ENABLED=False):
+                    sql = (self.nearest(lat, lng), self.nearest(lat, lng, max_distance=2), self.nearby(lat, lng, 3))
+                self.assertEqual(indexed, sql)
+                self.assertTrue(indexed[0])
+                self.assertEqual(indexed[2], [pk for pk, _ in brute_force(self.hospitals, lat, lng, 20, 3)])
+
+    def test_index_follows_writes(self):
+        self.nearest(10.5, 106.5)
+        hospital = Hospital.objects.create(
+            name='Bệnh viện mới', address='3 Lê Lợi', district='nhabe', latitude=10.5, longitude=106.5,
+        )
+        self.assertEqual(self.nearest(10.5, 106.5, limit=1), [(hospital.pk, 0)])
+        Hospital.objects.filter(pk=hospital.pk).update(is_active=False)
+        self.assertNotIn(hospital.pk, [pk for pk, _ in self.nearest(10.5, 106.5, limit=1)])
+
+
+class HaversineTests(TestCase):
+    """Haversine vector hóa bằng NumPy khớp công thức tính từng cặp"""
+
+    def points(self, count, seed):
+        rng = random.Random(seed)
+        return [(rng.uniform(-89, 89), rng.uniform(-180, 180)) for _ in range(count)]
+
+    def test_haversine_km_matches_scalar_formula(self):
+        targets = self.points(200, 1) + [(10.7578, 106.6594), (-10.7578, -73.3406)]
+        for lat, lng in self.points(10, 2) + [(10.7578, 106.6594)]:
+            distances = distance.haversine_km(lat, lng, [t[0] for t in targets], [t[1] for t in targets])
+            for km, (target_lat, target_lng) in zip(distances.tolist(), targets):
+                self.assertAlmostEqual(km, haversine(lat, lng, target_lat, target_lng), places=6)
+
+    def test_known_distance(self):
+        # Chợ Rẫy -> Nhi Đồng 1, khoảng 1,6 km
+        km = distance.haversine_km(10.7578, 106.6594, [10.7677], [106.6702])[0]
+        self.assertAlmostEqual(km, 1.6, delta=0.1)
+        self.assertEqual(distance.haversine_km(10.0, 106.0, [10.0], [106.0])[0], 0.0)
+
+    def test_matrix_matches_rows(self):
+        origins, targets = self.points(7, 3), self.points(11, 4)
+        matrix = distance.haversine_matrix(
+            [o[0] for o in origins], [o[1] for o in origins], [t[0] for t in targets], [t[1] for t in targets],
+        )
+        self.assertEqual(matrix.shape, (7, 11))
+        for row, (lat, lng) in zip(matrix, origins):
+            expected = distance.haversine_km(lat, lng, [t[0] for t in targets], [t[1] for t in targets])
+            self.assertTrue(np.allclose(row, expected, rtol=0, atol=1e-9))
+
+    def test_nearest_positions_keeps_queryset_order_on_ties(self):
+        distances = [5.0, 1.0, 3.0, 1.0, 3.0, 9.0]
+        self.assertEqual(distance.nearest_positions(distances).tolist(), [1, 3, 2, 4, 0, 5])
+        self.assertEqual(distance.nearest_positions(distances, k=3).tolist(), [1, 3, 2])
+        self.assertEqual(distance.nearest_positions(distances, max_distance=3.0).tolist(), [1, 3, 2, 4])
+        self.assertEqual(distance.nearest_positions(distances, k=0).tolist(), [])
+
+    def test_coordinate_arrays_skip_missing_coordinates(self):
+        first = Hospital.objects.create(name='A', address='1', district='quan1', latitude=10.1, longitude=106.1)
+        Hospital.objects.create(name='B', address='2', district='quan1')
+        last = Hospital.objects.create(name='C', address='3', district='quan1', latitude=10.3, longitude=106.3)
+        ids, lats, lngs = distance.coordinate_arrays(Hospital.objects.order_by('-id'))
+        self.assertEqual(ids.tolist(), [last.pk, first.pk])
+        self.assertEqual((lats.tolist(), lngs.tolist()), ([10.3, 10.1], [106.3, 106.1]))
+
+
+class BoundingBoxTests(TestCase):
+    """Hộp bao trong SQL không làm mất bệnh viện nào trong bán kính"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitals = scattered_hospitals(200, seed=3)
+
+    def test_box_contains_every_point_in_radius(self):
+        rng = random.Random(5)
+        for lat, lng, radius in [(10.77, 106.7, 5.0), (60.0, 10.0, 300.0), (-45.0, -70.0, 1000.0)]:
+            min_lat, max_lat, min_lng, max_lng = distance.bounding_box(lat, lng, radius)
+            span = 2 * radius / 111.0 / max(math.cos(math.radians(lat)), 0.1)
+            for _ in range(2000):
+                point = (lat + rng.uniform(-span, span), lng + rng.uniform(-span, span))
+                if haversine(lat, lng, *point) <= radius:
+                    self.assertTrue(min_lat <= point[0] <= max_lat and min_lng <= point[1] <= max_lng, point)
+
+    def test_poles_and_antimeridian_drop_longitude_bounds(self):
+        self.assertEqual(distance.bounding_box(89.9, 0.0, 50.0)[2:], (None, None))
+        self.assertEqual(distance.bounding_box(10.0, 179.99, 50.0)[2:], (None, None))
+        self.assertIsNotNone(distance.bounding_box(10.0, 106.0, 50.0)[2])
+
+    def test_within_radius_matches_brute_force(self):
+        queryset = Hospital.objects.filter(is_active=True).order_by('id')
+        rng = random.Random(7)
+        for _ in range(20):
+            lat, lng = rng.uniform(10.6, 10.95), rng.uniform(106.5, 106.85)
+            for radius, k in [(1.0, None), (4.0, None), (4.0, 5), (50.0, None)]:
+                with self.subTest(lat=lat, lng=lng, radius=radius, k=k):
+                    found = distance.within_radius(queryset, lat, lng, radius, k=k)
+                    expected = brute_force(self.hospitals, lat, lng, k, radius)
+                    self.assertEqual([pk for pk, _ in found], [pk for pk, _ in expected])
+
+    def test_search_by_location_uses_filters(self):
+        rows = self.client.get('/api/hospitals/search/', {
+            'latitude': 10.77, 'longitude': 106.68, 'radius': 6, 'hospital_type': 'clinic', 'query': 'benh vien',
+        }).json()
+        expected = brute_force([h for h in self.hospitals if h.hospital_type == 'clinic'], 10.77, 106.68, None, 6)
+        self.assertTrue(expected)
+        self.assertEqual([row['id'] for row in rows], [pk for pk, _ in expected])
+
+
+class GeohashTests(TestCase):
+    """Mã geohash, vùng 9 ô lân cận và cột geohash trên mọi đường ghi"""
+
+    def test_encode_and_decode(self):
+        self.assertEqual(geohash.encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        cell = geohash.encode(10.7578, 106.6594, 6)
+        lat, lng, lat_err, lng_err = geohash.decode(cell)
+        self.assertLessEqual(abs(lat - 10.7578), lat_err)
+        self.assertLessEqual(abs(lng - 106.6594), lng_err)
+        self.assertTrue(geohash.encode(10.7578, 106.6594).startswith(cell))
+        with self.assertRaises(ValueError):
+            geohash.decode('w3a')
+
+    def test_neighbourhood_covers_radius(self):
+        rng = random.Random(9)
+        for lat, lng, radius in [(10.77, 106.7, 0.3), (10.77, 106.7, 5.0), (60.0, 25.0, 20.0), (0.0, 0.0, 2.0)]:
+            cells = geohash.neighbourhood(lat, lng, radius)
+            self.assertEqual(len(cells), 9)
+            span = 2 * radius / 111.0 / math.cos(math.radians(lat))
+            for _ in range(2000):
+                point = (lat + rng.uniform(-span, span), lng + rng.uniform(-span, span))
+                if haversine(lat, lng, *point) <= radius:
+                    self.assertTrue(any(geohash.encode(*point).startswith(cell) for cell in cells), point)
+
+    def test_huge_radius_has_no_cells(self):
+        self.assertEqual(geohash.neighbourhood(10.0, 106.0, 10000), [])
+
+    def test_radius_query_filters_on_cells(self):
+        near = Hospital.objects.create(name='A', address='1', district='quan1', latitude=10.7578, longitude=106.6594)
+        Hospital.objects.create(name='B', address='2', district='quan1', latitude=10.9, longitude=106.9)
+        with CaptureQueriesContext(connection) as context:
+            found = distance.within_radius(Hospital.objects.all(), 10.76, 106.66, 1.0)
+        self.assertEqual([pk for pk, _ in found], [near.pk])
+        self.assertIn('"geohash" >=', context.captured_queries[-1]['sql'])
+
+    def test_column_follows_every_write_path(self):
+        hospital = Hospital.objects.create(
+            name='A', address='1', district='quan1', latitude=10.7578, longitude=106.6594,
+        )
+        bulk = Hospital.objects.bulk_create([
+            Hospital(name='B', address='2', district='quan1', latitude=10.8, longitude=106.7),
+        ])[0]
+
+        def stored(pk):
+            return Hospital.objects.values_list('geohash', flat=True).get(pk=pk)
+
+        self.assertEqual(stored(hospital.pk), geohash.encode(10.7578, 106.6594))
+        self.assertEqual(stored(bulk.pk), geohash.encode(10.8, 106.7))
+
+        hospital.latitude = 10.9
+        hospital.save(update_fields=['latitude'])
+        self.assertEqual(stored(hospital.pk), geohash.encode(10.9, 106.6594))
+
+        Hospital.objects.filter(pk=bulk.pk).update(longitude=106.75)
+        self.assertEqual(stored(bulk.pk), geohash.encode(10.8, 106.75))
+
+        bulk.refresh_from_db()
+        bulk.latitude = 10.85
+        Hospital.objects.bulk_update([bulk], ['latitude'])
+        self.assertEqual(stored(bulk.pk), geohash.encode(10.85, 106.75))
+
+        Hospital.objects.filter(pk=bulk.pk).update(latitude=None)
+        self.assertEqual(stored(bulk.pk), '')
+
+
+class NearestBatchTests(TestCase):
+    """nearest_batch trả cho mỗi điểm đúng kết quả của nearest"""
+
+    @classmethod
+    def setUpTestData(cls):
+        scattered_hospitals(150, seed=11)
+
+    def origins(self, count):
+        rng = random.Random(12)
+        return [
+            {'id': f'p{index}', 'latitude': rng.uniform(10.65, 10.9), 'longitude': rng.uniform(106.55, 106.8)}
+            for index in range(count)
+        ]
+
+    def post(self, url, payload):
+        return self.client.post(url, payload, content_type='application/json')
+
+    def batch(self, payload):
+        response = self.post('/api/hospitals/nearest_batch/', payload)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(b''.join(response.streaming_content))['results']
+
+    def test_each_origin_matches_nearest(self):
+        origins = self.origins(7)
+        for filters in [{}, {'emergency_only': True, 'hospital_type': 'public'}, {'specialty': 'cardiology'}]:
+            with self.subTest(filters=filters), mock.patch('hospitals.views.BATCH_CHUNK_SIZE', 3):
+                results = self.batch({'origins': origins, 'limit': 4, 'max_distance': 6, **filters})
+                self.assertEqual([result['origin'] for result in results], origins)
+                self.assertTrue(any(result['hospitals'] for result in results))
+                for origin, result in zip(origins, results):
+                    single = self.post('/api/hospitals/nearest/', {
+                        'latitude': origin['latitude'], 'longitude': origin['longitude'],
+                        'limit': 4, 'max_distance': 6, **filters,
+                    }).json()
+                    self.assertEqual(result['hospitals'], single)
+
+    def test_invalid_batches_are_rejected(self):
+        self.assertEqual(self.post('/api/hospitals/nearest_batch/', {'origins': []}).status_code, 400)
+        with override_settings(HOSPITAL_BATCH_MAX_ORIGINS=2):
+            response = self.post('/api/hospitals/nearest_batch/', {'origins': self.origins(3)})
+        self.assertEqual(response.status_code, 400)
+        response = self.post('/api/hospitals/nearest_batch/', {'origins': self.origins(1), 'district': 'khong-co'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_far_origin_finds_nothing(self):
+        results = self.batch({'origins': [{'latitude': 21.03, 'longitude': 105.85}], 'max_distance': 10})
+        self.assertEqual(results, [{'origin': {'latitude': 21.03, 'longitude': 105.85}, 'hospitals': []}])
+
+
+class DistanceMatrixTests(TestCase):
+    """distance_matrix: đúng khoảng cách, cùng kết quả với mọi kích thước khối"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitals = sorted(scattered_hospitals(40, seed=13), key=lambda h: h.pk)
+        rng = random.Random(14)
+        cls.origins = [
+            {'id': f'p{index}', 'latitude': round(rng.uniform(10.65, 10.9), 5),
+             'longitude': round(rng.uniform(106.55, 106.8), 5)}
+            for index in range(9)
+        ]
+
+    def matrix(self, **payload):
+        response = self.client.post(
+            '/api/hospitals/distance_matrix/', {'origins': self.origins, **payload}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_values(self):
+        lines = self.matrix(output_format='csv').splitlines()
+        header = lines[0].split(',')
+        self.assertEqual(header[:3], ['origin', 'latitude', 'longitude'])
+        self.assertEqual([int(pk) for pk in header[3:]], [h.pk for h in self.hospitals])
+        self.assertEqual(len(lines), len(self.origins) + 1)
+        for line, origin in zip(lines[1:], self.origins):
+            cells = line.split(',')
+            self.assertEqual(cells[:3], [origin['id'], str(origin['latitude']), str(origin['longitude'])])
+            expected = [haversine(origin['latitude'], origin['longitude'], h.latitude, h.longitude) for h in self.hospitals]
+            for cell, km in zip(cells[3:], expected):
+                self.assertAlmostEqual(float(cell), km, delta=0.0005)
+
+    def test_ndjson_rows(self):
+        lines = [json.loads(line) for line in self.matrix(hospital_type='public').splitlines()]
+        public = [h for h in self.hospitals if h.hospital_type == 'public']
+        self.assertEqual(lines[0], {'hospital_ids': [h.pk for h in public]})
+        self.assertEqual([line['origin'] for line in lines[1:]], self.origins)
+        self.assertTrue(all(len(line['distances']) == len(public) for line in lines[1:]))
+
+    def test_block_sizes_do_not_change_output(self):
+        for output_format in ['csv', 'ndjson']:
+            expected = self.matrix(output_format=output_format)
+            for origin_block, hospital_block in [(1, 1), (2, 3), (4, 7), (100, 100)]:
+                with self.subTest(output_format=output_format, origin_block=origin_block, hospital_block=hospital_block):
+                    self.assertEqual(self.matrix(
+                        output_format=output_format, origin_block=origin_block, hospital_block=hospital_block,
+                    ), expected)
+
+    def test_no_matching_hospitals(self):
+        Hospital.objects.update(is_active=False)
+        lines = self.matrix(output_format='csv').splitlines()
+        self.assertEqual(lines[0], 'origin,latitude,longitude')
+        self.assertEqual(lines[1], f"p0,{self.origins[0]['latitude']},{self.origins[0]['longitude']}")
+
+
+class FacetIndexTests(TestCase):
+    """Chỉ mục con theo bộ lọc cho cùng kết quả với lọc rồi duyệt toàn bộ"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitals = scattered_hospitals(200, seed=15)
+
+    def matching(self, hospital_type=None, district=None, specialty=None, emergency_only=False):
+        return [
+            h for h in self.hospitals
+            if (not hospital_type or h.hospital_type == hospital_type)
+            and (not district or h.district == district)
+            and (not specialty or specialty == h.main_specialty or specialty in h.specialties)
+            and (not emergency_only or h.emergency_services)
+        ]
+
+    def test_filtered_nearest_matches_brute_force(self):
+        rng = random.Random(16)
+        for filters in [
+            {'hospital_type': 'public'},
+            {'district': DISTRICT_CODES[0]},
+            {'specialty': SPECIALTY_CODES[1]},
+            {'emergency_only': True, 'specialty': SPECIALTY_CODES[0]},
+            {'emergency_only': True, 'hospital_type': 'private', 'district': DISTRICT_CODES[1]},
+        ]:
+            lat, lng = rng.uniform(10.65, 10.9), rng.uniform(106.55, 106.8)
+            with self.subTest(filters=filters):
+                response = self.client.post('/api/hospitals/nearest/', {
+                    'latitude': lat, 'longitude': lng, 'limit': 5, 'max_distance': 50, **filters,
+                }, content_type='application/json')
+                self.assertEqual(response.status_code, 200)
+                expected = brute_force(self.matching(**filters), lat, lng, k=5)
+                self.assertEqual([h['id'] for h in response.json()], [pk for pk, _ in expected])
+
+    def test_specialty_list_is_indexed(self):
+        hospital = next(h for h in self.hospitals if h.specialties[0] != h.main_specialty)
+        index = spatial.build_spatial_index().subset(spatial.facet_key(specialty=hospital.specialties[0]))
+        self.assertIn(hospital.pk, index.ids.tolist())
+
+    def test_codes_outside_choices_are_indexed(self):
+        # Dữ liệu nạp vào có mã không nằm trong choices (binhchanh, ent)
+        extra = [
+            Hospital.objects.create(
+                name=f'Ngoài danh sách {index}', address='1 Quốc lộ 1A', district='binhchanh',
+                main_specialty='ent' if index % 2 else 'general', specialties=['ent'] if index % 2 else [],
+                latitude=10.70 + index / 100, longitude=106.60,
+            )
+            for index in range(4)
+        ]
+        for params, expected in [
+            ({'district': 'binhchanh'}, extra),
+            ({'specialty': 'ent'}, extra[1::2]),
+            ({'district': 'binhchanh', 'specialty': 'ent'}, extra[1::2]),
+            ({'district': 'khong-co'}, []),
+        ]:
+            query = {**params, 'latitude': 10.75, 'longitude': 106.65, 'radius': 100}
+            with self.subTest(params=params):
+                indexed = self.client.get('/api/hospitals/search/', query).json()
+                with override_settings(HOSPITAL_SPATIAL_INDEX_ENABLED=False):
+                    unindexed = self.client.get('/api/hospitals/search/', query).json()
+                self.assertEqual(sorted(row['id'] for row in indexed), sorted(h.pk for h in expected))
+                self.assertEqual(indexed, unindexed)
+
+    def test_subset_is_built_once(self):
+        index = spatial.build_spatial_index()
+        self.assertIs(index.subset(()), index)
+        required = spatial.facet_key(emergency_only=True)
+        subset = index.subset(required)
+        self.assertIs(index.subset(required), subset)
+        self.assertEqual(sorted(subset.ids.tolist()), sorted(h.pk for h in self.matching(emergency_only=True)))
+
+
+class CursorPaginationTests(TestCase):
+    """Phân trang keyset: đi hết các trang không trùng, không sót"""
+
+    @classmethod
+    def setUpTestData(cls):
+        capacities = [300, None, 120, 300, None, 50, 800]
+        for index, capacity in enumerate(capacities):
+            # Tên trùng nhau để khóa phụ id phải phân định thứ tự
+            Hospital.objects.create(
+                name=f'Bệnh viện {index % 3}', address=f'{index} Lê Lợi', district='quan1', capacity=capacity,
+            )
+
+    def walk(self, **params):
+        ids = []
+        response = self.client.get('/api/hospitals/', {'page_size': 2, **params})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.json()
+            self.assertLessEqual(len(page['results']), 2)
+            ids.extend(row['id'] for row in page['results'])
+            if page['next'] is None:
+                return ids
+            response = self.client.get(page['next'])
+
+    def expected(self, name, descending=False):
+        hospitals = list(Hospital.objects.all())
+        present = sorted(
+            (h for h in hospitals if getattr(h, name) is not None),
+            key=lambda h: (getattr(h, name), h.pk), reverse=descending,
+        )
+        missing = sorted((h for h in hospitals if getattr(h, name) is None), key=lambda h: h.pk, reverse=descending)
+        # NULL luôn ở cuối
+        return [h.pk for h in present + missing]
+
+    def test_walk_covers_every_row_once_per_ordering(self):
+        for ordering in ['name', '-name', 'created_at', '-created_at', 'capacity', '-capacity']:
+            with self.subTest(ordering=ordering):
+                ids = self.walk(ordering=ordering)
+                self.assertEqual(ids, self.expected(ordering.lstrip('-'), ordering.startswith('-')))
+
+    def test_exact_count_on_first_page(self):
+        page = self.client.get('/api/hospitals/', {'page_size': 2, 'count': 'exact'}).json()
+        self.assertEqual(page['count'], 7)
+        self.assertFalse(page['count_is_estimate'])
+
+    def test_unpaginated_list_is_unchanged(self):
+        self.assertEqual(len(self.client.get('/api/hospitals/').json()), 7)
+
+    def cursor(self, **cursor):
+        return HospitalCursorPagination().encode_cursor(cursor)
+
+    def test_tampered_cursor_is_not_found(self):
+        for ordering, cursor in [
+            ('created_at', self.cursor(o='created_at', v='không phải ngày', id=1)),
+            ('capacity', self.cursor(o='capacity', v='abc', id=1)),
+            ('capacity', self.cursor(o='capacity', v=[1], id=1)),
+            ('name', self.cursor(o='capacity', v=1, id=1)),
+            ('name', 'không-phải-base64'),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get('/api/hospitals/', {'ordering': ordering, 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class StatsCounterTests(TestCase):
+    """Bảng bộ đếm luôn bằng kết quả tính lại sau mọi đường ghi"""
+
+    @classmethod
+    def setUpTestData(cls):
+        scattered_hospitals(60, seed=17)
+        stats.rebuild_stats()
+
+    def assertStatsConsistent(self):
+        current = stats.read_stats()
+        stats.rebuild_stats()
+        self.assertEqual(current, stats.read_stats())
+
+    def test_save_and_delete(self):
+        hospital = Hospital.objects.create(
+            name='Mới', address='1 Lê Lợi', district='quan3', hospital_type='private',
+            emergency_services=True, capacity=120, latitude=10.78, longitude=106.69,
+        )
+        self.assertStatsConsistent()
+        hospital.district = 'quan5'
+        hospital.capacity = None
+        hospital.save()
+        self.assertStatsConsistent()
+        hospital.is_active = False
+        hospital.save(update_fields=['is_active'])
+        self.assertStatsConsistent()
+        hospital.is_active = True
+        hospital.save()
+        hospital.delete()
+        self.assertStatsConsistent()
+
+    def test_bulk_create_and_bulk_update(self):
+        created = scattered_hospitals(10, seed=18)
+        self.assertStatsConsistent()
+        for hospital in created:
+            hospital.hospital_type = 'clinic'
+            hospital.emergency_services = not hospital.emergency_services
+        Hospital.objects.bulk_update(created, ['hospital_type', 'emergency_services'], batch_size=4)
+        self.assertStatsConsistent()
+
+    def test_queryset_update(self):
+        Hospital.objects.filter(district='quan1').update(main_specialty='cardiology', capacity=300)
+        self.assertStatsConsistent()
+        with mock.patch.object(stats, 'MAX_DELTA_ROWS', 5):
+            Hospital.objects.filter(hospital_type='public').update(is_active=False)
+        self.assertStatsConsistent()
+        Hospital.objects.filter(is_active=False).update(is_active=True, district='quan2')
+        self.assertStatsConsistent()
+
+    def test_queryset_delete(self):
+        Hospital.objects.filter(emergency_services=True).delete()
+        self.assertStatsConsistent()
+        self.assertEqual(stats.read_stats()['emergency_count'], 0)
+
+    def test_endpoint_reads_counters(self):
+        Hospital.objects.filter(district='quan1').update(is_active=False)
+        response = self.client.get('/api/hospitals/stats/')
+        self.assertEqual(response.json(), stats.read_stats())
+        self.assertEqual(response.json()['by_district']['quan1'], 0)
+
+
+class CatalogVersionTests(TestCase):
+    """Phiên bản dữ liệu tăng trên mọi đường ghi, cache theo phiên bản không trả dữ liệu cũ"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitals = scattered_hospitals(20, seed=19)
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def assertBumps(self, write):
+        before = cache.catalog_version()
+        write()
+        after = cache.catalog_version()
+        self.assertGreater(after[0], before[0])
+        self.assertNotEqual(cache.version_key(after), cache.version_key(before))
+
+    def test_every_write_path_bumps(self):
+        hospital = self.hospitals[0]
+        self.assertBumps(lambda: Hospital.objects.create(name='Mới', address='1 Lê Lợi', district='quan1'))
+        self.assertBumps(lambda: Hospital.objects.filter(pk=hospital.pk).update(capacity=10))
+        self.assertBumps(lambda: Hospital.objects.get(pk=hospital.pk).save())
+        self.assertBumps(lambda: scattered_hospitals(2, seed=20))
+        self.assertBumps(lambda: Hospital.objects.bulk_update(self.hospitals[:3], ['name']))
+        self.assertBumps(lambda: Hospital.objects.filter(pk=hospital.pk).delete())
+
+    def test_empty_writes_keep_version(self):
+        version = cache.catalog_version()
+        Hospital.objects.filter(name='không có').update(capacity=1)
+        Hospital.objects.bulk_create([])
+        self.assertEqual(cache.catalog_version(), version)
+
+    def test_cached_payload_hits_until_version_changes(self):
+        build = mock.Mock(side_effect=lambda: {'n': build.call_count})
+        before = cache.cache_metrics().get('probe', {'hits': 0, 'misses': 0})
+        self.assertEqual(cache.cached_payload('probe', build), {'n': 1})
+        self.assertEqual(cache.cached_payload('probe', build), {'n': 1})
+        self.assertEqual(cache.cached_payload('probe', build, variant='x'), {'n': 2})
+        Hospital.objects.filter(pk=self.hospitals[0].pk).update(capacity=1)
+        self.assertEqual(cache.cached_payload('probe', build), {'n': 3})
+        after = cache.cache_metrics()['probe']
+        self.assertEqual(after['hits'] - before['hits'], 1)
+        self.assertEqual(after['misses'] - before['misses'], 3)
+
+    def test_endpoints_reflect_writes_immediately(self):
+        for url in ['/api/hospitals/stats/', '/api/hospitals/districts/', '/api/hospitals/specialties/']:
+            self.client.get(url)
+        Hospital.objects.create(
+            name='Mới', address='1 Lê Lợi', district='quan1', main_specialty='cardiology', emergency_services=True,
+        )
+        expected = Hospital.objects.filter(is_active=True)
+        self.assertEqual(self.client.get('/api/hospitals/stats/').json()['total_hospitals'], expected.count())
+        districts = {item['code']: item['hospital_count'] for item in self.client.get('/api/hospitals/districts/').json()}
+        self.assertEqual(districts['quan1'], expected.filter(district='quan1').count())
+        self.assertEqual(self.client.get('/api/hospitals/specialties/').json(), views._specialty_counts())
+
+
+class ConditionalGetTests(TestCase):
+    """ETag/Last-Modified theo phiên bản dữ liệu và phản hồi 304"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospital = Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='201B Nguyễn Chí Thanh', district='quan5',
+            latitude=10.7578, longitude=106.6594,
+        )
+
+    def test_matching_etag_answers_304_without_reading_rows(self):
+        etag = self.client.get('/api/hospitals/')['ETag']
+        with self.assertNumQueries(1):  # chỉ đọc phiên bản dữ liệu
+            response = self.client.get('/api/hospitals/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_read_actions_answer_304(self):
+        for url in ['/api/hospitals/', f'/api/hospitals/{self.hospital.pk}/', '/api/hospitals/stats/',
+                    '/api/hospitals/districts/', '/api/hospitals/search/?query=cho']:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_if_modified_since_answers_304(self):
+        last_modified = self.client.get('/api/hospitals/')['Last-Modified']
+        response = self.client.get('/api/hospitals/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_changes_after_write(self):
+        etag = self.client.get('/api/hospitals/')['ETag']
+        Hospital.objects.filter(pk=self.hospital.pk).update(name='Bệnh viện Chợ Rẫy mới')
+        response = self.client.get('/api/hospitals/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Bệnh viện Chợ Rẫy mới')
+
+    def test_cache_stats_is_not_conditional(self):
+        etag = self.client.get('/api/hospitals/')['ETag']
+        response = self.client.get('/api/hospitals/cache_stats/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+        self.assertNotIn('Last-Modified', response)
+
+    def test_post_ignores_etag(self):
+        etag = self.client.get('/api/hospitals/')['ETag']
+        response = self.client.post(
+            '/api/hospitals/nearest/', {'latitude': 10.76, 'longitude': 106.66, 'limit': 1},
+            content_type='application/json', HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class OriginCacheTests(TestCase):
+    """Cache theo ô lưới của điểm xuất phát cho kết quả giống hệt truy vấn trực tiếp"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.hospitals = scattered_hospitals(120, seed=21)
+
+    def setUp(self):
+        with origin_cache._lock:
+            origin_cache._state['index'] = None
+
+    def nearby(self, lat, lng, radius=3):
+        return [h['id'] for h in self.client.get(f'/api/hospitals/nearby/?lat={lat}&lng={lng}&radius={radius}').json()]
+
+    def nearest(self, lat, lng, **filters):
+        response = self.client.post('/api/hospitals/nearest/', {
+            'latitude': lat, 'longitude': lng, 'limit': 5, 'max_distance': 50, **filters,
+        }, content_type='application/json')
+        return [(h['id'], h['distance']) for h in response.json()]
+
+    def geo_origin(self):
+        return cache.cache_metrics().get('geo_origin', {'hits': 0, 'misses': 0})
+
+    def test_snap_cell_contains_origin(self):
+        rng = random.Random(22)
+        for _ in range(50):
+            lat, lng = rng.uniform(-60, 60), rng.uniform(-180, 180)
+            row, col, center_lat, center_lng = origin_cache.snap(lat, lng, 0.05)
+            self.assertLessEqual(haversine(lat, lng, center_lat, center_lng), 0.05)
+            self.assertEqual(origin_cache.snap(center_lat, center_lng, 0.05)[:2], (row, col))
+
+    def test_jittered_origins_match_uncached(self):
+        rng = random.Random(23)
+        for _ in range(10):
+            lat, lng = rng.uniform(10.65, 10.9), rng.uniform(106.55, 106.8)
+            for _ in range(3):
+                point = (lat + rng.uniform(-3e-4, 3e-4), lng + rng.uniform(-3e-4, 3e-4))
+                with self.subTest(point=point):
+                    cached = (self.nearby(*point), self.nearest(*point), self.nearest(*point, emergency_only=True))
+                    with override_settings(HOSPITAL_ORIGIN_GRID_M=0):
+                        direct = (self.nearby(*point), self.nearest(*point), self.nearest(*point, emergency_only=True))
+                    self.assertEqual(cached, direct)
+                    self.assertEqual(cached[0], [pk for pk, _ in brute_force(self.hospitals, *point, k=20, max_distance=3)])
+
+    def test_second_request_in_cell_hits(self):
+        _, _, lat, lng = origin_cache.snap(10.77, 106.70, origin_cache.grid_km())
+        before = self.geo_origin()
+        self.nearby(lat, lng)
+        self.nearby(lat + 1e-5, lng - 1e-5)
+        after = self.geo_origin()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_index_change_clears_cache(self):
+        self.nearby(10.77, 106.70)
+        hospital = Hospital.objects.create(
+            name='Mới', address='1 Lê Lợi', district='quan1', latitude=10.7701, longitude=106.7001,
+        )
+        before = self.geo_origin()
+        self.assertEqual(self.nearby(10.77, 106.70)[0], hospital.pk)
+        self.assertEqual(self.geo_origin()['misses'] - before['misses'], 1)
+
+
+class FragmentCacheTests(TestCase):
+    """Fragment đã serialize của từng bệnh viện: đúng sau khi ghi, bộ nhớ tiến trình có giới hạn"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            Hospital.objects.create(name=f'Bệnh viện {index}', address=f'{index} Lê Lợi', district='quan1')
+
+    def setUp(self):
+        fragments._local.clear()
+
+    def names(self, **params):
+        response = self.client.get('/api/hospitals/', params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [row['name'] for row in (data['results'] if 'page_size' in params else data)]
+
+    def test_save_replaces_fragment(self):
+        self.names()
+        hospital = Hospital.objects.get(name='Bệnh viện 2')
+        hospital.name = 'Bệnh viện 2 mới'
+        hospital.save()
+        self.assertIn('Bệnh viện 2 mới', self.names())
+        self.assertNotIn('Bệnh viện 2', self.names())
+
+    def test_rows_are_copies(self):
+        self.names()
+        rows = fragments.hospital_rows(Hospital.objects.order_by('id').values(*HospitalRowSerializer.value_fields))
+        rows[0]['name'] = 'Đã sửa'
+        self.assertNotIn('Đã sửa', self.names())
+
+    def test_local_cache_is_bounded(self):
+        with mock.patch.object(fragments, 'MAX_LOCAL_FRAGMENTS', 3):
+            # Trang đầu nằm trong cache, lần sau vượt giới hạn ngay trong một request
+            self.assertEqual(len(self.names(page_size=2)), 2)
+            self.assertEqual(self.names(page_size=5), [f'Bệnh viện {index}' for index in range(5)])
+            self.assertEqual(len(fragments._local), 3)
+            self.assertEqual(self.names(page_size=5), [f'Bệnh viện {index}' for index in range(5)])
+
+    def test_one_entry_per_hospital(self):
+        self.names()
+        Hospital.objects.update(name='Bệnh viện chung')
+        self.assertEqual(set(self.names()), {'Bệnh viện chung'})
+        self.assertEqual(len(fragments._local), 5)
+
+
+    def test_geohash_backfill_keeps_fragments(self):
+        Hospital.objects.update(latitude=10.77, longitude=106.70)
+        self.names()
+        stamps = dict(Hospital.objects.values_list('id', 'updated_at'))
+        Hospital.objects.update(geohash='')
+        self.assertEqual(Hospital.objects.refresh_geohash(), 5)
+        self.assertEqual(dict(Hospital.objects.values_list('id', 'updated_at')), stamps)
+        before = cache.cache_metrics()['fragments']
+        self.names()
+        after = cache.cache_metrics()['fragments']
+        self.assertEqual((after['hits'] - before['hits'], after['misses'] - before['misses']), (5, 0))
+        Hospital.objects.update(geohash='', district='quan3')
+        self.assertNotEqual(dict(Hospital.objects.values_list('id', 'updated_at')), stamps)
+
+class HospitalRowSerializerParityTests(TestCase):
+    """HospitalRowSerializer phải cho kết quả giống hệt HospitalListSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', name_en='Cho Ray Hospital', hospital_type='public',
+            address='201B Nguyễn Chí Thanh', district='quan5', ward='12',
+            phone='028 3855 4137', email='info@choray.vn', website='https://choray.vn',
+            facebook='https://facebook.com/choray', main_specialty='general',
+            specialties=['cardiology', 'neurology'], description='Bệnh viện hạng đặc biệt',
+            latitude=10.7578, longitude=106.6594,
+            working_hours={'monday': '7:00-16:30', 'sunday': 'Cấp cứu 24/7'},
+            emergency_services=True, ambulance_services=True,
+            capacity=1800, doctors_count=600, nurses_count=1500,
+        )
+        # Chỉ các trường bắt buộc: số liệu và tọa độ là None, chuỗi rỗng
+        Hospital.objects.create(name='Phòng khám nhỏ', address='1 Lê Lợi', district='quan1')
+        # Mã ngoài danh sách lựa chọn (dữ liệu nhập cũ)
+        Hospital.objects.create(
+            name='Bệnh viện Bình Chánh', address='1 Quốc lộ 1A', district='binhchanh',
+            hospital_type='private', main_specialty='pediatrics', capacity=0,
+            latitude=0.0, longitude=0.0,
+        )
+        Hospital.objects.create(
+            name='Bệnh viện đã đóng', address='2 Hai Bà Trưng', district='quan3', is_active=False,
+        )
+
+    def rows(self, queryset):
+        return HospitalRowSerializer().serialize_many(queryset.values(*HospitalRowSerializer.value_fields))
+
+    def test_rows_render_identically(self):
+        queryset = Hospital.objects.order_by('id')
+        expected = HospitalListSerializer(queryset, many=True).data
+        self.assertEqual(render(self.rows(queryset)), render(expected))
+
+    def test_field_order_matches(self):
+        hospital = Hospital.objects.order_by('id').first()
+        expected = HospitalListSerializer(hospital).data
+        row = self.rows(Hospital.objects.filter(pk=hospital.pk))[0]
+        self.assertEqual(list(row), list(expected))
+
+    @override_settings(TIME_ZONE='Asia/Ho_Chi_Minh')
+    def test_datetimes_follow_current_timezone(self):
+        queryset = Hospital.objects.order_by('id')
+        expected = HospitalListSerializer(queryset, many=True).data
+        self.assertEqual(render(self.rows(queryset)), render(expected))
+        self.assertTrue(self.rows(queryset)[0]['created_at'].endswith('+07:00'))
+
+    def test_list_endpoint_matches_list_serializer(self):
+        response = self.client.get('/api/hospitals/')
+        expected = HospitalListSerializer(Hospital.objects.filter(is_active=True), many=True).data
+        self.assertEqual(response.content, render(expected))
+
+    def test_list_reflects_bulk_update(self):
+        self.client.get('/api/hospitals/')
+        Hospital.objects.filter(district='quan1').update(name='Phòng khám đổi tên')
+        response = self.client.get('/api/hospitals/')
+        self.assertIn('Phòng khám đổi tên', [row['name'] for row in response.json()])
+
+    def test_nearest_adds_distance_to_serializer_output(self):
+        response = self.client.post(
+            '/api/hospitals/nearest/', {'latitude': 10.76, 'longitude': 106.66, 'limit': 1},
+            content_type='application/json',
+        )
+        result = response.json()[0]
+        distance = result.pop('distance')
+        hospital = Hospital.objects.get(pk=result['id'])
+        self.assertEqual(render(result), render(HospitalListSerializer(hospital).data))
+        self.assertLess(distance['km'], 1)
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= / ?omit= cắt bớt output và các cột được đọc"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='201B Nguyễn Chí Thanh', district='quan5',
+            description='Mô tả dài', latitude=10.7578, longitude=106.6594, emergency_services=True,
+        )
+
+    def test_fields_selects_in_serializer_order(self):
+        response = self.client.get('/api/hospitals/?fields=emergency_services,name,id,district_display')
+        self.assertEqual(list(response.json()[0]), ['id', 'name', 'district_display', 'emergency_services'])
+
+    def test_omit_removes_fields(self):
+        response = self.client.get('/api/hospitals/?omit=description,working_hours')
+        row = response.json()[0]
+        self.assertNotIn('description', row)
+        self.assertNotIn('working_hours', row)
+        self.assertIn('full_address', row)
+
+    def test_large_columns_are_not_read(self):
+        with self.assertNumQueries(2) as context:  # phiên bản dữ liệu + danh sách
+            self.client.get('/api/hospitals/?fields=id,name,latitude,longitude')
+        sql = context.captured_queries[-1]['sql']
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"working_hours"', sql)
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get('/api/hospitals/?fields=name,secret')
+        self.assertEqual(response.status_code, 400)
+
+    def test_retrieve_with_fields(self):
+        hospital = Hospital.objects.get()
+        response = self.client.get(f'/api/hospitals/{hospital.pk}/?fields=name')
+        self.assertEqual(response.json(), {'name': 'Bệnh viện Chợ Rẫy'})
+
+
+class FullTextSearchTests(TestCase):
+    """Tìm kiếm từ khóa qua chỉ mục toàn văn, đồng bộ với mọi đường ghi"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.nhi = Hospital.objects.create(name='Bệnh viện Nhi Đồng 1', address='341 Sư Vạn Hạnh', district='quan10')
+        cls.street = Hospital.objects.create(
+            name='Phòng khám Đa khoa', address='12 Nhiêu Tâm', district='quan5', phone='028 3855 4137',
+        )
+        Hospital.objects.create(name='Bệnh viện Chợ Rẫy', name_en='Cho Ray Hospital', address='201B Nguyễn Chí Thanh', district='quan5')
+
+    def search(self, query, **params):
+        return self.client.get('/api/hospitals/search/', {'query': query, **params}).json()
+
+    def test_name_match_ranks_before_address_match(self):
+        self.assertEqual([row['id'] for row in self.search('nhi')], [self.nhi.pk, self.street.pk])
+
+    def test_diacritics_are_ignored(self):
+        self.assertEqual([row['name'] for row in self.search('cho ray')], ['Bệnh viện Chợ Rẫy'])
+
+    def test_index_follows_bulk_update_and_delete(self):
+        Hospital.objects.filter(pk=self.street.pk).update(name='Phòng khám Tai Mũi Họng')
+        self.assertEqual([row['id'] for row in self.search('tai mui')], [self.street.pk])
+        self.nhi.delete()
+        self.assertEqual([row['id'] for row in self.search('nhi')], [self.street.pk])
+
+    def test_ranked_results_paginate(self):
+        first = self.client.get('/api/hospitals/search/', {'query': 'nhi', 'page_size': 1}).json()
+        self.assertEqual([row['id'] for row in first['results']], [self.nhi.pk])
+        second = self.client.get(first['next']).json()
+        self.assertEqual([row['id'] for row in second['results']], [self.street.pk])
+        self.assertIsNone(second['next'])
+
+    def test_list_search_requires_every_term(self):
+        names = [row['name'] for row in self.client.get('/api/hospitals/', {'search': 'khoa 3855'}).json()]
+        self.assertEqual(names, ['Phòng khám Đa khoa'])
+        self.assertEqual(self.client.get('/api/hospitals/', {'search': 'khoa 9999'}).json(), [])
+
+
+class FuzzySearchTests(TestCase):
+    """Từ khóa sai chính tả/không dấu vẫn tìm được qua chỉ mục trigram"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tu_du = Hospital.objects.create(name='Bệnh viện Từ Dũ', address='284 Cống Quỳnh', district='quan1')
+        cls.nhi = Hospital.objects.create(name='Bệnh viện Nhi Đồng 1', address='341 Sư Vạn Hạnh', district='quan10')
+
+    def test_fold_removes_vietnamese_diacritics(self):
+        self.assertEqual(fuzzy.fold('Bệnh viện Nhi Đồng (Cơ sở 2)'), 'benh vien nhi dong co so 2')
+
+    def test_search_falls_back_to_trigrams(self):
+        rows = self.client.get('/api/hospitals/search/', {'query': 'tu duu'}).json()
+        self.assertEqual([row['id'] for row in rows], [self.tu_du.pk])
+
+    def test_list_search_falls_back_to_trigrams(self):
+        rows = self.client.get('/api/hospitals/', {'search': 'nhi dongg'}).json()
+        self.assertEqual([row['id'] for row in rows], [self.nhi.pk])
+
+    def test_unrelated_keyword_finds_nothing(self):
+        self.assertEqual(self.client.get('/api/hospitals/search/', {'query': 'xyzw'}).json(), [])
+
+    @override_settings(HOSPITAL_FUZZY_LIMIT=1)
+    def test_filters_apply_before_limit(self):
+        other = Hospital.objects.create(name='Bệnh viện Từ Dũ', address='284 Cống Quỳnh', district='quan3')
+        rows = self.client.get('/api/hospitals/', {'search': 'tu duu', 'district': 'quan3'}).json()
+        self.assertEqual([row['id'] for row in rows], [other.pk])
+        rows = self.client.get('/api/hospitals/search/', {'query': 'tu duu', 'district': 'quan3'}).json()
+        self.assertEqual([row['id'] for row in rows], [other.pk])
+
+    def test_list_fallback_uses_search_fields(self):
+        clinic = Hospital.objects.create(name='Phòng khám', address='1 Lê Lợi', district='quan1', phone='02838554137')
+        rows = self.client.get('/api/hospitals/', {'search': '02838564137'}).json()
+        self.assertEqual([row['id'] for row in rows], [clinic.pk])
+        # action search chỉ tìm trên tên và địa chỉ
+        self.assertEqual(self.client.get('/api/hospitals/search/', {'query': '02838564137'}).json(), [])
+
+    def test_common_word_with_nonsense_finds_nothing(self):
+        for name, name_en, address in [
+            ('Bệnh viện Chợ Rẫy', 'Cho Ray Hospital', '201B Nguyễn Chí Thanh, Quận 5'),
+            ('Bệnh viện Nhân dân Gia Định', 'Gia Dinh People Hospital', '1 Nơ Trang Long, Quận Bình Thạnh'),
+            ('Bệnh viện Quận Phú Nhuận', 'Phu Nhuan District Hospital', '274 Nguyễn Trọng Tuyển, Quận Phú Nhuận'),
+            ('Phòng khám Đa khoa Hòa Bình', 'Hoa Binh General Clinic', '75 Bàu Cát, Quận Tân Bình'),
+            ('Phòng khám Tai Mũi Họng Sài Gòn', 'Saigon ENT Clinic', '12 Nguyễn Trãi, Quận 1'),
+        ]:
+            Hospital.objects.create(name=name, name_en=name_en, address=address, district='quan1')
+        for keyword in ['benh vien zzz', 'hospital zzz', 'phong kham zz', 'benh vien xyzw']:
+            with self.subTest(keyword=keyword):
+                self.assertEqual(self.client.get('/api/hospitals/search/', {'query': keyword}).json(), [])
+                self.assertEqual(self.client.get('/api/hospitals/', {'search': keyword}).json(), [])
+        # Mỗi từ phải gần một từ của bệnh viện: "nhi" không khớp "Nhuận"
+        rows = self.client.get('/api/hospitals/search/', {'query': 'benh vien nhi dongg'}).json()
+        self.assertEqual([row['id'] for row in rows], [self.nhi.pk])
+
+    @override_settings(HOSPITAL_FUZZY_SEARCH_ENABLED=False)
+    def test_fallback_can_be_disabled(self):
+        self.assertEqual(self.client.get('/api/hospitals/search/', {'query': 'tu duu'}).json(), [])
+
+
+class AutocompleteTests(TestCase):
+    """Gợi ý theo tiền tố, không dấu, cập nhật khi bệnh viện được lưu"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cho_ray = Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', name_en='Cho Ray Hospital',
+            address='201B Nguyễn Chí Thanh, Phường 12, Quận 5, TP.HCM', district='quan5',
+        )
+        cls.tam_tri = Hospital.objects.create(
+            name='Bệnh viện Đa khoa Tâm Trí Sài Gòn',
+            address='171/3 Trường Chinh, Phường Tân Thới Nhất, Quận 12, TP.HCM', district='quan12',
+        )
+
+    def suggest(self, q, **params):
+        return self.client.get('/api/hospitals/autocomplete/', {'q': q, **params}).json()
+
+    def test_street_name_skips_house_number(self):
+        self.assertEqual(autocomplete.street_name('Lầu 2, Crescent Plaza, 105 Tôn Dật Tiên, Quận 7'), 'Tôn Dật Tiên')
+        self.assertEqual(autocomplete.street_name('Số 1 Trần Hữu Nghiệp, Tân Kiên'), 'Trần Hữu Nghiệp')
+        self.assertIsNone(autocomplete.street_name('Ấp Cây Dầu'))
+
+    def test_prefix_matches_before_inner_matches(self):
+        self.assertEqual(self.suggest('cho r'), [
+            {'text': 'Cho Ray Hospital', 'type': 'name_en', 'ids': [self.cho_ray.pk]},
+            {'text': 'Bệnh viện Chợ Rẫy', 'type': 'name', 'ids': [self.cho_ray.pk]},
+        ])
+
+    def test_streets_and_limit(self):
+        self.assertEqual(self.suggest('truong ch'), [
+            {'text': 'Trường Chinh', 'type': 'street', 'ids': [self.tam_tri.pk]},
+        ])
+        self.assertEqual(len(self.suggest('benh vien', limit=1)), 1)
+
+    def test_save_updates_index_incrementally(self):
+        self.suggest('b')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cho_ray.name = 'Bệnh viện Chợ Rẫy Việt Nhật'
+            self.cho_ray.save()
+        index = autocomplete._state['index']
+        self.assertEqual([row['text'] for row in self.suggest('viet nhat')], ['Bệnh viện Chợ Rẫy Việt Nhật'])
+        self.assertIs(autocomplete._state['index'], index)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cho_ray.delete()
+        self.assertEqual(self.suggest('cho ray'), [])
+        self.assertIs(autocomplete._state['index'], index)
+
+    def test_blank_query_returns_nothing(self):
+        self.assertEqual(self.suggest(''), [])
+
+    def test_suggest_while_updating(self):
+        index = autocomplete.AutocompleteIndex(
+            (pk, f'Bệnh viện Chợ {pk}', '', f'{pk} Lê Lợi') for pk in range(500)
+        )
+        stop = threading.Event()
+
+        def update():
+            count = 0
+            while not stop.is_set():
+                index.add(-1, f'Bệnh viện Chợ X{count % 5}', '', '1 Lê Lợi')
+                index.remove(-1)
+                count += 1
+
+        writer = threading.Thread(target=update)
+        writer.start()
+        try:
+            for _ in range(5000):
+                index.suggest('benh vien cho x', 10)
+        finally:
+            stop.set()
+            writer.join()
+
+
+class HospitalSpecialtyTests(TestCase):
+    """Bảng HospitalSpecialty theo sát main_specialty/specialties trên mọi đường ghi"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.general = Hospital.objects.create(
+            name='Bệnh viện Đa khoa', address='1 Lê Lợi', district='quan1',
+            main_specialty='general', specialties=['cardiology', 'neurology', 42],
+        )
+        cls.heart = Hospital.objects.create(
+            name='Viện Tim', address='4 Thành Thái', district='quan10', main_specialty='cardiology',
+        )
+
+    def links(self, hospital):
+        return dict(hospital.specialty_links.values_list('specialty', 'is_main'))
+
+    def test_links_follow_save(self):
+        self.assertEqual(self.links(self.general), {'general': True, 'cardiology': False, 'neurology': False})
+        self.general.specialties = ['oncology']
+        self.general.save()
+        self.assertEqual(self.links(self.general), {'general': True, 'oncology': False})
+
+    def test_links_follow_bulk_writes(self):
+        Hospital.objects.filter(pk=self.heart.pk).update(specialties=['pediatrics'])
+        self.assertEqual(self.links(self.heart), {'cardiology': True, 'pediatrics': False})
+        created = Hospital.objects.bulk_create([
+            Hospital(name='Phòng khám Mắt', address='2 Lê Lợi', district='quan1', main_specialty='ophthalmology'),
+        ])
+        self.assertEqual(self.links(created[0]), {'ophthalmology': True})
+
+    def test_search_filters_by_main_or_listed_specialty(self):
+        rows = self.client.get('/api/hospitals/search/', {'specialty': 'cardiology'}).json()
+        self.assertEqual(sorted(row['id'] for row in rows), sorted([self.general.pk, self.heart.pk]))
+
+    def test_specialty_counts_use_one_query(self):
+        with self.assertNumQueries(2):  # phiên bản dữ liệu (ETag) + GROUP BY
+            response = self.client.get('/api/hospitals/specialties/')
+        counts = {row['code']: row['hospital_count'] for row in response.json()}
+        self.assertEqual(counts['cardiology'], 2)
+        self.assertEqual(counts['general'], 1)
+        self.assertEqual(counts['dermatology'], 0)
+
+
+class HospitalImporterTests(TestCase):
+    """Nạp hàng loạt: kiểm tra trước, thay toàn bộ dữ liệu trong một giao dịch"""
+
+    def record(self, **overrides):
+        record = {
+            'name': 'Bệnh viện Mới', 'address': '5 Hai Bà Trưng', 'district': 'quan1',
+            'latitude': '10.77', 'longitude': '106.70', 'capacity': '300',
+            'main_specialty': 'ent', 'specialties': ['pediatrics'],
+        }
+        record.update(overrides)
+        return record
+
+    def test_clean_record_converts_and_rejects(self):
+        values = clean_record(self.record())
+        self.assertEqual((values['latitude'], values['capacity']), (10.77, 300))
+        with self.assertRaises(ValidationError) as raised:
+            clean_record({'name': 'x' * 300, 'latitude': 95, 'capacity': -1, 'unknown': 1})
+        errors = raised.exception.message_dict
+        self.assertEqual(set(errors), {'__all__', 'name', 'address', 'district', 'latitude', 'capacity'})
+
+    def test_run_replaces_catalog_and_rebuilds_derived_tables(self):
+        Hospital.objects.create(name='Bệnh viện Cũ', address='1 Lê Lợi', district='quan3')
+        records = [self.record(), self.record(name='Phòng khám', hospital_type='clinic'), self.record(email='sai')]
+        result = HospitalImporter(batch_size=1).run(records)
+
+        self.assertEqual((result.deleted, result.created), (1, 2))
+        self.assertEqual([position for position, _, _ in result.rejected], [2])
+        self.assertIn('email', result.rejected[0][2])
+        self.assertEqual(sorted(Hospital.objects.values_list('name', flat=True)), ['Bệnh viện Mới', 'Phòng khám'])
+        self.assertEqual(stats.read_stats()['total_hospitals'], 2)
+        self.assertEqual(stats.read_stats()['by_type']['clinic'], 1)
+        hospital = Hospital.objects.get(name='Phòng khám')
+        self.assertEqual(dict(hospital.specialty_links.values_list('specialty', 'is_main')),
+                         {'ent': True, 'pediatrics': False})
+
+    def test_failed_write_keeps_old_catalog(self):
+        Hospital.objects.create(name='Bệnh viện Cũ', address='1 Lê Lợi', district='quan3')
+        with mock.patch('hospitals.importer.stats.rebuild_stats', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                HospitalImporter().run([self.record()])
+        self.assertEqual(list(Hospital.objects.values_list('name', flat=True)), ['Bệnh viện Cũ'])
+
+
+class StreamingImportTests(TestCase):
+    """Đọc CSV/NDJSON/GeoJSON từng bản ghi và lệnh import_hospitals"""
+
+    def test_csv_converts_cells_and_flags_malformed_rows(self):
+        stream = io.StringIO(
+            'name,district,address,emergency_services,specialties,capacity\n'
+            'Bệnh viện A,quan1,1 Lê Lợi,Có,"[""pediatrics""]",\n'
+            'Bệnh viện B,quan3,2 Lê Lợi,no,[sai,\n'
+            'Bệnh viện C,quan5,3 Lê Lợi,,,,thừa\n'
+        )
+        first, second, third = readers.read_csv(stream)
+        self.assertEqual(first, {
+            'name': 'Bệnh viện A', 'district': 'quan1', 'address': '1 Lê Lợi',
+            'emergency_services': True, 'specialties': ['pediatrics'],
+        })
+        self.assertIsInstance(second, MalformedRecord)
+        self.assertIsInstance(third, MalformedRecord)
+
+    def test_geojson_streams_features_across_buffer_refills(self):
+        features = [
+            {'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': [round(106.7 + i / 1000, 3), 10.78]},
+             'properties': {'id': i, 'name': f'Bệnh viện {i}', 'district': 'quan1', 'address': 'x'}}
+            for i in range(50)
+        ]
+        features.append({'type': 'Feature', 'geometry': None, 'properties': {}})
+        document = json.dumps({'type': 'FeatureCollection', 'meta': {'nested': [1, {'a': 2.5}]},
+                               'features': features, 'count': 12345})
+        with mock.patch.object(readers, 'CHUNK_SIZE', 7):
+            records = list(readers.read_geojson(io.StringIO(document)))
+        self.assertEqual(len(records), 51)
+        self.assertEqual(records[49], {'id': 49, 'name': 'Bệnh viện 49', 'district': 'quan1', 'address': 'x',
+                                       'longitude': 106.749, 'latitude': 10.78})
+        self.assertIsInstance(records[50], MalformedRecord)
+
+    def test_command_imports_in_chunks_and_writes_rejects(self):
+        Hospital.objects.create(name='Bệnh viện Cũ', address='1 Lê Lợi', district='quan3')
+        lines = [
+            json.dumps({'name': 'Bệnh viện A', 'district': 'quan1', 'address': '1 Lê Lợi', 'latitude': 10.7}),
+            '{hỏng',
+            json.dumps({'name': 'Bệnh viện B', 'district': 'quan1', 'address': '2 Lê Lợi', 'latitude': 100}),
+            json.dumps({'name': 'Bệnh viện C', 'district': 'quan1', 'address': '3 Lê Lợi'}),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'hospitals.jsonl')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines))
+            call_command('import_hospitals', path, batch_size=2, stdout=io.StringIO())
+            with open(f'{path}.rejects.ndjson', encoding='utf-8') as f:
+                rejects = [json.loads(line) for line in f]
+
+        self.assertEqual(sorted(Hospital.objects.values_list('name', flat=True)), ['Bệnh viện A', 'Bệnh viện C'])
+        self.assertEqual([reject['position'] for reject in rejects], [1, 2])
+        self.assertEqual(rejects[0]['record'], '{hỏng')
+        self.assertIn('latitude', rejects[1]['errors'])
+
+
+class HospitalSyncTests(TestCase):
+    """Đồng bộ theo khóa tự nhiên: chỉ ghi phần thay đổi, giữ nguyên id"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.kept = Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='201B Nguyễn Chí Thanh', district='quan5',
+            latitude=10.75781, longitude=106.65953, capacity=1800,
+        )
+        cls.changed = Hospital.objects.create(
+            name='Bệnh viện Nhi Đồng 1', address='341 Sư Vạn Hạnh', district='quan10',
+            latitude=10.7677, longitude=106.6702, main_specialty='pediatrics',
+        )
+        cls.missing = Hospital.objects.create(
+            name='Phòng khám Cũ', address='1 Lê Lợi', district='quan1', latitude=10.77, longitude=106.70,
+        )
+
+    def records(self):
+        return [
+            {'name': 'Bệnh viện Chợ Rẫy', 'address': '201B Nguyễn Chí Thanh', 'district': 'quan5',
+             'latitude': 10.75781, 'longitude': 106.65953, 'capacity': 1800},
+            # Khác chữ hoa và tọa độ lệch dưới độ chính xác của khóa: vẫn là cùng bệnh viện
+            {'name': 'BỆNH VIỆN NHI ĐỒNG 1', 'address': '341 Sư Vạn Hạnh', 'district': 'quan10',
+             'latitude': 10.767702, 'longitude': 106.6702, 'emergency_services': True},
+            {'name': 'Bệnh viện Mới', 'address': '9 Hai Bà Trưng', 'district': 'quan3',
+             'latitude': 10.78, 'longitude': 106.69},
+            {'name': 'Bệnh viện Mới', 'address': 'trùng', 'district': 'quan3',
+             'latitude': 10.78, 'longitude': 106.69},
+        ]
+
+    def test_natural_key_folds_name_and_rounds_coordinates(self):
+        self.assertEqual(natural_key('Bệnh Viện  Chợ Rẫy', 10.757812, None), ('benh vien cho ray', 10.7578, None))
+
+    def test_sync_applies_only_the_delta(self):
+        result = HospitalSync(batch_size=2).run(self.records())
+
+        self.assertEqual(
+            (result.created, result.updated, result.unchanged, result.deactivated, result.rejected_count),
+            (1, 1, 1, 1, 1),
+        )
+        self.assertIn('Trùng khóa với bản ghi #2', result.rejected[0][2]['__all__'])
+        self.changed.refresh_from_db()
+        self.assertEqual((self.changed.name, self.changed.emergency_services), ('BỆNH VIỆN NHI ĐỒNG 1', True))
+        self.assertEqual(self.changed.main_specialty, 'pediatrics')  # trường không có trong bản ghi giữ nguyên
+        self.assertFalse(Hospital.objects.get(pk=self.missing.pk).is_active)
+        self.assertEqual(Hospital.objects.filter(pk=self.kept.pk).count(), 1)
+        self.assertEqual(stats.read_stats()['total_hospitals'], 3)
+        self.assertEqual(stats.read_stats()['emergency_count'], 1)
+
+        # Chạy lại: không còn gì thay đổi, bệnh viện xuất hiện lại được kích hoạt
+        records = self.records()[:3] + [{'name': 'Phòng khám Cũ', 'address': '1 Lê Lợi', 'district': 'quan1',
+                                         'latitude': 10.77, 'longitude': 106.70}]
+        result = HospitalSync().run(records)
+        self.assertEqual((result.created, result.updated, result.unchanged), (0, 1, 3))
+        self.assertTrue(Hospital.objects.get(pk=self.missing.pk).is_active)
+
+    def test_complete_unchanged_records_are_not_reloaded(self):
+        records = list(Hospital.objects.order_by('id').values(*IMPORT_FIELDS))
+        with mock.patch.object(HospitalSync, 'changes', side_effect=HospitalSync.changes) as changes:
+            result = HospitalSync().run(records)
+        self.assertEqual((result.updated, result.unchanged, result.deactivated), (0, 3, 0))
+        self.assertEqual([call.args[0] for call in changes.call_args_list], [{}])
+
+    def test_existing_duplicate_keys_are_reported_and_left_alone(self):
+        twin = Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='Cơ sở trùng', district='quan5',
+            latitude=10.75781, longitude=106.65953,
+        )
+        result = HospitalSync().run(self.records()[:3])
+        self.assertEqual(result.ambiguous, 2)
+        self.assertIn(f'#{self.kept.pk}, #{twin.pk}', result.rejected[0][2]['__all__'][0])
+        self.assertIn('2 bệnh viện hiện có trùng khóa', result.summary())
+        self.assertEqual(Hospital.objects.get(pk=twin.pk).address, 'Cơ sở trùng')
+        self.assertTrue(Hospital.objects.get(pk=self.kept.pk).is_active)
+
+        # Không còn trong nguồn: cả nhóm ngừng hoạt động
+        result = HospitalSync().run(self.records()[1:3])
+        self.assertEqual(result.deactivated, 2)
+        self.assertFalse(Hospital.objects.filter(pk__in=[self.kept.pk, twin.pk], is_active=True).exists())
+
+
+class CsvExportTests(TestCase):
+    """Action xuất CSV trong admin: StreamingHttpResponse đọc values() theo lô"""
+
+    @classmethod
+    def setUpTestData(cls):
+        Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='201B Nguyễn Chí Thanh, Quận 5', district='quan5',
+            hospital_type='public', main_specialty='general', emergency_services=True,
+            capacity=1800, latitude=10.7578, longitude=106.6595,
+        )
+        Hospital.objects.create(
+            name='Phòng khám Tai Mũi Họng', address='1 Lê Lợi', district='quan1',
+            hospital_type='clinic', main_specialty='ent', is_active=False,
+        )
+
+    def test_export_streams_rows_with_labels(self):
+        model_admin = HospitalAdmin(Hospital, admin_site)
+        request = RequestFactory().post('/admin/hospitals/hospital/')
+        with mock.patch.object(model_admin, 'message_user'):
+            response = model_admin.export_to_csv(request, Hospital.objects.order_by('name'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="hospitals.csv"')
+
+        with self.assertNumQueries(1):
+            content = b''.join(response.streaming_content).decode()
+        self.assertEqual(content.splitlines(), [
+            'Tên,Tên tiếng Anh,Loại,Địa chỉ,Quận,Điện thoại,Email,Website,Chuyên khoa chính,'
+            'Cấp cứu,Sức chứa,Kinh độ,Vĩ độ,Hoạt động',
+            'Bệnh viện Chợ Rẫy,,Công lập,"201B Nguyễn Chí Thanh, Quận 5",Quận 5,,,,Đa khoa,'
+            'Có,1800,106.6595,10.7578,Có',
+            'Phòng khám Tai Mũi Họng,,Phòng khám,1 Lê Lợi,Quận 1,,,,ent,Không,,,,Không',
+        ])
+
+
+class GeoJSONTests(TestCase):
+    """Action geojson: FeatureCollection stream theo bộ lọc của danh sách"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cho_ray = Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='201B Nguyễn Chí Thanh', district='quan5',
+            latitude=10.7578123, longitude=106.6595456, emergency_services=True,
+        )
+        cls.clinic = Hospital.objects.create(
+            name='Phòng khám Lê Lợi', address='1 Lê Lợi', district='quan1', hospital_type='clinic',
+            latitude=10.7731, longitude=106.7003,
+        )
+        Hospital.objects.create(name='Chưa có tọa độ', address='x', district='quan1')
+        Hospital.objects.create(name='Ngừng hoạt động', address='x', district='quan1',
+                                latitude=10.8, longitude=106.7, is_active=False)
+
+    def get(self, **params):
+        response = self.client.get('/api/hospitals/geojson/', params)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        return json.loads(b''.join(response.streaming_content))
+
+    def test_streams_feature_collection(self):
+        document = self.get()
+        self.assertEqual(document['type'], 'FeatureCollection')
+        self.assertEqual([feature['id'] for feature in document['features']], [self.cho_ray.pk, self.clinic.pk])
+        self.assertEqual(document['features'][0], {
+            'type': 'Feature',
+            'id': self.cho_ray.pk,
+            'geometry': {'type': 'Point', 'coordinates': [106.659546, 10.757812]},
+            'properties': {'name': 'Bệnh viện Chợ Rẫy', 'hospital_type': 'public', 'district': 'quan5',
+                           'main_specialty': 'general', 'emergency_services': True},
+        })
+
+    def test_filters_precision_and_properties(self):
+        document = self.get(district='quan1', precision=3, properties='name,district_display')
+        self.assertEqual(document['features'], [{
+            'type': 'Feature',
+            'id': self.clinic.pk,
+            'geometry': {'type': 'Point', 'coordinates': [106.7, 10.773]},
+            'properties': {'name': 'Phòng khám Lê Lợi', 'district_display': 'Quận 1'},
+        }])
+        self.assertEqual(self.get(search='khong co', properties='')['features'], [])
+
+    def test_rejects_unknown_properties(self):
+        response = self.client.get('/api/hospitals/geojson/', {'properties': 'name,password'})
+        self.assertEqual(response.status_code, 400)
+
+
+def decode_message(data):
+    """Giải mã protobuf tối thiểu: {số trường: [giá trị]} (varint -> int, double -> float, còn lại bytes)"""
+    fields, position = {}, 0
+
+    def read_varint():
+        nonlocal position
+        value = shift = 0
+        while True:
+            byte = data[position]
+            position += 1
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80:
+                return value
+
+    while position < len(data):
+        key = read_varint()
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value = read_varint()
+        elif wire_type == 1:
+            value = struct.unpack('<d', data[position:position + 8])[0]
+            position += 8
+        else:
+            length = read_varint()
+            value = data[position:position + length]
+            position += length
+        fields.setdefault(number, []).append(value)
+    return fields
+
+
+def decode_packed(data):
+    values, value, shift = [], 0, 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            values.append(value)
+            value = shift = 0
+    return values
+
+
+def decode_tile(content):
+    """Các feature của lớp hospitals: (id, x, y, thuộc tính)"""
+    (layer,) = decode_message(content)[3]
+    layer = decode_message(layer)
+    assert layer[1] == [b'hospitals'] and layer[15] == [2] and layer[5] == [4096]
+    keys = [key.decode() for key in layer.get(3, [])]
+    values = []
+    for value in layer.get(4, []):
+        (number, (raw,)), = decode_message(value).items()
+        values.append({1: lambda v: v.decode(), 3: float, 5: int, 6: lambda v: (v >> 1) ^ -(v & 1),
+                       7: bool}[number](raw))
+    features = []
+    for feature in layer.get(2, []):
+        feature = decode_message(feature)
+        tags = decode_packed(feature.get(2, [b''])[0])
+        command, x, y = decode_packed(feature[4][0])
+        assert feature[3] == [1] and command == 9
+        properties = {keys[k]: values[v] for k, v in zip(tags[::2], tags[1::2])}
+        features.append((feature.get(1, [None])[0], (x >> 1) ^ -(x & 1), (y >> 1) ^ -(y & 1), properties))
+    return features
+
+
+class VectorTileTests(TestCase):
+    """Action tiles: MVT theo hộp bao của tile, gom cụm ở zoom thấp"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cho_ray = Hospital.objects.create(
+            name='Bệnh viện Chợ Rẫy', address='201B Nguyễn Chí Thanh', district='quan5',
+            latitude=10.7578, longitude=106.6595, emergency_services=True,
+        )
+        cls.nearby = Hospital.objects.create(
+            name='Bệnh viện Hòa Hảo', address='254 Hòa Hảo', district='quan10', hospital_type='private',
+            latitude=10.7580, longitude=106.6600,
+        )
+        cls.far = Hospital.objects.create(
+            name='Bệnh viện Hà Nội', address='1 Tràng Thi', district='quan1', latitude=21.0285, longitude=105.8542,
+        )
+
+    def tile(self, z, x, y, **params):
+        response = self.client.get(f'/api/hospitals/tiles/{z}/{x}/{y}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        return decode_tile(response.content)
+
+    def test_projection_matches_tile_bounds(self):
+        lat_min, lat_max, lng_min, lng_max = tiles.tile_bounds(15, 26451, 15388)
+        px, py = tiles.project([lat_max, lat_min], [lng_min, lng_max], 15, 26451, 15388)
+        self.assertEqual([round(v, 6) for v in [*px, *py]], [0, 4096, 0, 4096])
+
+    def test_high_zoom_returns_points_with_properties(self):
+        features = self.tile(18, 208739, 123191)
+        self.assertEqual(sorted(feature[0] for feature in features), [self.cho_ray.pk, self.nearby.pk])
+        pk, x, y, properties = next(feature for feature in features if feature[0] == self.cho_ray.pk)
+        self.assertTrue(0 <= x < 4096 and 0 <= y < 4096)
+        self.assertEqual(properties, {'name': 'Bệnh viện Chợ Rẫy', 'hospital_type': 'public', 'district': 'quan5',
+                                      'main_specialty': 'general', 'emergency_services': True})
+
+    def test_low_zoom_clusters_and_filters(self):
+        features = self.tile(5, 25, 15)
+        self.assertEqual([(feature[0], feature[3]) for feature in features],
+                         [(None, {'cluster': True, 'point_count': 2})])
+        features = self.tile(5, 25, 15, hospital_type='private')
+        self.assertEqual([feature[0] for feature in features], [self.nearby.pk])
+
+    def test_tiles_are_cached_per_catalog_version(self):
+        self.tile(18, 208739, 123191)
+        with self.assertNumQueries(1):  # chỉ đọc phiên bản dữ liệu
+            self.tile(18, 208739, 123191)
+        Hospital.objects.filter(pk=self.nearby.pk).update(is_active=False)
+        self.assertEqual([feature[0] for feature in self.tile(18, 208739, 123191)], [self.cho_ray.pk])
+
+    def test_rejects_invalid_tiles(self):
+        for response, status_code in [
+            (self.client.get('/api/hospitals/tiles/3/8/0/'), 404),
+            (self.client.get('/api/hospitals/tiles/3/0/0/', {'district': 'x'}), 400),
+        ]:
+            with self.subTest(status_code=status_code):
+                self.assertEqual(response.status_code, status_code)
+                # Lỗi là JSON, không phải tile, và không được trình duyệt lưu theo phiên bản dữ liệu
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIsInstance(response.json(), dict)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertFalse(response.has_header('Last-Modified'))
@@ -0,0 +1,145 @@
+"""
+Vector tile (MVT) cho bản đồ: /api/hospitals/tiles/{z}/{x}/{y}/.
+
+Tile theo lưới Web Mercator (EPSG:3857) như tile ảnh của Leaflet/OSM. Với mỗi
+tile, các bệnh viện trong hộp bao kinh/vĩ độ của tile (nới thêm ``buffer`` để
+biểu tượng sát mép không bị cắt) được đọc qua chỉ mục (latitude, longitude),
+chiếu về tọa độ tile bằng NumPy rồi mã hóa thành lớp ``hospitals``.
+
+Ở mức zoom thấp (``zoom <= HOSPITAL_TILE_CLUSTER_MAX_ZOOM``) các điểm được gom
+theo ô lưới ``cluster_cell`` đơn vị tile: ô có nhiều bệnh viện thành một điểm
+``cluster`` (``point_count``) ở trọng tâm, ô chỉ có một bệnh viện giữ nguyên.
+Cụm được tính riêng cho từng tile nên kích thước tile gần như không đổi theo
+quy mô danh mục. Tile đã mã hóa được cache theo phiên bản dữ liệu.
+"""
+import math
+
+import numpy as np
+from django.db import connection
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .geojson import DEFAULT_PROPERTIES
+from .mvt import EXTENT, Layer, encode_tile
+
+LAYER_NAME = 'hospitals'
+
+# Giới hạn vĩ độ của Web Mercator
+MAX_LATITUDE = 85.0511287798
+
+
+class VectorTileRenderer(BaseRenderer):
+    """Trả nguyên bytes của tile; lỗi (dict) được trả dạng JSON với Content-Type JSON"""
+    media_type = 'application/vnd.mapbox-vector-tile'
+    format = 'pbf'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        # Response đã gắn Content-Type của tile trước khi gọi render
+        response = (renderer_context or {}).get('response')
+        if response is not None:
+            response['Content-Type'] = JSONRenderer.media_type
+        return JSONRenderer().render(data)
+
+
+def is_valid_tile(z, x, y, max_zoom=22):
+    return 0 <= z <= max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+
+def tile_bounds(z, x, y, buffer=0.0):
+    """(vĩ độ nhỏ nhất, lớn nhất, kinh độ nhỏ nhất, lớn nhất) của tile, nới ``buffer`` phần kích thước tile"""
+    n = 2 ** z
+
+    def longitude(tx):
+        return tx / n * 360.0 - 180.0
+
+    def latitude(ty):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * ty / n))))
+
+    return (
+        max(latitude(y + 1 + buffer), -MAX_LATITUDE),
+        min(latitude(y - buffer), MAX_LATITUDE),
+        max(longitude(x - buffer), -180.0),
+        min(longitude(x + 1 + buffer), 180.0),
+    )
+
+
+def project(latitudes, longitudes, z, x, y, extent=EXTENT):
+    """Tọa độ tile (số thực, 0..extent trong tile) của các điểm"""
+    n = 2 ** z
+    lat = np.radians(np.clip(latitudes, -MAX_LATITUDE, MAX_LATITUDE))
+    px = ((np.asarray(longitudes) + 180.0) / 360.0 * n - x) * extent
+    py = ((1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n - y) * extent
+    return px, py
+
+
+def cluster(px, py, cell, extent=EXTENT):
+    """Gom điểm theo ô lưới ``cell``; trả (vị trí đại diện, số điểm, tọa độ x, y) cho các ô nằm trong tile.
+
+    Ô ngoài tile (vùng buffer) bị bỏ vì tile bên cạnh đã vẽ chúng.
+    """
+    cells_x = np.floor(px / cell).astype(np.int64)
+    cells_y = np.floor(py / cell).astype(np.int64)
+    per_side = -(-extent // cell)
+    inside = (cells_x >= 0) & (cells_x < per_side) & (cells_y >= 0) & (cells_y < per_side)
+    positions = np.flatnonzero(inside)
+    if not len(positions):
+        empty = np.empty(0)
+        return positions, empty.astype(np.int64), empty, empty
+    keys = cells_y[positions] * per_side + cells_x[positions]
+    _, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+    cx = np.bincount(inverse, weights=px[positions]) / counts
+    cy = np.bincount(inverse, weights=py[positions]) / counts
+    return positions[first], counts, cx, cy
+
+
+def _properties(queryset, ids):
+    """{id: thuộc tính} của các bệnh viện ``ids``"""
+    batch_size = connection.features.max_query_params or len(ids) or 1
+    found = {}
+    for start in range(0, len(ids), batch_size):
+        rows = queryset.filter(pk__in=ids[start:start + batch_size]).order_by().values_list('id', *DEFAULT_PROPERTIES)
+        for pk, *values in rows:
+            found[pk] = dict(zip(DEFAULT_PROPERTIES, values))
+    return found
+
+
+def build_tile(queryset, z, x, y, extent=EXTENT, buffer=64, cluster_max_zoom=13, cluster_cell=256):
+    """Nội dung MVT của tile (z, x, y) cho các bệnh viện trong ``queryset``.
+
+    Khi gom cụm chỉ tọa độ được đọc cho mọi điểm; thuộc tính chỉ được đọc cho
+    các bệnh viện đứng riêng.
+    """
+    lat_min, lat_max, lng_min, lng_max = tile_bounds(z, x, y, buffer / extent)
+    clustered = z <= cluster_max_zoom
+    columns = ['id', 'latitude', 'longitude'] + ([] if clustered else DEFAULT_PROPERTIES)
+    rows = list(queryset.filter(
+        latitude__range=(lat_min, lat_max), longitude__range=(lng_min, lng_max)
+    ).order_by('id').values_list(*columns))
+
+    layer = Layer(LAYER_NAME, extent)
+    if not rows:
+        return encode_tile([layer])
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    latitudes = np.array([row[1] for row in rows], dtype=np.float64)
+    longitudes = np.array([row[2] for row in rows], dtype=np.float64)
+    px, py = project(latitudes, longitudes, z, x, y, extent)
+
+    if not clustered:
+        for row, tx, ty in zip(rows, px.tolist(), py.tolist()):
+            layer.add_point(round(tx), round(ty), dict(zip(DEFAULT_PROPERTIES, row[3:])), id=row[0])
+        return encode_tile([layer])
+
+    positions, counts, cx, cy = cluster(px, py, cluster_cell, extent)
+    singles = positions[counts == 1]
+    properties = _properties(queryset, ids[singles].tolist())
+    for position, count, tx, ty in zip(positions.tolist(), counts.tolist(), cx.tolist(), cy.tolist()):
+        if count == 1:
+            pk = int(ids[position])
+            layer.add_point(round(px[position]), round(py[position]), properties.get(pk), id=pk)
+        else:
+            layer.add_point(round(tx), round(ty), {'cluster': True, 'point_count': count})
+    return encode_tile([layer])
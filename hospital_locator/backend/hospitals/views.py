@@ -1,27 +1,247 @@
-from django.db.models import Count, Avg, Q
+import io
+import json
+from functools import wraps
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from rest_framework.utils.encoders import JSONEncoder
 
-from .models import Hospital
+from . import fuzzy
+from .filters import HospitalSearchFilter
+from .models import Hospital, HospitalSpecialty
+from .pagination import RANK_ORDERING, HospitalCursorPagination
 from .serializers import (
-    HospitalSerializer, HospitalListSerializer, HospitalSearchSerializer,
-    HospitalStatsSerializer, NearestHospitalSerializer
+    AutocompleteSerializer, HospitalSerializer, HospitalListSerializer, HospitalRowSerializer, HospitalSearchSerializer,
+    HospitalStatsSerializer, NearestHospitalSerializer, NearestBatchSerializer,
+    DistanceMatrixSerializer, GeoJSONSerializer, HospitalFilterSerializer
 )
+from .distance import coordinate_arrays, haversine_matrix, within_radius
+from .geojson import feature_collection
+from .tiles import VectorTileRenderer, build_tile, is_valid_tile
+from .fragments import hospital_rows
+from .autocomplete import get_autocomplete_index
+from .origin_cache import cached_matches
+from .spatial import build_spatial_index, facet_key, get_spatial_index
+from .cache import cache_metrics, cached_payload, request_catalog_version, version_key
+from .stats import read_stats
 
+# Số điểm xuất phát xử lý trong mỗi khối của nearest_batch
+BATCH_CHUNK_SIZE = 200
 
+# Cột mà từ khóa của action search được so khớp
+KEYWORD_COLUMNS = ['name', 'name_en', 'address']
+
+
+# Action đọc không suy ra từ dữ liệu bệnh viện nên không có ETag/Last-Modified
+UNVERSIONED_ACTIONS = {'cache_stats'}
+
+
+def _is_versioned(request):
+    """Request GET/HEAD tới một action mà nội dung chỉ phụ thuộc phiên bản dữ liệu"""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Router của DRF gắn bảng method -> action vào view được resolve
+    actions = getattr(getattr(request.resolver_match, 'func', None), 'actions', None) or {}
+    return actions.get('get') not in UNVERSIONED_ACTIONS
+
+
+def _catalog_etag(request, *args, **kwargs):
+    """ETag của phản hồi đọc: phiên bản dữ liệu hiện tại"""
+    if not _is_versioned(request):
+        return None
+    return f'W/"{version_key(request_catalog_version(request))}"'
+
+
+def _catalog_last_modified(request, *args, **kwargs):
+    if not _is_versioned(request):
+        return None
+    return request_catalog_version(request)[1]
+
+
+def catalog_condition(view):
+    """``condition`` theo phiên bản dữ liệu; phản hồi lỗi (4xx/5xx) không mang ETag/Last-Modified"""
+    conditional = condition(etag_func=_catalog_etag, last_modified_func=_catalog_last_modified)(view)
+
+    @wraps(view)
+    def inner(request, *args, **kwargs):
+        response = conditional(request, *args, **kwargs)
+        if response.status_code >= 400:
+            del response['ETag']
+            del response['Last-Modified']
+        return response
+
+    return inner
+
+
+def _spatial_index_enabled():
+    return getattr(settings, 'HOSPITAL_SPATIAL_INDEX_ENABLED', True)
+
+
+def _apply_filters(queryset, data):
+    """Áp dụng các bộ lọc quận, loại, chuyên khoa, cấp cứu lên queryset"""
+    # Lọc theo quận
+    if data.get('district'):
+        queryset = queryset.filter(district=data['district'])
+
+    # Lọc theo loại bệnh viện
+    if data.get('hospital_type'):
+        queryset = queryset.filter(hospital_type=data['hospital_type'])
+
+    # Lọc theo chuyên khoa (chính hoặc trong danh sách) qua bảng HospitalSpecialty
+    if data.get('specialty'):
+        queryset = queryset.filter(specialty_links__specialty=data['specialty'])
+
+    # Chỉ hiển thị bệnh viện có cấp cứu
+    if data.get('emergency_only'):
+        queryset = queryset.filter(emergency_services=True)
+
+    return queryset
+
+
+def _facet_required(data):
+    return facet_key(
+        hospital_type=data.get('hospital_type'),
+        district=data.get('district'),
+        specialty=data.get('specialty'),
+        emergency_only=data.get('emergency_only', False),
+    )
+
+
+def _facet_index(data, index=None):
+    """Chỉ mục không gian chỉ gồm các bệnh viện khớp bộ lọc"""
+    return (index or get_spatial_index()).subset(_facet_required(data))
+
+
+def _indexed_matches(lat, lng, k, radius, filters):
+    """Truy vấn chỉ mục con theo bộ lọc qua cache ô lưới của điểm xuất phát"""
+    required = _facet_required(filters)
+    root = get_spatial_index()
+    return cached_matches(root, required, root.subset(required), lat, lng, k=k, radius=radius)
+
+
+def _nearest_matches(lat, lng, k, max_distance, filters=None):
+    """k bệnh viện gần nhất trong ``max_distance`` km, dạng danh sách (id, km).
+
+    Dùng chỉ mục trong bộ nhớ (chỉ mục con theo bộ lọc nếu có), hoặc truy vấn hộp
+    bao trong SQL khi ``HOSPITAL_SPATIAL_INDEX_ENABLED`` tắt (worker không đủ bộ
+    nhớ giữ chỉ mục).
+    """
+    filters = filters or {}
+    if _spatial_index_enabled():
+        return _indexed_matches(lat, lng, k, max_distance, filters)
+    queryset = _apply_filters(Hospital.objects.filter(is_active=True).order_by('id'), filters)
+    return within_radius(queryset, lat, lng, max_distance, k=k)
+
+
+def _distance_payload(dist_km):
+    return {
+        'km': round(dist_km, 2),
+        'm': round(dist_km * 1000, 0)
+    }
+
+
+def _to_json(data):
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def _row_queryset(queryset, fields=None):
+    """Các dòng values() đủ cho HospitalRowSerializer, không dựng model instance.
+
+    Chỉ đọc các cột mà ``fields`` cần (cộng id và trường sắp xếp cho phân trang),
+    nên các cột lớn như description/working_hours không bị đọc khi không dùng.
+    """
+    if fields is None:
+        return queryset.values(*HospitalRowSerializer.value_fields)
+    columns = HospitalRowSerializer(fields).columns()
+    ordering = queryset.query.order_by
+    if not ordering and queryset.query.default_ordering:
+        ordering = queryset.model._meta.ordering
+    for term in ordering:
+        name = term.lstrip('-') if isinstance(term, str) else None
+        if name and name != 'pk' and name not in columns:
+            columns.append(name)
+    return queryset.values(*columns)
+
+
+def _serialize_rows(rows, fields=None):
+    """Dữ liệu đầu ra của các dòng: fragment đã cache khi lấy đủ field"""
+    if fields is None:
+        return hospital_rows(rows)
+    return HospitalRowSerializer(fields).serialize_many(rows)
+
+
+def _fetch_rows(ids, fields=None):
+    """Dòng values() của các bệnh viện đang hoạt động theo đúng thứ tự ``ids``"""
+    ids = list(ids)
+    queryset = _row_queryset(Hospital.objects.filter(is_active=True).order_by(), fields)
+    batch_size = connection.features.max_query_params or len(ids) or 1
+    found = {}
+    for start in range(0, len(ids), batch_size):
+        for row in queryset.filter(pk__in=ids[start:start + batch_size]):
+            found[row['id']] = row
+    return [found[pk] for pk in ids if pk in found]
+
+
+def _district_counts():
+    """Các quận/huyện có bệnh viện đang hoạt động kèm số lượng"""
+    districts = Hospital.objects.filter(
+        is_active=True
+    ).values('district').distinct().order_by('district')
+
+    result = []
+    for item in districts:
+        district_code = item['district']
+        district_name = dict(Hospital.DISTRICTS).get(district_code, district_code)
+        count = Hospital.objects.filter(district=district_code, is_active=True).count()
+        result.append({
+            'code': district_code,
+            'name': district_name,
+            'hospital_count': count
+        })
+
+    return result
+
+
+def _specialty_counts():
+    """Các chuyên khoa kèm số bệnh viện đang hoạt động (chuyên khoa chính hoặc trong danh sách)"""
+    counts = dict(
+        HospitalSpecialty.objects.filter(hospital__is_active=True)
+        .values_list('specialty').annotate(n=Count('hospital')).order_by()
+    )
+    return [
+        {'code': code, 'name': name, 'hospital_count': counts.get(code, 0)}
+        for code, name in Hospital.SPECIALTIES
+    ]
+
+
+# GET/HEAD trả 304 trước khi chạy queryset/serializer nếu dữ liệu chưa đổi;
+# no-cache buộc trình duyệt kiểm tra lại mỗi lần thay vì đoán độ mới
+@method_decorator(cache_control(no_cache=True), name='dispatch')
+@method_decorator(catalog_condition, name='dispatch')
 class HospitalViewSet(viewsets.ModelViewSet):
     """ViewSet cho quản lý bệnh viện"""
     queryset = Hospital.objects.filter(is_active=True)
     permission_classes = [AllowAny]  # Cho phép truy cập công khai
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, HospitalSearchFilter, filters.OrderingFilter]
     filterset_fields = ['hospital_type', 'district', 'main_specialty', 'emergency_services']
     search_fields = ['name', 'name_en', 'address', 'phone']
     ordering_fields = ['name', 'created_at', 'capacity']
     ordering = ['name']
+    pagination_class = HospitalCursorPagination  # Bật khi có ?page_size= hoặc ?cursor=
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -40,6 +260,30 @@ class HospitalViewSet(viewsets.ModelViewSet):
             headers=headers
         )
 
+    def get_sparse_fields(self):
+        """Field đầu ra theo ``?fields=``/``?omit=``; None nếu lấy đủ"""
+        params = self.request.query_params
+        return HospitalRowSerializer.parse_fields(params.get('fields'), params.get('omit'))
+
+    def list(self, request, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        queryset = _row_queryset(self.filter_queryset(self.get_queryset()), fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(_serialize_rows(page, fields))
+        return Response(_serialize_rows(queryset, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            _row_queryset(self.filter_queryset(self.get_queryset()), fields),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return Response(HospitalRowSerializer(fields).to_representation(row))
+
     def perform_create(self, serializer):
         serializer.save()
 
@@ -63,71 +307,105 @@ class HospitalViewSet(viewsets.ModelViewSet):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
             data = serializer.validated_data
 
+        fields = self.get_sparse_fields()
         queryset = self.get_queryset()
 
-        # Tìm kiếm theo từ khóa
-        if data.get('query'):
-            queryset = queryset.filter(
-                Q(name__icontains=data['query']) |
-                Q(name_en__icontains=data['query']) |
-                Q(address__icontains=data['query'])
-            )
-
-        # Lọc theo quận
-        if data.get('district'):
-            queryset = queryset.filter(district=data['district'])
-
-        # Lọc theo loại bệnh viện
-        if data.get('hospital_type'):
-            queryset = queryset.filter(hospital_type=data['hospital_type'])
-
-        # Lọc theo chuyên khoa
-        if data.get('specialty'):
-            queryset = queryset.filter(
-                Q(main_specialty=data['specialty']) |
-                Q(specialties__contains=[data['specialty']])
-            )
-
-        # Chỉ hiển thị bệnh viện có cấp cứu
-        if data.get('emergency_only'):
-            queryset = queryset.filter(emergency_services=True)
-
-        results = list(queryset)
+        queryset = _apply_filters(queryset, data)
+        keyword = data.get('query')
 
-        # GIS: Tìm kiếm theo vị trí với spatial analysis (Python calculation)
+        # GIS: Tìm kiếm theo vị trí
         if data.get('latitude') and data.get('longitude'):
             lat = float(data['latitude'])
             lng = float(data['longitude'])
             radius = float(data.get('radius', 5.0))
-            
-            # Filter and sort by distance using Python
-            filtered_results = []
-            import math
-            
-            for hospital in results:
-                if hospital.latitude is not None and hospital.longitude is not None:
-                    # Haversine formula
-                    dlat = math.radians(hospital.latitude - lat)
-                    dlon = math.radians(hospital.longitude - lng)
-                    a = math.sin(dlat/2) * math.sin(dlat/2) + \
-                        math.cos(math.radians(lat)) * math.cos(math.radians(hospital.latitude)) * \
-                        math.sin(dlon/2) * math.sin(dlon/2)
-                    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                    d = 6371 * c # Radius of earth in km
-                    
-                    if d <= radius:
-                        hospital.distance_val = d
-                        filtered_results.append(hospital)
-            
-            # Sort by distance
-            filtered_results.sort(key=lambda x: x.distance_val)
-            results = filtered_results
-
-        serializer_class = self.get_serializer_class()
-        # Serialize list of objects
-        serialized_data = serializer_class(results, many=True, context={'request': request}).data
+
+            if not keyword and _spatial_index_enabled():
+                # Chỉ có bộ lọc: trả lời từ chỉ mục con theo bộ lọc
+                matches = _indexed_matches(lat, lng, None, radius, data)
+            else:
+                # Lọc hộp bao trong SQL, Haversine trên các dòng còn lại
+                if keyword:
+                    queryset = fuzzy.matching(queryset, keyword, KEYWORD_COLUMNS)
+                matches = within_radius(queryset, lat, lng, radius)
+            # Phân trang theo (khoảng cách, id)
+            page = self.paginator.paginate_matches(matches, request)
+            if page is not None:
+                matches = page
+            results = _fetch_rows([pk for pk, _ in matches], fields)
+        elif keyword and not request.query_params.get('ordering'):
+            # Từ khóa không kèm ?ordering=: xếp theo độ liên quan, phân trang theo (điểm, id)
+            matches = fuzzy.ranked(queryset, keyword, KEYWORD_COLUMNS)
+            page = self.paginator.paginate_matches(matches, request, ordering=RANK_ORDERING)
+            if page is not None:
+                matches = page
+            results = _fetch_rows([pk for pk, _ in matches], fields)
+        else:
+            if keyword:
+                queryset = fuzzy.matching(queryset, keyword, KEYWORD_COLUMNS)
+            queryset = filters.OrderingFilter().filter_queryset(request, queryset, self)
+            queryset = _row_queryset(queryset, fields)
+            page = self.paginate_queryset(queryset)
+            results = page if page is not None else list(queryset)
+
+        # Ghép fragment đã serialize sẵn của từng bệnh viện
+        serialized_data = _serialize_rows(results, fields)
+        if page is not None:
+            return self.get_paginated_response(serialized_data)
         return Response(serialized_data)
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """Gợi ý tên bệnh viện/tên đường theo tiền tố đang gõ, không truy vấn bảng bệnh viện"""
+        serializer = AutocompleteSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        index = get_autocomplete_index(request_catalog_version(request))
+        return Response(index.suggest(data['q'], data['limit']))
+
+    @action(detail=False, methods=['get'])
+    def geojson(self, request):
+        """Các bệnh viện (cùng bộ lọc với danh sách) dạng GeoJSON FeatureCollection, trả về dạng stream"""
+        serializer = GeoJSONSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        stream = feature_collection(
+            self.filter_queryset(self.get_queryset()),
+            properties=data.get('properties'),
+            precision=data.get('precision', getattr(settings, 'HOSPITAL_GEOJSON_PRECISION', 6)),
+            chunk_size=getattr(settings, 'HOSPITAL_EXPORT_CHUNK_SIZE', 2000),
+        )
+        return StreamingHttpResponse(stream, content_type='application/geo+json')
+
+    @action(
+        detail=False, methods=['get'], url_path=r'tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)',
+        renderer_classes=[VectorTileRenderer],
+    )
+    def tiles(self, request, z, x, y, format=None):
+        """Vector tile (MVT) các bệnh viện trong tile z/x/y, gom cụm ở zoom thấp, cache theo phiên bản dữ liệu"""
+        z, x, y = int(z), int(x), int(y)
+        if not is_valid_tile(z, x, y, getattr(settings, 'HOSPITAL_TILE_MAX_ZOOM', 22)):
+            raise NotFound('Tile không tồn tại')
+        serializer = HospitalFilterSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = serializer.validated_data
+        variant = f'{z}/{x}/{y}:' + ','.join(f'{key}={filters[key]}' for key in sorted(filters))
+
+        def build():
+            return build_tile(
+                _apply_filters(Hospital.objects.filter(is_active=True), filters), z, x, y,
+                buffer=getattr(settings, 'HOSPITAL_TILE_BUFFER', 64),
+                cluster_max_zoom=getattr(settings, 'HOSPITAL_TILE_CLUSTER_MAX_ZOOM', 13),
+                cluster_cell=getattr(settings, 'HOSPITAL_TILE_CLUSTER_CELL', 256),
+            )
+
+        return Response(cached_payload('tiles', build, request_catalog_version(request), variant))
+
     @action(detail=False, methods=['get'])
     def nearby(self, request):
         """Tìm bệnh viện gần vị trí hiện tại"""
@@ -141,43 +419,17 @@ class HospitalViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Get all active hospitals with coordinates
-        hospitals = Hospital.objects.filter(
-            is_active=True,
-            latitude__isnull=False,
-            longitude__isnull=False
-        )
+        # GIS: Tra cứu không gian, chỉ lấy 20 bệnh viện gần nhất từ ORM
+        matches = _nearest_matches(lat, lng, 20, radius)
+        fields = self.get_sparse_fields()
+        nearby_hospitals = _fetch_rows([pk for pk, _ in matches], fields)
 
-        # Calculate distance in Python
-        import math
-        nearby_hospitals = []
-        
-        for hospital in hospitals:
-            dlat = math.radians(hospital.latitude - lat)
-            dlon = math.radians(hospital.longitude - lng)
-            a = math.sin(dlat/2) * math.sin(dlat/2) + \
-                math.cos(math.radians(lat)) * math.cos(math.radians(hospital.latitude)) * \
-                math.sin(dlon/2) * math.sin(dlon/2)
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            d = 6371 * c # Distance in km
-            
-            if d <= radius:
-                hospital.distance_val = d
-                nearby_hospitals.append(hospital)
-
-        # Sort by distance
-        nearby_hospitals.sort(key=lambda x: x.distance_val)
-        
-        # Limit to 20
-        nearby_hospitals = nearby_hospitals[:20]
-
-        serializer = HospitalListSerializer(nearby_hospitals, many=True, context={'request': request})
         # Inject distance into response if needed, for now just returning sorted list
-        return Response(serializer.data)
+        return Response(_serialize_rows(nearby_hospitals, fields))
 
     @action(detail=False, methods=['post'])
     def nearest(self, request):
-        """Tìm bệnh viện gần nhất"""
+        """Tìm bệnh viện gần nhất (có thể kèm bộ lọc như search)"""
         serializer = NearestHospitalSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -188,138 +440,159 @@ class HospitalViewSet(viewsets.ModelViewSet):
         limit = data['limit']
         max_distance = data['max_distance']
 
-        hospitals = Hospital.objects.filter(
-            is_active=True,
-            latitude__isnull=False,
-            longitude__isnull=False
-        )
-
-        import math
-        processed_hospitals = []
-        
-        for hospital in hospitals:
-            dlat = math.radians(hospital.latitude - lat)
-            dlon = math.radians(hospital.longitude - lng)
-            a = math.sin(dlat/2) * math.sin(dlat/2) + \
-                math.cos(math.radians(lat)) * math.cos(math.radians(hospital.latitude)) * \
-                math.sin(dlon/2) * math.sin(dlon/2)
-            c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-            d = 6371 * c # km
-            
-            if d <= max_distance:
-                # Add dynamic distance attribute for the serializer or response
-                # We can't easily add to serializer without modifying it to accept context or extra fields
-                # So we structure the response manually or annotating the object won't work with standard fields easily
-                processed_hospitals.append({
-                    'hospital': hospital,
-                    'distance': d
-                })
-
-        # Sort
-        processed_hospitals.sort(key=lambda x: x['distance'])
-        processed_hospitals = processed_hospitals[:limit]
+        # GIS: Nearest neighbor, chỉ trong các bệnh viện khớp bộ lọc
+        matches = _nearest_matches(lat, lng, limit, max_distance, filters=data)
+        distances = dict(matches)
+        fields = self.get_sparse_fields()
+        rows = _fetch_rows([pk for pk, _ in matches], fields)
 
         results = []
-        for item in processed_hospitals:
-            hospital = item['hospital']
-            dist_km = item['distance']
-            
-            hospital_data = HospitalListSerializer(hospital, context={'request': request}).data
-            hospital_data['distance'] = {
-                'km': round(dist_km, 2),
-                'm': round(dist_km * 1000, 0)
-            }
+        for row, hospital_data in zip(rows, _serialize_rows(rows, fields)):
+            hospital_data['distance'] = _distance_payload(distances[row['id']])
             results.append(hospital_data)
 
         return Response(results)
 
+    @action(detail=False, methods=['post'])
+    def nearest_batch(self, request):
+        """Tìm bệnh viện gần nhất cho nhiều điểm, trả kết quả dạng stream.
+
+        Cả lô được trả lời trên cùng một bản chụp chỉ mục không gian; các điểm
+        được xử lý theo khối nên bộ nhớ không tăng theo kích thước lô.
+        """
+        serializer = NearestBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        index = get_spatial_index() if _spatial_index_enabled() else build_spatial_index()
+        index = _facet_index(data, index)
+        fields = self.get_sparse_fields()
+
+        def stream():
+            origins = data['origins']
+            yield '{"results":['
+            for start in range(0, len(origins), BATCH_CHUNK_SIZE):
+                chunk = origins[start:start + BATCH_CHUNK_SIZE]
+                matches = [
+                    index.nearest(o['latitude'], o['longitude'], data['limit'],
+                                  max_distance=data['max_distance'])
+                    for o in chunk
+                ]
+                ids = {pk for found in matches for pk, _ in found}
+                rows = _fetch_rows(ids, fields)
+                serialized = {row['id']: data for row, data in zip(rows, _serialize_rows(rows, fields))}
+
+                parts = []
+                for origin, found in zip(chunk, matches):
+                    results = []
+                    for pk, dist_km in found:
+                        if pk in serialized:
+                            results.append({**serialized[pk], 'distance': _distance_payload(dist_km)})
+                    parts.append(_to_json({'origin': origin, 'hospitals': results}))
+                yield (',' if start else '') + ','.join(parts)
+            yield ']}'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
+    @action(detail=False, methods=['post'])
+    def distance_matrix(self, request):
+        """Ma trận khoảng cách điểm xuất phát x bệnh viện, trả về dạng stream CSV/NDJSON.
+
+        Ma trận được tính theo từng khối (điểm xuất phát x hospital_block) và số
+        điểm xuất phát mỗi lượt được thu nhỏ khi có nhiều bệnh viện, nên bộ nhớ
+        chỉ phụ thuộc origin_block x hospital_block, không phụ thuộc kích thước
+        toàn bộ ma trận.
+        """
+        serializer = DistanceMatrixSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        queryset = Hospital.objects.filter(is_active=True).order_by('id')
+        if data.get('hospital_type'):
+            queryset = queryset.filter(hospital_type=data['hospital_type'])
+        if data.get('district'):
+            queryset = queryset.filter(district=data['district'])
+        if data.get('emergency_services') is not None:
+            queryset = queryset.filter(emergency_services=data['emergency_services'])
+
+        hospital_ids, hospital_lats, hospital_lngs = coordinate_arrays(queryset)
+        origins = data['origins']
+        origin_lats = np.array([o['latitude'] for o in origins], dtype=np.float64)
+        origin_lngs = np.array([o['longitude'] for o in origins], dtype=np.float64)
+        origin_block = data.get('origin_block') or getattr(settings, 'HOSPITAL_MATRIX_ORIGIN_BLOCK', 256)
+        hospital_block = data.get('hospital_block') or getattr(settings, 'HOSPITAL_MATRIX_HOSPITAL_BLOCK', 2048)
+        is_csv = data['output_format'] == 'csv'
+
+        # Số điểm xuất phát mỗi lượt: giới hạn để cả khối số lẫn phần văn bản của
+        # các dòng không vượt quá origin_block x hospital_block giá trị
+        rows_per_block = max(1, min(origin_block, origin_block * hospital_block // max(len(hospital_ids), 1)))
+
+        def blocks():
+            """Các dòng ma trận đã định dạng (%.3f, phân tách bằng dấu phẩy) theo từng khối điểm"""
+            for start in range(0, len(origins), rows_per_block):
+                stop = min(start + rows_per_block, len(origins))
+                pieces = [[] for _ in range(stop - start)]
+                for col in range(0, len(hospital_ids), hospital_block):
+                    block = haversine_matrix(
+                        origin_lats[start:stop], origin_lngs[start:stop],
+                        hospital_lats[col:col + hospital_block], hospital_lngs[col:col + hospital_block]
+                    )
+                    buffer = io.StringIO()
+                    np.savetxt(buffer, block, fmt='%.3f', delimiter=',')
+                    for piece, line in zip(pieces, buffer.getvalue().splitlines()):
+                        piece.append(line)
+                yield start, [','.join(piece) for piece in pieces]
+
+        def stream():
+            ids = ','.join(map(str, hospital_ids.tolist()))
+            if is_csv:
+                yield ','.join(['origin,latitude,longitude'] + ([ids] if ids else [])) + '\n'
+            else:
+                yield f'{{"hospital_ids":[{ids}]}}\n'
+
+            for start, lines in blocks():
+                parts = []
+                for offset, line in enumerate(lines):
+                    origin = origins[start + offset]
+                    if is_csv:
+                        label = origin.get('id', start + offset)
+                        row = [str(label), str(origin['latitude']), str(origin['longitude'])]
+                        parts.append(','.join(row + ([line] if line else [])) + '\n')
+                    else:
+                        parts.append(f'{{"origin":{_to_json(origin)},"distances":[{line}]}}\n')
+                yield ''.join(parts)
+
+        if is_csv:
+            response = StreamingHttpResponse(stream(), content_type='text/csv')
+            response['Content-Disposition'] = 'attachment; filename="distance_matrix.csv"'
+            return response
+        return StreamingHttpResponse(stream(), content_type='application/x-ndjson')
+
     @action(detail=False, methods=['get'])
     def stats(self, request):
         """Thống kê bệnh viện"""
         try:
-            queryset = Hospital.objects.filter(is_active=True)
-            total = queryset.count()
-
-            # Thống kê theo loại
-            by_type = {}
-            for htype, hname in Hospital.HOSPITAL_TYPES:
-                by_type[htype] = queryset.filter(hospital_type=htype).count()
-
-            # Thống kê theo quận
-            by_district = {}
-            for dcode, dname in Hospital.DISTRICTS:
-                by_district[dcode] = queryset.filter(district=dcode).count()
-
-            # Thống kê theo chuyên khoa
-            by_specialty = {}
-            for scode, sname in Hospital.SPECIALTIES:
-                by_specialty[scode] = queryset.filter(main_specialty=scode).count()
-
-            stats = {
-                'total_hospitals': total,
-                'by_type': by_type,
-                'by_district': by_district,
-                'by_specialty': by_specialty,
-                'emergency_count': queryset.filter(emergency_services=True).count(),
-            }
-
-            avg_cap = queryset.filter(capacity__isnull=False).aggregate(avg=Avg('capacity'))
-            stats['average_capacity'] = round(avg_cap['avg'] or 0, 1)
-
-            return Response(stats)
+            # Đọc từ bảng bộ đếm, cache theo phiên bản dữ liệu
+            return Response(cached_payload('stats', read_stats, request_catalog_version(request)))
         except Exception as e:
             return Response({'error': str(e)}, status=500)
 
     @action(detail=False, methods=['get'])
     def districts(self, request):
         """Danh sách các quận/huyện có bệnh viện"""
-        districts = Hospital.objects.filter(
-            is_active=True
-        ).values('district').distinct().order_by('district')
-
-        result = []
-        for item in districts:
-            district_code = item['district']
-            district_name = dict(Hospital.DISTRICTS).get(district_code, district_code)
-            count = Hospital.objects.filter(district=district_code, is_active=True).count()
-            result.append({
-                'code': district_code,
-                'name': district_name,
-                'hospital_count': count
-            })
-
-        return Response(result)
+        return Response(cached_payload('districts', _district_counts, request_catalog_version(request)))
 
     @action(detail=False, methods=['get'])
     def specialties(self, request):
         """Danh sách các chuyên khoa"""
-        specialties = []
-        for code, name in Hospital.SPECIALTIES:
-            # Đếm bệnh viện theo chuyên khoa chính
-            count_by_main = Hospital.objects.filter(
-                main_specialty=code,
-                is_active=True
-            ).count()
-
-            # Đếm bệnh viện có chuyên khoa trong danh sách JSON
-            count_by_specialties = 0
-            try:
-                count_by_specialties = Hospital.objects.filter(
-                    specialties__icontains=f'"{code}"',
-                    is_active=True
-                ).exclude(main_specialty=code).count()
-            except:
-                pass  # JSON query có thể không hoạt động trên SQLite
-
-            total_count = count_by_main + count_by_specialties
-
-            specialties.append({
-                'code': code,
-                'name': name,
-                'hospital_count': total_count
-            })
-
-        return Response(specialties)
+        return Response(cached_payload('specialties', _specialty_counts, request_catalog_version(request)))
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Số lượt trúng/trượt cache phản hồi của tiến trình hiện tại"""
+        return Response(cache_metrics())
 
 # Template views removed - using React frontend
 # Django now serves only REST APIs for GIS data
@@ -1,6 +1,7 @@
 """
 Script import dữ liệu bệnh viện TP.HCM vào database
-Chạy: python import_data.py
+Chạy: python import_data.py            (đồng bộ, giữ id)
+      python import_data.py --replace  (xóa hết rồi nạp lại)
 """
 import os
 import sys
@@ -11,6 +12,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 django.setup()
 
+from hospitals.importer import HospitalImporter, HospitalSync
 from hospitals.models import Hospital
 
 # Danh sách bệnh viện (từ create_hospitals_hcmc.py)
@@ -1556,31 +1558,25 @@ hospitals_data = [
     },
 ]
 
-def import_hospitals():
-    """Import du lieu benh vien vao database"""
+def import_hospitals(batch_size=None, replace=False):
+    """Import du lieu benh vien vao database.
+
+    Mac dinh dong bo theo khoa tu nhien (ten + toa do): chi tao/cap nhat/ngung
+    hoat dong phan thay doi, giu nguyen id. ``replace=True``: xoa het roi nap lai.
+    """
     import sys
     sys.stdout.reconfigure(encoding='utf-8')
-    
-    # Xoa du lieu cu
-    print("Dang xoa du lieu cu...")
-    deleted_count = Hospital.objects.all().delete()[0]
-    print(f"Da xoa {deleted_count} ban ghi cu")
-    
-    # Them du lieu moi
-    print(f"Dang them {len(hospitals_data)} benh vien/phong kham...")
-    created_count = 0
-    
-    for h in hospitals_data:
-        try:
-            Hospital.objects.create(**h)
-            created_count += 1
-            print(f"  + {h['name']}")
-        except Exception as e:
-            print(f"  - Loi tao '{h['name']}': {e}")
-    
+
+    print(f"Dang nap {len(hospitals_data)} benh vien/phong kham...")
+    importer = HospitalImporter if replace else HospitalSync
+    result = importer(batch_size=batch_size).run(hospitals_data)
+
+    for position, record, errors in result.rejected:
+        print(f"  - Loi ban ghi #{position} '{record.get('name', '?')}': {errors}")
+
     # Thong ke
     print(f"\n=== Ket qua ===")
-    print(f"Da tao: {created_count}/{len(hospitals_data)}")
+    print(result.summary())
     print(f"Tong benh vien: {Hospital.objects.count()}")
     print(f"  - Cong lap: {Hospital.objects.filter(hospital_type='public').count()}")
     print(f"  - Tu nhan: {Hospital.objects.filter(hospital_type='private').count()}")
@@ -1589,5 +1585,5 @@ def import_hospitals():
     print("\nHoan thanh! Moi ban refresh trang web de xem du lieu moi.")
 
 if __name__ == '__main__':
-    import_hospitals()
+    import_hospitals(replace='--replace' in sys.argv)
 
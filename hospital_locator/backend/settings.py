@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -82,6 +83,8 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # WAL: vẫn đọc được trong khi một giao dịch ghi lớn (nạp dữ liệu) đang chạy
+        'OPTIONS': {'init_command': 'PRAGMA journal_mode=WAL;'},
     }
 }
 
@@ -138,8 +141,85 @@ STATIC_ROOT = BASE_DIR / 'static'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Chỉ mục không gian trong bộ nhớ (hospitals/spatial.py)
+# Tắt để nearby/nearest dùng truy vấn hộp bao trong SQL thay cho chỉ mục
+HOSPITAL_SPATIAL_INDEX_ENABLED = True
+# Số điểm xuất phát tối đa của /api/hospitals/nearest_batch/
+HOSPITAL_BATCH_MAX_ORIGINS = 10000
+# Cache nearby/nearest/search theo ô lưới của điểm xuất phát (hospitals/origin_cache.py)
+# Cạnh ô (mét, 0 là tắt) và số mục tối đa mỗi worker
+HOSPITAL_ORIGIN_GRID_M = 50
+HOSPITAL_ORIGIN_CACHE_SIZE = 4096
+# Kích thước khối mặc định của /api/hospitals/distance_matrix/ (số điểm x số bệnh viện)
+HOSPITAL_MATRIX_ORIGIN_BLOCK = 256
+HOSPITAL_MATRIX_HOSPITAL_BLOCK = 2048
+
+# Tìm gần đúng theo trigram khi chỉ mục toàn văn không khớp (hospitals/fuzzy.py)
+# Tỉ lệ trigram của từ khóa phải khớp tối thiểu, độ giống tối thiểu của mỗi từ với
+# một từ của bệnh viện, và số kết quả tối đa
+HOSPITAL_FUZZY_SEARCH_ENABLED = True
+HOSPITAL_FUZZY_THRESHOLD = 0.6
+HOSPITAL_FUZZY_WORD_THRESHOLD = 0.4
+HOSPITAL_FUZZY_LIMIT = 200
+
+# Số bản ghi mỗi lô bulk_create khi nạp dữ liệu (hospitals/importer.py)
+HOSPITAL_IMPORT_BATCH_SIZE = 1000
+
+# Số chữ số thập phân của tọa độ trong khóa tự nhiên khi đồng bộ (4 ≈ 11 m)
+HOSPITAL_IMPORT_KEY_PRECISION = 4
+
+# Số dòng đọc mỗi lô khi xuất dữ liệu dạng stream (CSV trong admin, action geojson)
+HOSPITAL_EXPORT_CHUNK_SIZE = 2000
+
+# Số chữ số thập phân mặc định của tọa độ GeoJSON (6 ≈ 0,1 m)
+HOSPITAL_GEOJSON_PRECISION = 6
+
+# Vector tile (hospitals/tiles.py): zoom tối đa, phần nới quanh tile (đơn vị tile, extent 4096),
+# gom cụm khi zoom <= CLUSTER_MAX_ZOOM theo ô CLUSTER_CELL đơn vị tile (256 = 1/16 cạnh tile)
+HOSPITAL_TILE_MAX_ZOOM = 22
+HOSPITAL_TILE_BUFFER = 64
+HOSPITAL_TILE_CLUSTER_MAX_ZOOM = 13
+HOSPITAL_TILE_CLUSTER_CELL = 256
+
+# Phân trang cursor (hospitals/pagination.py), bật khi có ?page_size= hoặc ?cursor=
+HOSPITAL_PAGE_SIZE = 50
+HOSPITAL_MAX_PAGE_SIZE = 500
+# ?count=estimate trên SQLite: đếm chính xác tối đa bấy nhiêu dòng
+HOSPITAL_COUNT_ESTIMATE_CAP = 10000
+
+# Cache phản hồi stats/districts/specialties (hospitals/cache.py), khóa theo phiên bản dữ liệu,
+# và fragment đã serialize của từng bệnh viện (hospitals/fragments.py)
+# Chọn backend bằng biến môi trường HOSPITAL_CACHE_BACKEND: locmem (mặc định), file, memcached
+HOSPITAL_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hospitals',
+        # Đủ chỗ cho fragment của mọi bệnh viện (hospitals/fragments.py)
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # Dùng chung giữa các worker trên cùng máy
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache' / 'hospitals',
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+    # memcached chạy cục bộ (cần cài pymemcache)
+    'memcached': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': '127.0.0.1:11211',
+    },
+}
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'hospitals': HOSPITAL_CACHE_BACKENDS[os.environ.get('HOSPITAL_CACHE_BACKEND', 'locmem')],
+}
+HOSPITAL_CACHE_ALIAS = 'hospitals'
+# Số giây giữ một phiên bản cũ trước khi bị xóa khỏi cache
+HOSPITAL_CACHE_TIMEOUT = 3600
+
 # GIS Configuration for Windows
-import os
 if os.name == 'nt':
     import sys
     from pathlib import Path